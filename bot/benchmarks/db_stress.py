@@ -0,0 +1,149 @@
+"""
+Нагрузочный тест SQLite: параллельные читатели и писатели на отдельных соединениях.
+Сравнивает режим по умолчанию (rollback journal) с профилем config.db_settings.db_profile
+и считает ошибки "database is locked".
+
+Запуск из каталога bot:
+    python -m benchmarks.db_stress --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from config.db_settings import db_profile
+from models.db_utils import connect, get_database_connection, close_database_connection
+from models.db_migrations import run_migrations
+from models.db_queries import log_water, get_progress_snapshot
+from benchmarks.query_plans import fill
+
+# Поведение до профиля: журнал отката и синхронная запись на каждый коммит
+DEFAULT_PROFILE = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reads = []
+        self.writes = []
+        self.locked = 0
+        self.errors = 0
+
+    def add(self, timings, elapsed):
+        with self.lock:
+            timings.append(elapsed)
+
+
+def reader(db_name, profile, users, stop, counters):
+    conn = connect(db_name, profile=profile)
+    cursor = conn.cursor()
+    rnd = random.Random()
+    today = datetime.now().date()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            # Тяжёлое чтение (как у отчётов) и лёгкое, как у /check_progress
+            cursor.execute("SELECT user_id, SUM(water_consumed) FROM water_intake GROUP BY user_id;").fetchall()
+            get_progress_snapshot(rnd.randint(1, users), today, cursor)
+            counters.add(counters.reads, time.perf_counter() - started)
+        except sqlite3.OperationalError as e:
+            with counters.lock:
+                if "locked" in str(e):
+                    counters.locked += 1
+                else:
+                    counters.errors += 1
+    conn.close()
+
+
+def writer(db_name, profile, users, stop, counters):
+    conn = connect(db_name, profile=profile)
+    cursor = conn.cursor()
+    rnd = random.Random()
+    while not stop.is_set():
+        user_id = rnd.randint(1, users)
+        started = time.perf_counter()
+        try:
+            # log_water обновляет и daily_totals
+            log_water(cursor, user_id, 250)
+            conn.commit()
+            counters.add(counters.writes, time.perf_counter() - started)
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            with counters.lock:
+                if "locked" in str(e):
+                    counters.locked += 1
+                else:
+                    counters.errors += 1
+    conn.close()
+
+
+def percentile(timings, q):
+    if not timings:
+        return 0.0
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * q))]
+
+
+def run(db_name, profile, args):
+    counters = Counters()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=reader, args=(db_name, profile, args.users, stop, counters))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=writer, args=(db_name, profile, args.users, stop, counters))
+        for _ in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counters
+
+
+def prepare_database(db_name, rows, users):
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    fill(conn, cursor, rows, users)
+    conn.commit()
+    close_database_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8, help="потоков чтения")
+    parser.add_argument("--writers", type=int, default=4, help="потоков записи")
+    parser.add_argument("--seconds", type=float, default=5, help="длительность каждого прогона, с")
+    parser.add_argument("--rows", type=int, default=200_000, help="строк в таблицах перед тестом")
+    parser.add_argument("--users", type=int, default=1000, help="количество пользователей")
+    parser.add_argument("--busy-timeout", type=int, default=db_profile["busy_timeout"],
+                        help="busy_timeout для обоих прогонов, мс")
+    args = parser.parse_args()
+
+    profiles = {
+        "по умолчанию": {**DEFAULT_PROFILE, "busy_timeout": args.busy_timeout},
+        "профиль db_settings": {**db_profile, "busy_timeout": args.busy_timeout},
+    }
+
+    print(f"{'режим':<22}{'чтений/с':>10}{'записей/с':>11}{'p95 чтения, мс':>16}"
+          f"{'p95 записи, мс':>16}{'locked':>8}{'прочие':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, profile) in enumerate(profiles.items()):
+            db_name = os.path.join(tmp, f"stress{i}.db")
+            prepare_database(db_name, args.rows, args.users)
+            counters = run(db_name, profile, args)
+            print(
+                f"{name:<22}{len(counters.reads) / args.seconds:>10.1f}{len(counters.writes) / args.seconds:>11.1f}"
+                f"{percentile(counters.reads, 0.95) * 1000:>16.2f}{percentile(counters.writes, 0.95) * 1000:>16.2f}"
+                f"{counters.locked:>8}{counters.errors:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Выгрузка /export: время, размер файла и пиковая память Python при разной длине истории.
+
+Для каждого значения --rows создаётся пользователь с таким количеством записей воды,
+калорий и тренировок (поровну) и выгружается через utils.export.export_user_history.
+Пиковая память замеряется tracemalloc и не должна зависеть от длины истории.
+Завершается с кодом 1, если пик превысил --budget МиБ или выгружено не всё.
+
+Запуск из каталога bot:
+    python -m benchmarks.export --rows 10000 100000 1000000 --budget 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def fill(db_name, users_rows):
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_migrations import run_migrations
+
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    today = datetime.now().date()
+    for user_id, rows in users_rows.items():
+        cursor.execute(
+            "INSERT INTO users (id, name, birth_date, weight, height, gender, city) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, f"user{user_id}", "1990-01-01", 70, 175, "м", "Moscow")
+        )
+        per_table = rows // 3
+        days = [str(today - timedelta(days=i % 3650)) for i in range(per_table)]
+        cursor.executemany("INSERT INTO water_intake (user_id, date, water_consumed) VALUES (?, ?, 250)",
+                           ((user_id, day) for day in days))
+        cursor.executemany("INSERT INTO calorie_intake (user_id, date, calories) VALUES (?, ?, 500)",
+                           ((user_id, day) for day in days))
+        cursor.executemany(
+            "INSERT INTO workouts (user_id, date, workout_type, duration, calories_burned) VALUES (?, ?, 'бег', 30, 300)",
+            ((user_id, day) for day in days)
+        )
+    conn.commit()
+    close_database_connection(conn)
+
+
+async def run(users_rows, fmt):
+    from models.db_pool import database
+    from utils.export import export_user_history
+
+    results = []
+    try:
+        await database.open()
+        for user_id, rows in users_rows.items():
+            tracemalloc.start()
+            started = time.perf_counter()
+            export = await export_user_history(user_id, fmt)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            os.remove(export.path)
+            results.append((rows // 3 * 3 + 1, export.rows, elapsed, export.size, peak))
+    finally:
+        await database.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--budget", type=float, default=4.0, help="допустимая пиковая память Python, МиБ")
+    args = parser.parse_args()
+
+    users_rows = {user_id: rows for user_id, rows in enumerate(args.rows, start=1)}
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db_name = os.path.join(tmp, "health_tracker.db")
+        # Пути читаются из окружения при импорте настроек
+        os.environ["MAIN_DATABASE"] = db_name
+        os.environ["EXPORT_DIRECTORY"] = tmp
+        fill(db_name, users_rows)
+        results = asyncio.run(run(users_rows, args.format))
+
+    print(f"{'записей':>10}{'выгружено':>11}{'время, с':>10}{'файл, КиБ':>11}{'пик, МиБ':>10}")
+    failed = False
+    for expected, rows, elapsed, size, peak in results:
+        print(f"{expected:>10}{rows:>11}{elapsed:>10.2f}{size / 1024:>11.0f}{peak / 1024 / 1024:>10.2f}")
+        failed |= rows != expected or peak / 1024 / 1024 > args.budget
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Импорт истории из файла: скорость, влияние на записи других пользователей и круговая проверка с /export.
+
+Создаёт временную БД и CSV-файл с --rows записями воды, калорий и тренировок за несколько лет
+(и --invalid некорректными строками), импортирует его через utils.history_import.import_history,
+пока --writers задач пишут воду от имени других пользователей, и замеряет задержку этих записей.
+Затем выгружает историю пользователя в JSON Lines через utils.export, импортирует выгрузку
+второму пользователю и сравнивает их daily_totals.
+Завершается с кодом 1 при расхождениях или если импорт дольше --budget секунд.
+
+Запуск из каталога bot:
+    python -m benchmarks.history_import --rows 100000 --budget 10
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SOURCE_USER, COPY_USER = 1, 2
+
+
+def prepare(db_name, users):
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_migrations import run_migrations
+
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    cursor.executemany(
+        "INSERT INTO users (id, name, birth_date, weight, height, gender, city) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((user_id, f"user{user_id}", "1990-01-01", 70, 175, "м", "Moscow") for user_id in range(1, users + 1))
+    )
+    conn.commit()
+    close_database_connection(conn)
+
+
+def write_source(path, rows, invalid):
+    rnd = random.Random(42)
+    today = datetime.now().date()
+    sections = {"water_intake": [], "calorie_intake": [], "workouts": []}
+    for _ in range(rows):
+        day = str(today - timedelta(days=rnd.randint(0, 5 * 365)))
+        kind = rnd.random()
+        if kind < 0.5:
+            sections["water_intake"].append((day, rnd.choice((200, 250, 330, 500))))
+        elif kind < 0.85:
+            sections["calorie_intake"].append((day, rnd.randint(50, 900)))
+        else:
+            # У части тренировок калории не указаны: они считаются по MET и весу
+            sections["workouts"].append((day, rnd.choice(("бег", "йога", "плавание")), rnd.randint(10, 90),
+                                         rnd.choice(("", rnd.randint(50, 600)))))
+    sections["water_intake"] += [("2024-13-01", 250), (str(today + timedelta(days=1)), 250), ("", "много")][:invalid]
+    columns = {
+        "water_intake": ("date", "water_consumed"),
+        "calorie_intake": ("date", "calories"),
+        "workouts": ("date", "workout_type", "duration", "calories_burned"),
+    }
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        for table, table_rows in sections.items():
+            writer.writerow(("table", *columns[table]))
+            writer.writerows((table, *row) for row in table_rows)
+
+
+def compare_totals(db_name):
+    """
+    :return: (дней с итогами у исходного пользователя, дней с расхождениями у копии)
+    """
+    from models.db_utils import get_database_connection, close_database_connection
+
+    conn, cursor = get_database_connection(db_name)
+    totals = []
+    for user_id in (SOURCE_USER, COPY_USER):
+        cursor.execute(
+            "SELECT day, water, calories, workout_minutes, round(burned, 2) FROM daily_totals WHERE user_id = ? "
+            "AND day < date('now', 'localtime')",
+            (user_id,)
+        )
+        totals.append(dict((row[0], row[1:]) for row in cursor.fetchall()))
+    close_database_connection(conn)
+    source, copy = totals
+    return len(source), sum(source.get(day) != copy.get(day) for day in source.keys() | copy.keys())
+
+
+async def run(args, source_path):
+    from models.db_pool import database
+    from models.db_queries import log_intake_batch
+    from utils.export import export_user_history
+    from utils.history_import import ImportStats, import_history
+
+    latencies = []
+    done = asyncio.Event()
+
+    def write_water(conn, cursor, user_id, day):
+        log_intake_batch(cursor, [(user_id, day, 250)], [], [])
+
+    async def writer(seed):
+        rnd = random.Random(seed)
+        while not done.is_set():
+            user_id = rnd.randint(COPY_USER + 1, args.users)
+            started = time.perf_counter()
+            await database.for_user(user_id).write(write_water, user_id, datetime.now().date())
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    async def import_source():
+        try:
+            started = time.perf_counter()
+            stats = await import_history(SOURCE_USER, source_path, ImportStats(), weight=70, chunk_size=args.chunk)
+            return stats, time.perf_counter() - started
+        finally:
+            done.set()
+
+    try:
+        await database.open()
+        (stats, elapsed), *_ = await asyncio.gather(import_source(), *(writer(i) for i in range(args.writers)))
+        export = await export_user_history(SOURCE_USER, "jsonl")
+        copy_stats = await import_history(COPY_USER, export.path, ImportStats(), weight=70, chunk_size=args.chunk)
+        os.remove(export.path)
+    finally:
+        await database.close()
+    return stats, elapsed, latencies, copy_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--invalid", type=int, default=3, help="некорректных строк в файле (до 3)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--chunk", type=int, default=5000, help="записей за одну транзакцию")
+    parser.add_argument("--writers", type=int, default=4, help="параллельных задач записи воды других пользователей")
+    parser.add_argument("--budget", type=float, default=10.0, help="допустимое время импорта, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db_name = os.path.join(tmp, "health_tracker.db")
+        # Пути читаются из окружения при импорте настроек
+        os.environ["MAIN_DATABASE"] = db_name
+        os.environ["EXPORT_DIRECTORY"] = tmp
+        source_path = os.path.join(tmp, "history.csv")
+        prepare(db_name, args.users)
+        write_source(source_path, args.rows, args.invalid)
+        stats, elapsed, latencies, copy_stats = asyncio.run(run(args, source_path))
+        days, mismatched_days = compare_totals(db_name)
+
+    latencies.sort()
+    print(f"Импортировано {stats.imported} записей за {elapsed:.2f} с ({stats.imported / elapsed:.0f} в с), "
+          f"строк с ошибками: {stats.invalid}")
+    for error in stats.errors:
+        print(f"  {error}")
+    print(
+        f"Записи других пользователей во время импорта: {len(latencies)}, "
+        f"p50 {statistics.median(latencies) * 1000:.1f} мс, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс, "
+        f"макс {latencies[-1] * 1000:.1f} мс"
+    )
+    print(f"Импорт выгрузки /export: {copy_stats.imported} записей, пропущено {copy_stats.skipped}; "
+          f"дней с итогами: {days}, расхождений daily_totals: {mismatched_days}")
+    if stats.imported != args.rows or stats.invalid != min(args.invalid, 3) or copy_stats.imported != stats.imported \
+            or mismatched_days:
+        sys.exit(1)
+    if elapsed > args.budget:
+        print(f"Импорт дольше бюджета {args.budget} с", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
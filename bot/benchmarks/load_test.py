@@ -0,0 +1,201 @@
+"""
+Сквозной нагрузочный тест: настоящий dp из main.py в режиме polling против локального
+фиктивного Bot API (tools/fake_telegram.FakeBotAPI) и заглушек OpenFoodFacts и weatherstack.
+
+Каждый виртуальный пользователь проходит мастер /set_profile, а затем выполняет
+случайную смесь команд с паузами. Задержка команды — время от появления обновления
+в getUpdates до последнего ожидаемого ответа бота. Результат печатается в JSON.
+
+Запуск из каталога bot:
+    python -m benchmarks.load_test --users 100 --duration 60 --output load.json 2>/dev/null
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from tools.fake_telegram import FakeBotAPI, make_update
+
+# Команда: (вес в смеси, текст, ожидаемое количество ответов бота)
+COMMAND_MIX = {
+    "log_water": (30, "/log_water 250", 1),
+    "log_calories": (15, "/log_calories 350", 1),
+    "log_calories_product": (10, "/log_calories яблоко", 2),
+    "log_workout": (10, "/log_workout бег 30", 1),
+    "check_progress": (25, "/check_progress", 1),
+    "stats": (7, "/stats", 1),
+    "stats_90": (3, "/stats 90", 1),
+    "export": (2, "/export", 1),
+}
+
+PROFILE_WIZARD = ["/set_profile", "Пользователь", "01.01.1990", "Moscow", "175", "70", "м", "0", "0", "0"]
+
+# Классы лимитов middlewares/throttling, которые снимаются без --throttle
+THROTTLE_NAMES = (
+    "logging", "render", "export", "import", "lookup", "global_render", "global_export", "global_import", "global_lookup"
+)
+
+
+async def handle_weather(request):
+    await asyncio.sleep(request.app["api_latency"])
+    return web.json_response({"current": {"temperature": 22}})
+
+
+async def handle_food(request):
+    await asyncio.sleep(request.app["api_latency"])
+    return web.json_response({"products": [{
+        "product_name": request.query.get("search_terms", "продукт"),
+        "nutriments": {"energy-kcal_100g": 52},
+        "brands": "Load",
+        "categories": "Test",
+    }]})
+
+
+def configure_environment(args, tmp):
+    """
+    Настраивает бота через переменные окружения; вызывается до импорта main и config.
+    """
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "BOT_TOKEN": "123456:LOAD-TEST",
+        "BOT_MODE": "polling",
+        "TELEGRAM_API_URL": base,
+        "WEATHER_API_URL": f"{base}/weather",
+        "OPENFOODFACTS_API_URL": f"{base}/food",
+        "MAIN_DATABASE": os.path.join(tmp, "health_tracker.db"),
+        # Количество шардов берётся из DB_SHARDS окружения, файлы — во временном каталоге
+        "SHARD_DATABASE_TEMPLATE": os.path.join(tmp, "health_tracker.shard{index}.db"),
+        "FOOD_DATABASE": os.path.join(tmp, "food_cache.db"),
+        "FSM_DATABASE": os.path.join(tmp, "fsm_storage.db"),
+        "METRICS_PORT": "0",
+    })
+    if not args.throttle:
+        for name in THROTTLE_NAMES:
+            os.environ[f"THROTTLE_{name.upper()}_RATE"] = "1000000"
+            os.environ[f"THROTTLE_{name.upper()}_BURST"] = "1000000"
+
+
+def summarize(timings, timeouts, elapsed):
+    commands = {}
+    for name in sorted(set(timings) | set(timeouts)):
+        values = sorted(timings.get(name, []))
+        entry = {"count": len(values), "timeouts": timeouts.get(name, 0), "per_second": len(values) / elapsed}
+        if values:
+            entry.update({
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": values[int(len(values) * 0.50)] * 1000,
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+                "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))] * 1000,
+            })
+        commands[name] = entry
+    return commands
+
+
+async def run(args):
+    api = FakeBotAPI()
+    app = api.app()
+    app["api_latency"] = args.api_latency
+    app.router.add_get("/weather", handle_weather)
+    app.router.add_get("/food", handle_food)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    bot_main = importlib.import_module("main")
+    bot_task = asyncio.create_task(bot_main.main())
+    await asyncio.wait_for(api.polling.wait(), 30)
+
+    update_ids = itertools.count(1)
+    timings = {}
+    timeouts = {}
+    names = list(COMMAND_MIX)
+    weights = [COMMAND_MIX[name][0] for name in names]
+
+    async def command(user_id, replies, name, text, expected):
+        while not replies.empty():
+            replies.get_nowait()
+        started = time.perf_counter()
+        api.push_update(make_update(next(update_ids), user_id, text))
+        try:
+            for _ in range(expected):
+                await asyncio.wait_for(replies.get(), args.timeout)
+        except asyncio.TimeoutError:
+            timeouts[name] = timeouts.get(name, 0) + 1
+            return
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+
+    async def virtual_user(user_id, deadline):
+        rnd = random.Random(user_id)
+        replies = api.listen(user_id)
+        # Пользователи приходят не одновременно
+        await asyncio.sleep(rnd.uniform(0, args.ramp_up))
+        for text in PROFILE_WIZARD:
+            await command(user_id, replies, "set_profile_step", text, 1)
+            await asyncio.sleep(rnd.uniform(0.5, 1.5) * args.think_time)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(rnd.uniform(0.5, 1.5) * args.think_time)
+            name = rnd.choices(names, weights)[0]
+            _, text, expected = COMMAND_MIX[name]
+            await command(user_id, replies, name, text, expected)
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    try:
+        await asyncio.gather(*(virtual_user(1000 + i, deadline) for i in range(args.users)))
+    finally:
+        elapsed = time.perf_counter() - started
+        await bot_main.dp.stop_polling()
+        await bot_task
+        await runner.cleanup()
+
+    completed = sum(len(values) for values in timings.values())
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "users": args.users,
+        "duration_s": elapsed,
+        "think_time_s": args.think_time,
+        "api_latency_s": args.api_latency,
+        "throttle": args.throttle,
+        "commands_completed": completed,
+        "commands_per_second": completed / elapsed,
+        "bot_api_calls": api.calls,
+        "commands": summarize(timings, timeouts, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="длительность после начала, с")
+    parser.add_argument("--think-time", type=float, default=1.0, help="средняя пауза между командами, с")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="за сколько секунд подключаются все пользователи")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="задержка заглушек внешних API, с")
+    parser.add_argument("--timeout", type=float, default=30, help="сколько ждать ответа на команду, с")
+    parser.add_argument("--port", type=int, default=18181, help="порт фиктивного Bot API и заглушек")
+    parser.add_argument("--throttle", action="store_true", help="оставить лимиты частоты из настроек")
+    parser.add_argument("--output", help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(args, tmp)
+        report = asyncio.run(run(args))
+
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(payload + "\n")
+    else:
+        sys.stdout.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Бенчмарк пропускной способности /log_water: синхронное соединение на каждый запрос (как было)
+против асинхронного пула соединений models/db_pool с групповой записью models/ingest_queue.
+Погода на сегодня заранее записана в БД, как после фонового обновления, поэтому к weatherstack
+бенчмарк не обращается.
+
+Запуск из каталога bot:
+    python -m benchmarks.log_water --users 50 --updates 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from models.db_pool import database
+from models.ingest_queue import ingest_queue
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations
+from models.db_queries import log_water, get_water_total_today, last_logged_user_norms, log_user_norms, log_weather
+from handlers.water_logging import handle_log_water
+from utils.weather_api import normalize_city, weather_client
+
+
+class FakeMessage:
+    """
+    Минимальная замена aiogram Message: ответ имитирует сетевую задержку Telegram.
+    """
+
+    def __init__(self, user_id, text, reply_latency):
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}")
+        self.text = text
+        self.reply_latency = reply_latency
+
+    async def reply(self, text, **kwargs):
+        await asyncio.sleep(self.reply_latency)
+
+
+def prepare_database(db_name, users):
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    for user_id in range(1, users + 1):
+        cursor.execute(
+            "INSERT INTO users (id, name, birth_date, weight, height, gender, city) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, f"user{user_id}", "1990-01-01", 70, 175, "м", "Moscow")
+        )
+        log_user_norms(user_id, 2000, 2100, 30, conn, cursor)
+    log_weather(normalize_city("Moscow"), 22, conn, cursor)
+    conn.commit()
+    close_database_connection(conn)
+
+
+async def handle_log_water_blocking(message, db_name):
+    """
+    Исходная реализация: новое синхронное соединение внутри корутины.
+    """
+    user_id = message.from_user.id
+    amount = int(message.text.split()[1])
+    conn, cursor = get_database_connection(db_name)
+    last_norms = last_logged_user_norms(user_id, conn, cursor)
+    _, daily_water_goal, _, _ = last_norms
+    log_water(cursor, user_id, amount)
+    conn.commit()
+    total_today = get_water_total_today(user_id, cursor)
+    close_database_connection(conn)
+    await message.reply(f"Всего за сегодня: {total_today} мл. До нормы осталось: {max(0, daily_water_goal - total_today)} мл.")
+
+
+async def measure_loop_lag(stop, interval=0.001):
+    """
+    Возвращает максимальную задержку цикла событий (с), пока не установлен stop.
+    """
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(handler, users, updates, reply_latency):
+    async def virtual_user(user_id):
+        for _ in range(updates):
+            await handler(FakeMessage(user_id, "/log_water 250", reply_latency))
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user_id) for user_id in range(1, users + 1)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return users * updates / elapsed, await lag_task
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="количество одновременных пользователей")
+    parser.add_argument("--updates", type=int, default=20, help="сообщений /log_water на пользователя")
+    parser.add_argument("--reply-latency", type=float, default=0.02, help="имитация задержки ответа Telegram, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = os.path.join(tmp, "before.db")
+        after_db = os.path.join(tmp, "after.db")
+        prepare_database(before_db, args.users)
+        prepare_database(after_db, args.users)
+
+        before = await run(lambda m: handle_log_water_blocking(m, before_db), args.users, args.updates, args.reply_latency)
+
+        database.shared.db_name = after_db
+        await database.open()
+        try:
+            after = await run(handle_log_water, args.users, args.updates, args.reply_latency)
+        finally:
+            await ingest_queue.close()
+            await database.close()
+            await weather_client.close()
+
+    print(f"{'режим':<28}{'обновлений/с':>14}{'макс. задержка цикла, мс':>28}")
+    print(f"{'соединение на запрос':<28}{before[0]:>14.1f}{before[1] * 1000:>28.2f}")
+    print(f"{'пул + групповая запись':<28}{after[0]:>14.1f}{after[1] * 1000:>28.2f}")
+
+    batches = ingest_queue.stats()
+    print(
+        f"\nпачек: {batches['batches']}, записей: {batches['rows']}, "
+        f"средний размер: {batches['avg_batch']:.1f}, максимальный: {batches['max_batch']}, "
+        f"коммит: в среднем {batches['avg_commit_ms']:.2f} мс, максимум {batches['max_commit_ms']:.2f} мс"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Накладные расходы логирования на один update: время, которое обработчик тратит на вызовы логгера.
+
+Каждый update пишет то же, что /start или /check_progress: одну INFO-запись о команде
+и --debug-lines DEBUG-записей из запросов к БД (при уровне INFO они не выводятся).
+Сравниваются:
+  - синхронный StreamHandler и f-строки (как было до очереди);
+  - очередь utils.logging.queue_handler и %-форматирование;
+  - то же с выборкой INFO-событий SamplingFilter(--sample-rate).
+Вывод идёт во временный файл; --sink-delay-ms добавляет задержку на каждую запись в него,
+как у медленного stdout (docker logs, журнал по сети). Для очереди отдельно показано,
+сколько времени фоновый поток дописывал очередь после замера и сколько записей отброшено:
+update идут подряд без пауз, поэтому очередь заполняется быстрее, чем выводится.
+
+Запуск из каталога bot:
+    python -m benchmarks.logging_overhead --updates 50000 --sink-delay-ms 0.05
+"""
+import argparse
+import logging
+import tempfile
+import time
+from datetime import datetime
+
+from utils.logging import SAMPLED, SamplingFilter, console_handler, queue_handler
+
+
+class SlowFile:
+    """
+    Файл, каждая запись в который дополнительно занимает delay секунд.
+    """
+
+    def __init__(self, file, delay):
+        self.file = file
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+def make_logger(name, handler, sample_rate=1.0):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    if sample_rate < 1:
+        logger.addFilter(SamplingFilter(sample_rate))
+    return logger
+
+
+def update_fstrings(logger, user_id, profile, debug_lines):
+    logger.info(f"Получена команда /start от пользователя {user_id} (user{user_id})")
+    for _ in range(debug_lines):
+        logger.debug(f"Поиск профиля для {user_id}: {profile} за {datetime.now().date()}")
+
+
+def update_lazy(logger, user_id, profile, debug_lines):
+    logger.info("Получена команда /start от пользователя %s (%s)", user_id, f"user{user_id}", extra=SAMPLED)
+    for _ in range(debug_lines):
+        logger.debug("Поиск профиля для %s: %s", user_id, profile)
+
+
+def measure(logger, update, updates, debug_lines):
+    profile = ("user", "1990-01-01", "Moscow", 175, 70, "м", 2400, 2200, 30, "2024-01-01")
+    started = time.perf_counter()
+    for i in range(updates):
+        update(logger, i, profile, debug_lines)
+    return (time.perf_counter() - started) / updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=50_000)
+    parser.add_argument("--debug-lines", type=int, default=4, help="DEBUG-записей на update")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--queue-size", type=int, default=10_000)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="задержка записи одной строки в вывод")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as file:
+        sink = SlowFile(file, args.sink_delay_ms / 1000)
+        results = []
+
+        logger = make_logger("bench_sync", console_handler(logging.INFO, sink))
+        results.append(("синхронно, f-строки", measure(logger, update_fstrings, args.updates, args.debug_lines), None))
+
+        for title, rate in (("очередь, %-формат", 1.0), (f"очередь, выборка {args.sample_rate:g}", args.sample_rate)):
+            handler, listener = queue_handler(console_handler(logging.INFO, sink), args.queue_size)
+            logger = make_logger(f"bench_queue_{rate}", handler, rate)
+            per_update = measure(logger, update_lazy, args.updates, args.debug_lines)
+            started = time.perf_counter()
+            listener.stop()
+            results.append((title, per_update, (time.perf_counter() - started, handler.dropped)))
+
+    print(f"update: 1 INFO + {args.debug_lines} DEBUG, задержка вывода {args.sink_delay_ms} мс на строку")
+    for title, per_update, queued in results:
+        line = f"{title:<24} {per_update * 1e6:8.2f} мкс на update"
+        if queued is not None:
+            drain, dropped = queued
+            line += f", фоновая запись после замера {drain:.2f} с, отброшено {dropped}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
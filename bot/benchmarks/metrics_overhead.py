@@ -0,0 +1,52 @@
+"""
+Накладные расходы инструментирования: вызов хендлера через MetricsMiddleware
+против прямого вызова, а также стоимость одного Histogram.observe.
+
+Запуск из каталога bot:
+    python -m benchmarks.metrics_overhead --calls 200000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from middlewares.metrics import MetricsMiddleware
+from utils.metrics import Histogram
+
+
+async def handle_message(event, data):
+    return None
+
+
+async def measure(call, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        await call()
+    return (time.perf_counter() - started) / calls
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    middleware = MetricsMiddleware()
+    data = {"handler": SimpleNamespace(callback=handle_message)}
+
+    direct = await measure(lambda: handle_message(None, data), args.calls)
+    wrapped = await measure(lambda: middleware(handle_message, None, data), args.calls)
+
+    histogram = Histogram("bench_seconds", "", ("handler",))
+    started = time.perf_counter()
+    for i in range(args.calls):
+        histogram.observe(0.003, "handle_message")
+    observe = (time.perf_counter() - started) / args.calls
+
+    print(f"прямой вызов хендлера:       {direct * 1e6:.2f} мкс")
+    print(f"через MetricsMiddleware:     {wrapped * 1e6:.2f} мкс")
+    print(f"накладные расходы на update: {(wrapped - direct) * 1e6:.2f} мкс")
+    print(f"Histogram.observe:           {observe * 1e6:.2f} мкс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
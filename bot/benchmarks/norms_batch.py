@@ -0,0 +1,125 @@
+"""
+Ночной пересчёт норм: векторный расчёт и пакетная запись user_goals для всех пользователей.
+
+Создаёт временную БД с --users пользователями и погодой за сегодня для части городов,
+запускает utils.norms_batch.recompute_all_norms дважды (второй запуск ничего не добавляет)
+и сверяет выборку с построчным расчётом calculations.calculate_goals.
+Завершается с кодом 1, если первый запуск дольше --budget секунд или нормы расходятся.
+
+Запуск из каталога bot:
+    python -m benchmarks.norms_batch --users 1000000 --budget 15
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+
+def fill(db_name, users, cities):
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_migrations import run_migrations
+
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    rnd = random.Random(42)
+    cursor.executemany(
+        "INSERT INTO users (id, name, birth_date, weight, height, gender, city, prefered_water, prefered_calories, "
+        "prefered_workout) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i, f"user{i}", str(date(rnd.randint(1950, 2005), rnd.randint(1, 12), rnd.randint(1, 28))),
+          rnd.randint(50, 120), rnd.randint(150, 200), "м", f"City{i % cities}",
+          rnd.choice((0, 0, 0, 2500)), rnd.choice((0, 0, 0, 1800)), rnd.choice((0, 0, 45)))
+         for i in range(1, users + 1))
+    )
+    # Погода известна для половины городов, в половине из них жарко
+    cursor.executemany(
+        "INSERT INTO weather (city, date, temperature) VALUES (?, ?, ?)",
+        ((f"city{c}", str(datetime.now().date()), 20 + c % 2 * 10) for c in range(0, cities, 2))
+    )
+    conn.commit()
+    close_database_connection(conn)
+
+
+def verify(db_name, sample):
+    """
+    Сравнивает записанные нормы с построчным расчётом.
+
+    :return: Количество расхождений
+    """
+    from models.db_utils import get_database_connection, close_database_connection
+    from utils.calculations import calculate_goals, calculate_age
+
+    conn, cursor = get_database_connection(db_name)
+    cursor.execute(f"""
+        SELECT u.birth_date, u.height, u.weight, u.prefered_water, u.prefered_calories, u.prefered_workout,
+               w.temperature, g.calories_goal, g.water_goal, g.workout_goal
+        FROM users u
+        JOIN user_goals g ON g.user_id = u.id
+        LEFT JOIN weather w ON w.city = lower(u.city) AND w.date = ?
+        ORDER BY random() LIMIT {int(sample)}
+    """, (str(datetime.now().date()),))
+    mismatches = 0
+    for birth_date, height, weight, water, calories, workout, temperature, *stored in cursor.fetchall():
+        goals = calculate_goals(height, weight, calculate_age(birth_date), water, calories, workout, temperature)
+        expected = (goals["calories_goal"], goals["water_goal"], goals["workout_goal"])
+        if any(abs(a - b) > 0.011 for a, b in zip(stored, expected)):
+            mismatches += 1
+    close_database_connection(conn)
+    return mismatches
+
+
+async def run():
+    from models.db_pool import database
+    from models.db_queries import scheduled_norms_logged
+    from utils.norms_batch import recompute_all_norms
+    from utils.weather_api import weather_client
+
+    try:
+        started = time.perf_counter()
+        inserted = await recompute_all_norms()
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        repeated = await recompute_all_norms()
+        second = time.perf_counter() - started
+        done = all(await database.read_all(lambda conn, cursor: scheduled_norms_logged(datetime.now().date(), cursor)))
+    finally:
+        await database.close()
+        await weather_client.close()
+    return inserted, first, repeated, second, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=2000, help="сколько норм сверить построчно")
+    parser.add_argument("--budget", type=float, default=15.0, help="допустимое время первого запуска, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "health_tracker.db")
+        # Пул БД открывает базу из настроек при импорте, поэтому путь задаётся до импорта
+        os.environ["MAIN_DATABASE"] = db_name
+        started = time.perf_counter()
+        fill(db_name, args.users, args.cities)
+        print(f"Создано {args.users} пользователей за {time.perf_counter() - started:.1f} с")
+
+        inserted, first, repeated, second, done = asyncio.run(run())
+        mismatches = verify(db_name, args.sample)
+
+    print(f"Первый запуск: {inserted} записей за {first:.2f} с")
+    print(f"Повторный запуск: {repeated} записей за {second:.2f} с")
+    print(f"Расхождений с построчным расчётом: {mismatches} из {args.sample}")
+    print(f"Пересчёт за сегодня отмечен выполненным: {done}")
+    if mismatches or inserted != args.users or repeated or not done:
+        sys.exit(1)
+    if first > args.budget:
+        print(f"Пересчёт дольше бюджета {args.budget} с", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Микробенчмарк /check_progress: отдельные запросы на каждый показатель (как было)
+против одного запроса get_progress_snapshot.
+
+Запуск из каталога bot:
+    python -m benchmarks.progress_snapshot --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations
+from models.db_queries import (
+    get_user_profile_full,
+    check_logged_user_norms,
+    last_logged_user_norms,
+    get_user_city,
+    is_weather_logged_today,
+    get_weather_for_today,
+    get_water_total_today,
+    get_calories_total_today,
+    get_workout_stats_today,
+    get_progress_snapshot
+)
+from benchmarks.query_plans import fill
+
+
+def separate_queries(conn, cursor, user_id):
+    """
+    Запросы, которые cmd_check_progress выполнял раньше.
+    """
+    get_user_profile_full(user_id, cursor)
+    if check_logged_user_norms(user_id, conn, cursor):
+        last_logged_user_norms(user_id, conn, cursor)
+    city = get_user_city(user_id, cursor)
+    if is_weather_logged_today(city, cursor):
+        get_weather_for_today(city, cursor)
+    get_water_total_today(user_id, cursor)
+    get_calories_total_today(user_id, cursor)
+    get_workout_stats_today(user_id, cursor)
+
+
+def snapshot_query(conn, cursor, user_id):
+    get_progress_snapshot(user_id, datetime.now().date(), cursor)
+
+
+def measure(func, conn, cursor, users, repeat):
+    timings = []
+    for i in range(repeat):
+        user_id = i % users + 1
+        started = time.perf_counter()
+        func(conn, cursor, user_id)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="всего строк в таблицах истории")
+    parser.add_argument("--users", type=int, default=10_000, help="количество пользователей")
+    parser.add_argument("--repeat", type=int, default=20_000, help="количество запросов")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, cursor = get_database_connection(os.path.join(tmp, "progress.db"))
+        run_migrations(conn, cursor)
+        fill(conn, cursor, args.rows, args.users)
+
+        print(f"{'вариант':<24}{'среднее, мкс':>14}{'p99, мкс':>12}")
+        for name, func in (("отдельные запросы", separate_queries), ("get_progress_snapshot", snapshot_query)):
+            mean, p99 = measure(func, conn, cursor, args.users, args.repeat)
+            print(f"{name:<24}{mean * 1e6:>14.1f}{p99 * 1e6:>12.1f}")
+        close_database_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
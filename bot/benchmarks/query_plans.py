@@ -0,0 +1,162 @@
+"""
+Проверка планов запросов на большой БД: горячие запросы из models/db_queries и /stats
+должны использовать индексы, а не полный просмотр таблиц.
+
+Создаёт временную БД с --rows строк в таблицах приёма воды, калорий, тренировок и норм,
+замеряет запросы без вторичных индексов и после миграции с индексами и печатает EXPLAIN QUERY PLAN.
+Завершается с кодом 1, если какой-то запрос всё ещё просматривает таблицу целиком.
+
+Запуск из каталога bot:
+    python -m benchmarks.query_plans --rows 10000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations, MAIN_MIGRATIONS
+from models.db_queries import (
+    get_water_total_today,
+    get_calories_total_today,
+    get_workout_stats_today,
+    last_logged_user_norms,
+    check_logged_user_norms,
+    get_weather_for_today,
+    rebuild_daily_totals
+)
+from utils.stats_engine import load_user_series
+
+DAYS = 365
+INTAKE_TABLES = ("water_intake", "calorie_intake", "workouts", "user_goals", "weather", "daily_totals")
+
+
+def hot_queries(conn, cursor, user_id, city):
+    today = datetime.now().date()
+    return {
+        "get_water_total_today": lambda: get_water_total_today(user_id, cursor),
+        "get_calories_total_today": lambda: get_calories_total_today(user_id, cursor),
+        "get_workout_stats_today": lambda: get_workout_stats_today(user_id, cursor),
+        "last_logged_user_norms": lambda: last_logged_user_norms(user_id, conn, cursor),
+        "check_logged_user_norms": lambda: check_logged_user_norms(user_id, conn, cursor),
+        "get_weather_for_today": lambda: get_weather_for_today(city, cursor),
+        "load_user_series (/stats 365)": lambda: load_user_series(conn, cursor, user_id, today - timedelta(days=364), 365),
+    }
+
+
+def fill(conn, cursor, rows, users):
+    """
+    Заполняет таблицы случайными данными за последний год: строки делятся поровну
+    между water_intake, calorie_intake, workouts и user_goals.
+    """
+    today = datetime.now().date()
+    days = [str(today - timedelta(days=i)) for i in range(DAYS)]
+    per_table = rows // 4
+    rnd = random.Random(42)
+
+    cursor.executemany(
+        "INSERT INTO users (id, name, birth_date, weight, height, gender, city) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, f"user{i}", "1990-01-01", 70, 175, "м", f"city{i % 500}") for i in range(1, users + 1))
+    )
+    cursor.executemany(
+        "INSERT INTO weather (city, date, temperature) VALUES (?, ?, ?)",
+        ((f"city{c}", day, 20.0) for c in range(500) for day in days)
+    )
+    cursor.executemany(
+        "INSERT INTO water_intake (user_id, date, water_consumed) VALUES (?, ?, ?)",
+        ((rnd.randint(1, users), rnd.choice(days), 250) for _ in range(per_table))
+    )
+    cursor.executemany(
+        "INSERT INTO calorie_intake (user_id, date, calories) VALUES (?, ?, ?)",
+        ((rnd.randint(1, users), rnd.choice(days), 300) for _ in range(per_table))
+    )
+    cursor.executemany(
+        "INSERT INTO workouts (user_id, date, workout_type, duration, calories_burned) VALUES (?, ?, ?, ?, ?)",
+        ((rnd.randint(1, users), rnd.choice(days), "бег", 30, 400) for _ in range(per_table))
+    )
+    cursor.executemany(
+        "INSERT INTO user_goals (user_id, calories_goal, water_goal, workout_goal, updated_at) VALUES (?, ?, ?, ?, ?)",
+        ((rnd.randint(1, users), 2000, 2100, 30, f"{rnd.choice(days)} 08:00:00.000000") for _ in range(per_table))
+    )
+    rebuild_daily_totals(conn, cursor)
+    conn.commit()
+
+
+def measure(queries, repeat):
+    timings = {}
+    for name, query in queries.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+        timings[name] = (time.perf_counter() - started) / repeat
+    return timings
+
+
+def capture_sql(conn, queries):
+    """
+    Возвращает SQL каждого запроса с подставленными параметрами.
+    """
+    captured = {}
+    for name, query in queries.items():
+        statements = []
+        conn.set_trace_callback(statements.append)
+        query()
+        conn.set_trace_callback(None)
+        captured[name] = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    return captured
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000, help="всего строк в таблицах истории")
+    parser.add_argument("--users", type=int, default=10_000, help="количество пользователей")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов каждого запроса")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "plans.db")
+        conn, cursor = get_database_connection(db_name)
+        cursor.execute("PRAGMA journal_mode = OFF;")
+        cursor.execute("PRAGMA synchronous = OFF;")
+
+        # Актуальная схема, но без вторичных индексов из миграции 2
+        run_migrations(conn, cursor)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%';")
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {index_name};")
+        started = time.perf_counter()
+        fill(conn, cursor, args.rows, args.users)
+        print(f"Загружено {args.rows} строк за {time.perf_counter() - started:.1f} с")
+
+        queries = hot_queries(conn, cursor, user_id=args.users // 2, city="city7")
+        before = measure(queries, max(1, args.repeat // 10))
+
+        started = time.perf_counter()
+        MAIN_MIGRATIONS[2](conn, cursor)
+        conn.commit()
+        print(f"Индексы построены за {time.perf_counter() - started:.1f} с\n")
+        after = measure(queries, args.repeat)
+
+        failed = []
+        for name, statements in capture_sql(conn, queries).items():
+            print(f"{name}: {before[name] * 1000:.2f} мс -> {after[name] * 1000:.3f} мс")
+            for sql in statements:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    print(f"    {detail}")
+                    if detail.startswith("SCAN") and any(table in detail.split() for table in INTAKE_TABLES):
+                        failed.append(name)
+        close_database_connection(conn)
+
+    if failed:
+        print(f"\nПолный просмотр таблицы в запросах: {', '.join(sorted(set(failed)))}")
+        sys.exit(1)
+    print("\nВсе запросы используют индексы.")
+
+
+if __name__ == "__main__":
+    main()
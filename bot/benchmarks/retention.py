@@ -0,0 +1,176 @@
+"""
+Сжатие истории: перенос сырых записей старше --keep-days дней в архив под нагрузкой записи.
+
+Создаёт временную БД с --users пользователями и записями воды, калорий и тренировок
+за --days дней, запускает utils.retention.compact_all и параллельно пишет воду
+от имени случайных пользователей, замеряя задержку этих записей. После переноса проверяет,
+что ряды /stats (stats_engine.load_user_series) за весь период не изменились, в архиве
+ровно перенесённые записи, а daily_totals живого диапазона совпадает с сырыми таблицами.
+Завершается с кодом 1 при расхождениях или если максимальная задержка записи больше --budget мс.
+
+Запуск из каталога bot:
+    python -m benchmarks.retention --users 300 --days 730 --keep-days 365 --budget 250
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def fill(db_name, users, days):
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_migrations import run_migrations
+    from models.db_queries import rebuild_daily_totals
+
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor)
+    rnd = random.Random(42)
+    today = datetime.now().date()
+    dates = [str(today - timedelta(days=i)) for i in range(days - 1, -1, -1)]
+    # Записи идут по дням, как при обычной работе бота: id растут вместе с датой
+    for day in dates:
+        cursor.executemany(
+            "INSERT INTO water_intake (user_id, date, water_consumed) VALUES (?, ?, ?)",
+            ((user_id, day, 250) for user_id in range(1, users + 1) for _ in range(rnd.randint(0, 6)))
+        )
+        cursor.executemany(
+            "INSERT INTO calorie_intake (user_id, date, calories) VALUES (?, ?, ?)",
+            ((user_id, day, rnd.randint(100, 900)) for user_id in range(1, users + 1) for _ in range(rnd.randint(0, 3)))
+        )
+        cursor.executemany(
+            "INSERT INTO workouts (user_id, date, workout_type, duration, calories_burned) VALUES (?, ?, ?, ?, ?)",
+            ((user_id, day, "бег", 30, 300) for user_id in range(1, users + 1) if rnd.random() < 0.3)
+        )
+    rebuild_daily_totals(conn, cursor)
+    conn.commit()
+    cursor.execute("SELECT (SELECT COUNT(*) FROM water_intake) + (SELECT COUNT(*) FROM calorie_intake) "
+                   "+ (SELECT COUNT(*) FROM workouts);")
+    rows = cursor.fetchone()[0]
+    close_database_connection(conn)
+    return rows
+
+
+def load_series(db_name, user_ids, days):
+    from models.db_utils import get_database_connection, close_database_connection
+    from utils.stats_engine import load_user_series
+
+    conn, cursor = get_database_connection(db_name)
+    start_date = datetime.now().date() - timedelta(days=days - 1)
+    series = {user_id: load_user_series(conn, cursor, user_id, start_date, days)[0] for user_id in user_ids}
+    close_database_connection(conn)
+    return series
+
+
+def verify(db_name, before):
+    """
+    :return: (сырых записей старше границы в БД, записей в архиве, расхождений daily_totals)
+    """
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_queries import RAW_INTAKE_TABLES, get_compacted_before, find_daily_totals_mismatches
+    from utils.retention import archive_files, read_archive
+
+    conn, cursor = get_database_connection(db_name)
+    left = 0
+    for table in RAW_INTAKE_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE date < ?;", (str(before),))
+        left += cursor.fetchone()[0]
+    mismatches = len(find_daily_totals_mismatches(cursor, since=get_compacted_before(cursor)))
+    close_database_connection(conn)
+    archived = sum(
+        sum(1 for _ in read_archive(path))
+        for table in RAW_INTAKE_TABLES for path in archive_files(db_name, table)
+    )
+    return left, archived, mismatches
+
+
+async def run(args):
+    from models.db_pool import database
+    from models.db_queries import log_intake_batch
+    from utils.retention import compact_all
+
+    latencies = []
+    done = asyncio.Event()
+
+    def write_water(conn, cursor, user_id, day):
+        log_intake_batch(cursor, [(user_id, day, 250)], [], [])
+
+    async def writer(seed):
+        rnd = random.Random(seed)
+        while not done.is_set():
+            user_id = rnd.randint(1, args.users)
+            started = time.perf_counter()
+            await database.for_user(user_id).write(write_water, user_id, datetime.now().date())
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    async def compact():
+        try:
+            return await compact_all(keep_days=args.keep_days, chunk_size=args.chunk)
+        finally:
+            done.set()
+
+    try:
+        await database.open()
+        started = time.perf_counter()
+        moved, *_ = await asyncio.gather(compact(), *(writer(i) for i in range(args.writers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await database.close()
+    return moved, elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--days", type=int, default=730, help="история записей, дни")
+    parser.add_argument("--keep-days", type=int, default=365, help="сколько дней сырых записей оставить")
+    parser.add_argument("--chunk", type=int, default=5000, help="записей за одну транзакцию")
+    parser.add_argument("--writers", type=int, default=4, help="параллельных задач записи воды")
+    parser.add_argument("--sample", type=int, default=50, help="у скольких пользователей сверить ряды /stats")
+    parser.add_argument("--budget", type=float, default=250.0, help="допустимая максимальная задержка записи, мс")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db_name = os.path.join(tmp, "health_tracker.db")
+        # Пути читаются из окружения при импорте настроек
+        os.environ["MAIN_DATABASE"] = db_name
+        os.environ["ARCHIVE_DIRECTORY"] = os.path.join(tmp, "archive")
+        started = time.perf_counter()
+        rows = fill(db_name, args.users, args.days)
+        print(f"Создано {rows} сырых записей за {time.perf_counter() - started:.1f} с")
+
+        sample = random.Random(1).sample(range(1, args.users + 1), min(args.sample, args.users))
+        series_before = load_series(db_name, sample, args.days)
+        moved, elapsed, latencies = asyncio.run(run(args))
+        series_after = load_series(db_name, sample, args.days)
+        # Записи во время переноса добавили воду за сегодня: сравниваем всё, кроме последнего дня
+        changed = sum(
+            not (series_before[user_id][:-1] == series_after[user_id][:-1]).all() for user_id in sample
+        )
+        before = datetime.now().date() - timedelta(days=args.keep_days)
+        left, archived, mismatches = verify(db_name, before)
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(os.environ["ARCHIVE_DIRECTORY"]) for name in names)
+
+    latencies.sort()
+    print(f"Перенесено в архив: {moved} записей за {elapsed:.2f} с, архив {size / 1024 / 1024:.1f} МиБ")
+    print(f"Осталось сырых записей старше {before}: {left}, записей в архиве: {archived}")
+    print(f"Рядов /stats изменилось: {changed} из {len(sample)}, расхождений daily_totals: {mismatches}")
+    print(
+        f"Записи во время переноса: {len(latencies)}, p50 {statistics.median(latencies) * 1000:.1f} мс, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс, макс {latencies[-1] * 1000:.1f} мс"
+    )
+    if left or archived != moved or changed or mismatches:
+        sys.exit(1)
+    if latencies[-1] * 1000 > args.budget:
+        print(f"Максимальная задержка записи больше бюджета {args.budget} мс", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Пропускная способность записи при разном количестве шардов основной БД.
+
+Для каждого количества шардов создаётся временный набор файлов, и --writers одновременных
+задач выполняют по --writes отдельных транзакций (запись воды с обновлением daily_totals)
+для случайных пользователей через models.db_pool.ShardedDatabase. У каждого шарда свой
+писатель, поэтому когда время транзакции определяется fsync, пропускная способность
+растёт с числом шардов.
+
+По умолчанию измеряются настоящие файлы во временном каталоге (в текущем каталоге, то есть
+на том же диске, что и БД бота) с PRAGMA synchronous=FULL: каждая транзакция ждёт настоящего fsync.
+На локальном диске с кэшем записи fsync почти бесплатен, и тогда предел задаёт процессор,
+а шардирование записи почти не ускоряет.
+
+--fsync-ms N добавляет к каждой транзакции N мс сна под блокировкой записи, моделируя медленный
+сетевой/облачный диск. Это эмуляция, а не измерение: такой результат помечается в выводе
+как смоделированный и не годится как оценка для реального диска.
+
+Запуск из каталога bot:
+    python -m benchmarks.shard_writes --shards 1 2 4 8 --writers 64 --writes 50
+    python -m benchmarks.shard_writes --shards 1 2 4 8 --fsync-ms 2   # эмуляция медленного диска
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+
+async def measure(shards, args, tmp):
+    from models.db_pool import ShardedDatabase
+    from models.db_utils import get_database_connection, close_database_connection, shard_database_names
+    from models.db_migrations import run_migrations
+    from models.db_queries import log_intake_batch
+
+    shared = os.path.join(tmp, f"shared{shards}.db")
+    names = shard_database_names(shards, os.path.join(tmp, f"n{shards}.shard{{index}}.db"), shared)
+    for db_name in {shared, *names}:
+        conn, cursor = get_database_connection(db_name)
+        run_migrations(conn, cursor)
+        close_database_connection(conn)
+
+    def write_water(conn, cursor, user_id, day):
+        log_intake_batch(cursor, [(user_id, day, 250)], [], [])
+        if args.fsync_ms:
+            time.sleep(args.fsync_ms / 1000)
+
+    database = ShardedDatabase(shared, names, readers=1)
+    await database.open()
+    day = datetime.now().date()
+    rnd = random.Random(shards)
+
+    async def writer():
+        for _ in range(args.writes):
+            user_id = rnd.randint(1, args.users)
+            await database.for_user(user_id).write(write_water, user_id, day)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(writer() for _ in range(args.writers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await database.close()
+    return args.writers * args.writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writers", type=int, default=64, help="одновременных задач записи")
+    parser.add_argument("--writes", type=int, default=50, help="транзакций на задачу")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--synchronous", default="FULL", help="PRAGMA synchronous для всех шардов")
+    parser.add_argument("--fsync-ms", type=float, default=0.0,
+                        help="эмулировать медленный fsync: сон на транзакцию, мс (0 — только настоящий fsync)")
+    args = parser.parse_args()
+
+    # Профиль БД читается из окружения при импорте настроек
+    os.environ["DB_SYNCHRONOUS"] = args.synchronous
+
+    baseline = None
+    if args.fsync_ms:
+        print(f"СМОДЕЛИРОВАНО: fsync эмулируется сном {args.fsync_ms:g} мс на транзакцию, "
+              f"результат не измерен на реальном диске")
+    else:
+        print(f"Настоящие файлы, PRAGMA synchronous={args.synchronous}, без эмуляции fsync")
+    print(f"{'шардов':>7}{'транзакций/с':>16}{'ускорение':>12}")
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        for shards in args.shards:
+            rate = asyncio.run(measure(shards, args, tmp))
+            baseline = baseline or rate
+            mark = " (смоделировано)" if args.fsync_ms else ""
+            print(f"{shards:>7}{rate:>16.1f}{rate / baseline:>11.2f}x{mark}")
+
+
+if __name__ == "__main__":
+    main()
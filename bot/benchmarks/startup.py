@@ -0,0 +1,113 @@
+"""
+Время холодного старта: от запуска процесса `python main.py` до ответа на первое обновление.
+
+Бот работает против фиктивного Bot API (tools/fake_telegram.FakeBotAPI), в котором
+заранее лежит одно обновление. Завершается с кодом 1, если медиана превысила бюджет
+(--budget) или базовый замер (--baseline, по умолчанию benchmarks/startup_baseline.json)
+больше чем на --tolerance.
+
+Запуск из каталога bot:
+    python -m benchmarks.startup --runs 3
+Базовый замер зависит от машины; обновить его на новой машине или после осознанного
+изменения времени запуска:
+    python -m benchmarks.startup --runs 5 --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from tools.fake_telegram import FakeBotAPI, make_update
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BOT_DIR, "benchmarks", "startup_baseline.json")
+USER_ID = 4242
+
+
+async def measure_once(port, timeout):
+    api = FakeBotAPI()
+    replies = api.listen(USER_ID)
+    api.push_update(make_update(1, USER_ID, "/log_water 250"))
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "BOT_TOKEN": "123456:STARTUP",
+            "BOT_MODE": "polling",
+            "TELEGRAM_API_URL": f"http://127.0.0.1:{port}",
+            "WEATHER_API_URL": f"http://127.0.0.1:{port}/weather",
+            "MAIN_DATABASE": os.path.join(tmp, "health_tracker.db"),
+            "FOOD_DATABASE": os.path.join(tmp, "food_cache.db"),
+            "FSM_DATABASE": os.path.join(tmp, "fsm_storage.db"),
+            "METRICS_PORT": "0",
+        }
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", cwd=BOT_DIR, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            await asyncio.wait_for(replies.get(), timeout)
+            elapsed = time.perf_counter() - started
+        finally:
+            process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(process.wait(), 15)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+            await runner.cleanup()
+    return elapsed
+
+
+async def run(args):
+    timings = []
+    for _ in range(args.runs):
+        timings.append(await measure_once(args.port, args.timeout))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=30, help="допустимая медиана, с")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON с базовым замером")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение относительно базы")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результат в --baseline")
+    parser.add_argument("--port", type=int, default=18282)
+    parser.add_argument("--timeout", type=float, default=60, help="сколько ждать первого ответа, с")
+    args = parser.parse_args()
+
+    timings = asyncio.run(run(args))
+    median = statistics.median(timings)
+    print(json.dumps({"time_to_first_update_s": median, "runs": timings}, ensure_ascii=False))
+
+    failed = False
+    if median > args.budget:
+        print(f"Медиана {median:.2f} с превышает бюджет {args.budget:.2f} с", file=sys.stderr)
+        failed = True
+    if not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["time_to_first_update_s"]
+        if median > baseline * (1 + args.tolerance):
+            print(f"Медиана {median:.2f} с хуже базовой {baseline:.2f} с больше чем на {args.tolerance:.0%}",
+                  file=sys.stderr)
+            failed = True
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({"time_to_first_update_s": median}, file)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Микробенчмарк движка /stats: загрузка рядов и агрегаты за год для одного пользователя
+без отрисовки графика. Для сравнения замеряется прежний путь: запрос за период
+и сборка дневных словарей через datetime.strptime.
+
+Завершается с кодом 1, если медиана нового пути превысила --budget миллисекунд.
+
+Запуск из каталога bot:
+    python -m benchmarks.stats_engine --days 365 --budget 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations
+from utils.stats_engine import load_user_series, summarize
+
+USER_ID = 1
+
+
+def fill(conn, cursor, days, other_users):
+    today = datetime.now().date()
+    cursor.executemany(
+        "INSERT INTO daily_totals (user_id, day, water, calories, workout_minutes, burned) VALUES (?, ?, ?, ?, ?, ?)",
+        ((user_id, str(today - timedelta(days=i)), 1500 + i % 700, 1800 + i % 500, i % 60, i % 400)
+         for user_id in range(USER_ID, USER_ID + 1 + other_users) for i in range(days))
+    )
+    # Нормы пересчитываются примерно раз в неделю
+    cursor.executemany(
+        "INSERT INTO user_goals (user_id, calories_goal, water_goal, workout_goal, updated_at) VALUES (?, ?, ?, ?, ?)",
+        ((USER_ID, 2000 + i, 2000 + i, 30, f"{today - timedelta(days=i)} 08:00:00")
+         for i in range(0, days + 30, 7))
+    )
+    conn.commit()
+
+
+def legacy_stats(conn, cursor, start_date, days):
+    """
+    Прежний generate_user_stats без отрисовки: запрос, разбор дат и словари по дням.
+    """
+    end_date = start_date + timedelta(days=days - 1)
+    cursor.execute("""
+        SELECT day, calories, water, workout_minutes
+        FROM daily_totals
+        WHERE user_id = ? AND day BETWEEN ? AND ?
+        ORDER BY day
+    """, (USER_ID, start_date, end_date))
+    rows = cursor.fetchall()
+    series = []
+    for column in (1, 2, 3):
+        by_day = {datetime.strptime(row[0], '%Y-%m-%d').date(): row[column] or 0 for row in rows}
+        series.append([by_day.get(start_date + timedelta(days=i), 0) for i in range(days)])
+    return [sum(values) for values in series]
+
+
+def engine_stats(conn, cursor, start_date, days):
+    values, goals = load_user_series(conn, cursor, USER_ID, start_date, days)
+    return summarize(values, goals, start_date)
+
+
+def measure(func, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="длина периода")
+    parser.add_argument("--other-users", type=int, default=1000, help="пользователей с такими же данными в БД")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget", type=float, default=5.0, help="допустимая медиана, мс")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, cursor = get_database_connection(os.path.join(tmp, "stats.db"))
+        run_migrations(conn, cursor)
+        fill(conn, cursor, args.days, args.other_users)
+
+        start_date = datetime.now().date() - timedelta(days=args.days - 1)
+        legacy = measure(legacy_stats, (conn, cursor, start_date, args.days), args.repeat)
+        engine = measure(engine_stats, (conn, cursor, start_date, args.days), args.repeat)
+        close_database_connection(conn)
+
+    print(f"Период {args.days} дн.: прежний путь {legacy:.3f} мс, движок {engine:.3f} мс")
+    if engine > args.budget:
+        print(f"Медиана {engine:.3f} мс превышает бюджет {args.budget} мс", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,19 @@ import os
 from dotenv import load_dotenv
 
 
-WEATHER_API_URL = "http://api.weatherstack.com/current"
-WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "")
\ No newline at end of file
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "http://api.weatherstack.com/current")
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "")
+
+OPENFOODFACTS_API_URL = os.getenv("OPENFOODFACTS_API_URL", "https://world.openfoodfacts.org/cgi/search.pl")
+# Максимум одновременных запросов к OpenFoodFacts и таймаут одного запроса, секунды
+OPENFOODFACTS_MAX_CONNECTIONS = int(os.getenv("OPENFOODFACTS_MAX_CONNECTIONS", 8))
+OPENFOODFACTS_TIMEOUT = float(os.getenv("OPENFOODFACTS_TIMEOUT", 5))
+
+# Таймаут запроса к weatherstack, секунды
+WEATHER_API_TIMEOUT = float(os.getenv("WEATHER_API_TIMEOUT", 5))
+# Сколько секунд температура города считается свежей
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", 3 * 3600))
+# Как часто обновлять погоду для городов активных пользователей, секунды
+WEATHER_REFRESH_INTERVAL = int(os.getenv("WEATHER_REFRESH_INTERVAL", 3600))
+# Пользователь активен, если что-то записывал за последние столько дней
+WEATHER_ACTIVE_DAYS = int(os.getenv("WEATHER_ACTIVE_DAYS", 7))
@@ -1 +1,66 @@
-main_database = 'health_tracker.db'
\ No newline at end of file
+import os
+
+main_database = os.getenv("MAIN_DATABASE", 'health_tracker.db')
+
+# Количество соединений на чтение в пуле (запись всегда идёт через одно соединение)
+db_readers = int(os.getenv("DB_READERS", 4))
+
+# Шардирование данных пользователей по user_id: количество файлов БД и шаблон их имён.
+# При DB_SHARDS=1 всё хранится в main_database, иначе в main_database остаются только общие таблицы (погода).
+# Изменить количество шардов можно только офлайн: python -m tools.reshard
+db_shards = int(os.getenv("DB_SHARDS", 1))
+shard_database_template = os.getenv("SHARD_DATABASE_TEMPLATE", 'health_tracker.shard{index}.db')
+
+# Локальный кэш продуктов OpenFoodFacts
+food_database = os.getenv("FOOD_DATABASE", 'food_cache.db')
+# Через сколько секунд найденный продукт считается устаревшим и обновляется в фоне
+food_cache_ttl = int(os.getenv("FOOD_CACHE_TTL", 7 * 24 * 3600))
+# Сколько секунд помнить, что продукт не найден
+food_negative_ttl = int(os.getenv("FOOD_NEGATIVE_TTL", 24 * 3600))
+
+# Групповая запись: как долго копить записи перед фиксацией (мс) и максимальный размер пачки
+ingest_flush_interval_ms = float(os.getenv("INGEST_FLUSH_INTERVAL_MS", 5))
+ingest_batch_size = int(os.getenv("INGEST_BATCH_SIZE", 256))
+
+# Профиль SQLite, применяется к каждому соединению (models/db_utils.apply_db_profile).
+# WAL позволяет читателям не блокировать писателя, synchronous=NORMAL в WAL не теряет
+# целостность, а только последние транзакции при отключении питания.
+db_profile = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    # Сколько миллисекунд ждать снятия блокировки, прежде чем вернуть "database is locked"
+    "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000)),
+    # Размер отображения файла БД в память, байт (0 — отключено)
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Отрицательное значение — размер кэша страниц в КиБ
+    "cache_size": -int(os.getenv("DB_CACHE_SIZE_KIB", 64 * 1024)),
+    "temp_store": os.getenv("DB_TEMP_STORE", "MEMORY"),
+}
+# Размер кэша подготовленных выражений на соединение
+db_cached_statements = int(os.getenv("DB_CACHED_STATEMENTS", 256))
+
+# Хранилище состояний FSM (мастер /set_profile), общее для всех процессов бота на хосте
+fsm_database = os.getenv("FSM_DATABASE", 'fsm_storage.db')
+# Через сколько секунд без действий незавершённый диалог удаляется
+fsm_state_ttl = int(os.getenv("FSM_STATE_TTL", 24 * 3600))
+# Сколько состояний держать в памяти процесса
+fsm_cache_size = int(os.getenv("FSM_CACHE_SIZE", 10000))
+# Как часто (с) проверять, не изменил ли хранилище другой процесс бота. В пределах интервала
+# состояние из кэша отдаётся без обращения к БД: изменения других процессов видны с задержкой до интервала
+fsm_version_check_interval = float(os.getenv("FSM_VERSION_CHECK_INTERVAL", 1))
+
+# Сколько пользователей хранить в кэше рассчитанных норм
+norms_cache_size = int(os.getenv("NORMS_CACHE_SIZE", 10000))
+# Сколько секунд кэшировать нормы, рассчитанные без свежей температуры (погода ещё загружается
+# в фоне или API недоступен); после этого нормы пересчитываются с загруженной погодой
+norms_weather_retry = int(os.getenv("NORMS_WEATHER_RETRY", 60))
+# Ночной пересчёт норм всех пользователей: включён ли и сколько строк записывать за одну транзакцию
+norms_batch_enabled = os.getenv("NORMS_BATCH_ENABLED", "1") == "1"
+norms_batch_chunk = int(os.getenv("NORMS_BATCH_CHUNK", 50000))
+
+# Хранение сырых записей воды, калорий и тренировок: записи старше RETENTION_DAYS дней раз в сутки
+# переносятся в сжатые CSV-архивы в archive_directory, в БД за эти дни остаются дневные итоги daily_totals.
+# RETENTION_DAYS=0 — хранить всё. retention_chunk — сколько записей переносить за одну транзакцию.
+retention_days = int(os.getenv("RETENTION_DAYS", 365))
+retention_chunk = int(os.getenv("RETENTION_CHUNK", 5000))
+archive_directory = os.getenv("ARCHIVE_DIRECTORY", 'archive')
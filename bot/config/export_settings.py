@@ -0,0 +1,10 @@
+import os
+
+# Выгрузка истории /export: сколько строк читать из БД за раз
+export_chunk_rows = int(os.getenv("EXPORT_CHUNK_ROWS", 1000))
+# Уровень сжатия gzip (1 — быстрее, 9 — меньше файл)
+export_compress_level = int(os.getenv("EXPORT_COMPRESS_LEVEL", 6))
+# Каталог временных файлов выгрузки (по умолчанию системный)
+export_directory = os.getenv("EXPORT_DIRECTORY") or None
+# Бот может отправить файл не больше 50 МБ
+export_max_bytes = int(os.getenv("EXPORT_MAX_BYTES", 50 * 1024 * 1024))
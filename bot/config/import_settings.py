@@ -0,0 +1,13 @@
+import os
+
+# Импорт истории из файла (CSV или JSON Lines, можно в gzip)
+# Сколько записей вставлять за одну транзакцию
+import_chunk_rows = int(os.getenv("IMPORT_CHUNK_ROWS", 5000))
+# Бот может скачать файл не больше 20 МБ
+import_max_bytes = int(os.getenv("IMPORT_MAX_BYTES", 20 * 1024 * 1024))
+# Сколько импортов выполняется одновременно; остальные ждут в очереди
+import_concurrency = int(os.getenv("IMPORT_CONCURRENCY", 2))
+# Как часто обновлять сообщение с ходом импорта, секунды
+import_progress_interval = float(os.getenv("IMPORT_PROGRESS_INTERVAL", 2))
+# Каталог временных файлов импорта (по умолчанию системный)
+import_directory = os.getenv("IMPORT_DIRECTORY") or None
@@ -0,0 +1,10 @@
+import os
+
+# Уровень логирования бота
+log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+# Записи выводит фоновый поток: обработчик сообщения только кладёт запись в очередь
+log_async = os.getenv("LOG_ASYNC", "1") == "1"
+# Размер очереди записей; при заполнении новые записи отбрасываются, а не блокируют бота (0 — без ограничения)
+log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Доля частых INFO-событий (по одному на сообщение пользователя, extra=SAMPLED), которые попадают в лог
+log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
@@ -0,0 +1,6 @@
+import os
+
+# Эндпоинт /metrics в формате Prometheus. По умолчанию выключен (порт 0): включается явным
+# METRICS_PORT, например 9464 — стандартные 9100 и 9090 заняты node_exporter и самим Prometheus
+metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+metrics_port = int(os.getenv("METRICS_PORT", 0))
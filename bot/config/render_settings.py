@@ -0,0 +1,13 @@
+import os
+
+# Количество процессов для отрисовки графиков /stats
+render_workers = int(os.getenv("RENDER_WORKERS", min(2, os.cpu_count() or 1)))
+# Сколько запросов может ждать свободный процесс, прежде чем новые начнут отклоняться
+render_queue_size = int(os.getenv("RENDER_QUEUE_SIZE", 8))
+# Максимальное время ожидания готового графика, секунды
+render_timeout = float(os.getenv("RENDER_TIMEOUT", 10))
+# Сколько готовых графиков /stats хранить в памяти
+stats_cache_size = int(os.getenv("STATS_CACHE_SIZE", 1024))
+# Период /stats без аргумента и максимальный период /stats N, дни
+stats_default_days = 7
+stats_max_days = int(os.getenv("STATS_MAX_DAYS", 366))
@@ -0,0 +1,35 @@
+import os
+
+
+def _bucket(name, rate, burst):
+    """
+    Лимит класса команд: rate — пополнение токенов в секунду, burst — ёмкость корзины.
+    Переопределяется через THROTTLE_<NAME>_RATE и THROTTLE_<NAME>_BURST.
+    """
+    return (
+        float(os.getenv(f"THROTTLE_{name.upper()}_RATE", rate)),
+        int(os.getenv(f"THROTTLE_{name.upper()}_BURST", burst)),
+    )
+
+
+# Лимиты на одного пользователя по классам команд
+throttle_user_buckets = {
+    # Дешёвые команды: запись воды, калорий, тренировок, /check_progress, мастер профиля
+    "logging": _bucket("logging", rate=1.0, burst=10),
+    # Отрисовка графиков /stats
+    "render": _bucket("render", rate=1 / 30, burst=3),
+    # Выгрузка всей истории /export
+    "export": _bucket("export", rate=1 / 600, burst=2),
+    # Импорт истории из присланного файла
+    "import": _bucket("import", rate=1 / 60, burst=3),
+    # Поиск продукта во внешнем API (/log_calories <продукт>)
+    "lookup": _bucket("lookup", rate=1 / 10, burst=5),
+}
+
+# Общий бюджет на всех пользователей для дорогих классов
+throttle_global_buckets = {
+    "render": _bucket("global_render", rate=2.0, burst=10),
+    "export": _bucket("global_export", rate=0.5, burst=5),
+    "import": _bucket("global_import", rate=0.5, burst=5),
+    "lookup": _bucket("global_lookup", rate=5.0, burst=20),
+}
@@ -0,0 +1,25 @@
+import os
+
+# Режим получения обновлений: polling или webhook
+bot_mode = os.getenv("BOT_MODE", "polling")
+
+# Публичный адрес, который сообщается Telegram (например, https://bot.example.com)
+webhook_base_url = os.getenv("WEBHOOK_BASE_URL", "")
+webhook_path = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token; без него режим webhook не запускается,
+# иначе обновления мог бы присылать любой, кто узнал адрес. Допустимы символы A-Z, a-z, 0-9, _ и -
+webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+# Адрес, на котором слушает aiohttp-сервер
+webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+webhook_port = int(os.getenv("WEBHOOK_PORT", 8080))
+# Количество обработчиков обновлений и размер очереди перед ними
+webhook_workers = int(os.getenv("WEBHOOK_WORKERS", 16))
+webhook_queue_size = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))
+# Сколько последних update_id помнить для отбрасывания повторов
+webhook_dedup_size = int(os.getenv("WEBHOOK_DEDUP_SIZE", 10000))
+# SO_REUSEPORT: несколько процессов бота слушают один порт. Повторы update_id отбрасываются
+# только внутри процесса, поэтому ретрай Telegram, попавший в другой процесс, будет обработан дважды
+webhook_reuse_port = os.getenv("WEBHOOK_REUSE_PORT", "0") == "1"
+
+# Адрес Bot API; переопределяется для локального тестирования (tools/fake_telegram.py)
+telegram_api_url = os.getenv("TELEGRAM_API_URL", "")
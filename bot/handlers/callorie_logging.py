@@ -1,19 +1,20 @@
 from aiogram import Router, F
 from aiogram.types import Message
 
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
-from models.db_queries import log_calories, get_calories_total_today, last_logged_user_norms
+from models.ingest_queue import ingest_queue
+from utils.stats_cache import stats_cache
+from utils.norms_cache import get_user_norms
 from utils.openfoodfacts_api import get_food_info
-from utils.logging import setup_logger
+from utils.logging import setup_logger, SAMPLED
 
 logger = setup_logger()
 
 router = Router()
 
+
 @router.message(F.text.startswith("/log_calories"))
 async def handle_log_calories(message: Message):
-    logger.info(f"Получена команда /log_calories")
+    logger.info("Получена команда /log_calories", extra=SAMPLED)
     try:
         user_id = message.from_user.id
         args = message.text.split(maxsplit=1)
@@ -34,7 +35,7 @@ async def handle_log_calories(message: Message):
                 return
         except ValueError:
             # Если это не число, пробуем найти информацию о продукте
-            food_info = get_food_info(input_value)
+            food_info = await get_food_info(input_value)
             if not food_info:
                 await message.reply("Не удалось найти информацию о продукте. Уточните название и попробуйте снова.")
                 return
@@ -48,28 +49,17 @@ async def handle_log_calories(message: Message):
 
             await message.reply(f"Продукт: {product_name} добавлен ({amount} ккал на 100 г).")
 
-        # Подключение к базе данных
-        conn, cursor = get_database_connection(main_database)
-
-        # Получаем последнюю запись норм пользователя
-        last_norms = last_logged_user_norms(user_id, conn, cursor)
-        if not last_norms:
+        norms = await get_user_norms(user_id)
+        if norms is None:
             await message.reply("Не удалось определить вашу дневную норму калорий. Убедитесь, что ваш профиль настроен.")
-            close_database_connection(conn)
             return
 
-        # Извлекаем дневную норму калорий из последней записи
-        daily_calories_goal, _, _, _ = last_norms
-
-        # Логируем калории в базу данных
-        log_calories(cursor, user_id, amount)
-        conn.commit()
-
-        # Получаем суммарное количество потребленных калорий за день
-        total_today = get_calories_total_today(user_id, cursor)
+        # Запись уходит в общую пачку, ответ — после фиксации транзакции
+        totals = await ingest_queue.log_calories(user_id, amount)
+        total_today = totals.calories
+        stats_cache.invalidate_user(user_id)
 
-        # Закрываем соединение с базой данных
-        close_database_connection(conn)
+        daily_calories_goal = norms.calories_goal
 
         # Расчет оставшегося количества калорий
         remaining = max(0, daily_calories_goal - total_today)
@@ -79,4 +69,4 @@ async def handle_log_calories(message: Message):
         )
     except Exception as e:
         await message.reply("Произошла ошибка при обработке данных.")
-        print(e)
+        logger.error("Ошибка при логировании калорий для пользователя %s: %s", message.from_user.id, e)
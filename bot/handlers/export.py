@@ -0,0 +1,48 @@
+import os
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+
+from config.export_settings import export_max_bytes
+from utils.export import export_user_history
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+router = Router()
+
+# Аргумент /export -> формат utils.export.EXPORT_FORMATS
+FORMAT_ARGS = {"": "csv", "csv": "csv", "json": "jsonl", "jsonl": "jsonl"}
+
+
+@router.message(Command(commands=["export"]))
+async def export_history(message: Message, command: CommandObject):
+    logger.debug("Получена команда /export %s", command.args or '')
+    user_id = message.from_user.id
+    fmt = FORMAT_ARGS.get((command.args or "").strip().lower())
+    if fmt is None:
+        await message.reply("Укажите формат: /export csv или /export json")
+        return
+
+    try:
+        export = await export_user_history(user_id, fmt)
+    except Exception as e:
+        logger.error("Ошибка при выгрузке истории пользователя %s: %s", user_id, e)
+        await message.answer("Не удалось выгрузить данные. Попробуйте позже.")
+        return
+
+    try:
+        if export.rows == 0:
+            await message.answer("Данных пока нет. Используйте /set_profile, чтобы настроить профиль.")
+            return
+        if export.size > export_max_bytes:
+            logger.warning("Выгрузка пользователя %s больше лимита Telegram: %s байт", user_id, export.size)
+            await message.answer("Выгрузка слишком большая для отправки в Telegram.")
+            return
+        await message.answer_document(
+            FSInputFile(export.path, filename=export.filename),
+            caption=f"Ваши данные: {export.rows} записей (gzip, {fmt.upper()})"
+        )
+    finally:
+        os.remove(export.path)
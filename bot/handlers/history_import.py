@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from config.import_settings import import_max_bytes, import_concurrency, import_progress_interval, import_directory
+from models.db_pool import database
+from models.db_queries import get_user_profile, get_history_import
+from utils.history_import import ImportStats, ImportFormatError, import_history
+from utils.stats_cache import stats_cache
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+router = Router()
+
+# Импорты выполняются не больше чем по import_concurrency одновременно, у пользователя — один
+_import_slots = asyncio.Semaphore(import_concurrency)
+_active_users = set()
+
+IMPORT_HELP = (
+    "Отправьте файл с историей как документ (CSV или JSON Lines, можно сжатый gzip, до "
+    f"{import_max_bytes // (1024 * 1024)} МБ) — тот же формат, что выдаёт /export.\n\n"
+    "CSV: заголовок раздела начинается со столбца table, например\n"
+    "table,date,water_consumed\nwater_intake,2024-05-01,250\n"
+    "table,date,calories\ncalorie_intake,2024-05-01,450\n"
+    "table,date,workout_type,duration,calories_burned\nworkouts,2024-05-01,бег,30,\n\n"
+    "JSON Lines: по объекту на строку, например\n"
+    '{"table": "water_intake", "date": "2024-05-01", "water_consumed": 250}\n\n'
+    "Даты — ГГГГ-ММ-ДД или ДД.ММ.ГГГГ. Профиль и нормы из файла не импортируются."
+)
+
+
+def _get_profile(conn, cursor, user_id):
+    return get_user_profile(user_id, cursor)
+
+
+def _get_history_import(conn, cursor, user_id, file_unique_id):
+    return get_history_import(user_id, file_unique_id, cursor)
+
+
+async def _edit(status: Message, text):
+    try:
+        await status.edit_text(text)
+    except TelegramBadRequest as e:
+        # Например, "message is not modified"
+        logger.debug("Сообщение о ходе импорта не обновлено: %s", e)
+
+
+def format_summary(stats: ImportStats, title):
+    lines = [
+        f"{title}: {stats.imported} записей",
+        f"Вода: {stats.water}, калории: {stats.calories}, тренировки: {stats.workouts}",
+    ]
+    if stats.skipped:
+        lines.append(f"Пропущено строк профиля и норм: {stats.skipped}")
+    if stats.invalid:
+        lines.append(f"Строк с ошибками: {stats.invalid}")
+        lines.extend(stats.errors)
+    return "\n".join(lines)
+
+
+@router.message(Command(commands=["import"]))
+async def import_help(message: Message):
+    await message.answer(IMPORT_HELP)
+
+
+@router.message(F.document)
+async def import_document(message: Message):
+    user_id = message.from_user.id
+    document = message.document
+    logger.info("Пользователь %s прислал файл для импорта: %s, %s байт", user_id, document.file_name, document.file_size)
+
+    if document.file_size and document.file_size > import_max_bytes:
+        await message.reply(f"Файл больше {import_max_bytes // (1024 * 1024)} МБ. Разделите его на части.")
+        return
+    if user_id in _active_users:
+        await message.reply("Предыдущий импорт ещё идёт. Дождитесь его завершения.")
+        return
+
+    _active_users.add(user_id)
+    try:
+        await _import_document(message, user_id)
+    finally:
+        _active_users.discard(user_id)
+
+
+async def _import_document(message: Message, user_id):
+    document = message.document
+    shard = database.for_user(user_id)
+    profile = await shard.read(_get_profile, user_id)
+    if profile is None:
+        await message.reply("Сначала настройте профиль с помощью /set_profile.")
+        return
+    previous = await shard.read(_get_history_import, user_id, document.file_unique_id)
+    resume_line = 0
+    if previous is not None:
+        imported_rows, resume_line, completed = previous
+        if completed:
+            await message.reply("Этот файл уже импортирован.")
+            return
+        # Прошлый импорт этого файла прервался: записанные пачки не повторяем
+        await message.reply(
+            f"Продолжаем прерванный импорт: {imported_rows} записей уже загружено, "
+            f"начинаем после строки {resume_line}."
+        )
+
+    stats = ImportStats()
+    fd, path = tempfile.mkstemp(prefix=f"import-{user_id}-", dir=import_directory)
+    os.close(fd)
+    status = await message.answer("Импорт: файл в очереди…")
+    last_update = time.monotonic()
+
+    async def report(stats):
+        nonlocal last_update
+        if time.monotonic() - last_update >= import_progress_interval:
+            last_update = time.monotonic()
+            await _edit(status, f"Импорт: записано {stats.imported} записей…")
+
+    try:
+        async with _import_slots:
+            await _edit(status, "Импорт: загрузка файла…")
+            await message.bot.download(document, destination=path)
+            weight = profile[4]
+            await import_history(
+                user_id, path, stats, weight, document.file_unique_id, progress=report, resume_line=resume_line
+            )
+    except ImportFormatError as e:
+        logger.warning("Файл пользователя %s не разобран: %s", user_id, e)
+        await _edit(status, f"Не удалось разобрать файл: {e}\n\n{format_summary(stats, 'Импортировано до ошибки')}")
+    except Exception as e:
+        logger.error("Ошибка при импорте истории пользователя %s: %s", user_id, e)
+        await _edit(
+            status,
+            "Произошла ошибка при импорте. Отправьте тот же файл ещё раз — импорт продолжится "
+            f"с места остановки.\n\n{format_summary(stats, 'Импортировано до ошибки')}"
+        )
+    else:
+        await _edit(status, format_summary(stats, "Импорт завершён"))
+    finally:
+        os.remove(path)
+        if stats.imported:
+            stats_cache.invalidate_user(user_id)
@@ -4,12 +4,13 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime
 
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
+from models.db_pool import database
 from models.db_queries import save_user_profile
 
 from utils.calculations import calculate_age
-from utils.logging import setup_logger
+from utils.norms_cache import norms_cache
+from utils.stats_cache import stats_cache
+from utils.logging import setup_logger, SAMPLED
 
 logger = setup_logger()
 
@@ -26,10 +27,14 @@ class ProfileSetup(StatesGroup):
     waiting_for_prefered_calories = State()
     waiting_for_prefered_workout = State()
 
+
+def _save_profile(conn, cursor, *profile):
+    return save_user_profile(*profile, conn, cursor)
+
 @router.message(F.text == "/set_profile")
 
 async def cmd_set_profile(message: Message, state: FSMContext):
-    logger.info(f"Получена команда /set_profile")
+    logger.info("Получена команда /set_profile", extra=SAMPLED)
     await message.answer("Введите ваше имя:")
     await state.set_state(ProfileSetup.waiting_for_name)
 
@@ -134,16 +139,16 @@ async def process_prefered_workout(message: Message, state: FSMContext):
     prefered_workout = user_data.get("prefered_workout")
 
 
-    conn, cursor = get_database_connection(main_database)
-
-    save_user_profile(
+    norms_changed = await database.for_user(user_id).write(
+        _save_profile,
         user_id, username, name, birth_date,
         city, height, weight, gender,
-        prefered_water, prefered_calories, prefered_workout,
-        conn, cursor
+        prefered_water, prefered_calories, prefered_workout
     )
-
-    close_database_connection(conn)
+    if norms_changed:
+        norms_cache.invalidate_user(user_id)
+        # Нормы на графике /stats тоже изменились
+        stats_cache.invalidate_user(user_id)
 
     await message.answer(
         f"Ваш профиль сохранён:\nИмя: {name}\n"
@@ -2,34 +2,33 @@ from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from keyboards.main_menu import main_menu
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
+from models.db_pool import database
 from models.db_queries import get_user_profile, get_user_profile_full
 from utils.calculations import calculate_age
-from utils.logging import setup_logger
+from utils.logging import setup_logger, SAMPLED
 
 router = Router()
 
 logger = setup_logger()
 
+
+def _get_profile(conn, cursor, user_id):
+    return get_user_profile_full(user_id, cursor)
+
+
 @router.message(F.text == "/start")
 async def cmd_start(message: Message, state: FSMContext):
-    logger.info(f"Получена команда /start от пользователя {message.from_user.id} ({message.from_user.username})")
+    logger.info("Получена команда /start от пользователя %s (%s)", message.from_user.id, message.from_user.username,
+                extra=SAMPLED)
     
     user_id = message.from_user.id
     username = message.from_user.username
 
     try:
-        logger.info(f"Подключение к базе данных для пользователя {user_id}")
-        conn, cursor = get_database_connection(main_database)
-
-        logger.info(f"Попытка получить профиль пользователя {user_id} из базы данных")
-        profile = get_user_profile_full(user_id, cursor)
-
-        logger.info(f"Закрытие соединения с базой данных для пользователя {user_id}")
-        close_database_connection(conn)
+        logger.debug("Попытка получить профиль пользователя %s из базы данных", user_id)
+        profile = await database.for_user(user_id).read(_get_profile, user_id)
     except Exception as e:
-        logger.error(f"Ошибка при работе с базой данных для пользователя {user_id}: {e}")
+        logger.error("Ошибка при работе с базой данных для пользователя %s: %s", user_id, e)
         await message.answer("Произошла ошибка при доступе к базе данных. Пожалуйста, попробуйте позже.")
         return
 
@@ -38,7 +37,7 @@ async def cmd_start(message: Message, state: FSMContext):
         age = calculate_age(birth_date)
         gender_display = "Мужской" if gender.lower() == "м" else "Женский"
         
-        logger.info(f"Профиль для пользователя {user_id} найден: {profile}")
+        logger.debug("Профиль для пользователя %s найден: %s", user_id, profile)
         await message.answer(
             f"Ваш профиль:\n"
             f"Имя: {name}\n"
@@ -51,7 +50,7 @@ async def cmd_start(message: Message, state: FSMContext):
             reply_markup=main_menu
         )
     else:
-        logger.warning(f"Профиль для пользователя {user_id} не найден.")
+        logger.warning("Профиль для пользователя %s не найден.", user_id)
         await message.answer(
             "Привет! Используйте /set_profile, чтобы настроить свой профиль.",
             reply_markup=main_menu
@@ -0,0 +1,69 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, BufferedInputFile
+
+from config.render_settings import stats_default_days, stats_max_days
+from utils.user_stats import generate_user_stats
+from utils.render_pool import RenderPoolBusy
+from utils.stats_cache import stats_cache
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+router = Router()
+
+
+async def _generate(message: Message, user_id, days):
+    """
+    Строит график, а при перегрузке пула отрисовки или таймауте отвечает пользователю.
+
+    :return: StatsChart или None, если график построить не удалось
+    """
+    try:
+        return await generate_user_stats(user_id, days)
+    except RenderPoolBusy:
+        logger.warning("Очередь отрисовки заполнена, /stats для %s отклонён", user_id)
+        await message.answer("Сейчас слишком много запросов статистики. Попробуйте через минуту.")
+    except asyncio.TimeoutError:
+        logger.error("Отрисовка /stats для %s не уложилась в таймаут", user_id)
+        await message.answer("Не удалось построить статистику вовремя. Попробуйте позже.")
+    return None
+
+
+@router.message(Command(commands=["stats"]))
+async def send_stats(message: Message, command: CommandObject):
+    logger.debug("Получена команда /stats %s", command.args or '')
+    user_id = message.from_user.id
+    days = stats_default_days
+    if command.args:
+        try:
+            days = int(command.args.strip())
+        except ValueError:
+            days = 0
+        if not 1 <= days <= stats_max_days:
+            await message.reply(f"Укажите период в днях от 1 до {stats_max_days}. Например: /stats 30")
+            return
+
+    chart = await _generate(message, user_id, days)
+    if chart is None:
+        return
+
+    if chart.file_id:
+        # Изображение уже загружено в Telegram: отправляем по file_id без отрисовки и загрузки
+        try:
+            await message.answer_photo(photo=chart.file_id, caption=chart.caption)
+            return
+        except TelegramBadRequest as e:
+            logger.warning("file_id графика %s отклонён Telegram: %s", chart.key[:12], e)
+            stats_cache.discard(chart.key)
+            stats_cache.invalidate_user(user_id)
+            chart = await _generate(message, user_id, days)
+            if chart is None:
+                return
+
+    image_file = BufferedInputFile(file=chart.image, filename="user_stats.png")
+    sent = await message.answer_photo(photo=image_file, caption=chart.caption)
+    stats_cache.set_file_id(chart.key, sent.photo[-1].file_id)
@@ -1,14 +1,16 @@
 from aiogram import Router, types, F
 from aiogram.types import Message
 
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
-from models.db_queries import log_water, get_water_total_today, last_logged_user_norms
-
+from models.ingest_queue import ingest_queue
+from utils.stats_cache import stats_cache
+from utils.norms_cache import get_user_norms
+from utils.logging import setup_logger
 
+logger = setup_logger()
 
 router = Router()
 
+
 @router.message(F.text.startswith("/log_water"))
 async def handle_log_water(message: Message):
     try:
@@ -23,28 +25,17 @@ async def handle_log_water(message: Message):
             await message.reply("Количество воды должно быть положительным числом.")
             return
 
-        # Подключение к базе данных
-        conn, cursor = get_database_connection(main_database)
-
-        # Получаем последнюю запись норм пользователя
-        last_norms = last_logged_user_norms(user_id, conn, cursor)
-        if not last_norms:
+        norms = await get_user_norms(user_id)
+        if norms is None:
             await message.reply("Не удалось определить вашу дневную норму воды. Убедитесь, что ваш профиль настроен.")
-            close_database_connection(conn)
             return
 
-        # Извлекаем дневную норму воды из последней записи
-        _, daily_water_goal, _, _ = last_norms
-
-        # Логируем воду в базу данных
-        log_water(cursor, user_id, amount)
-        conn.commit()
-
-        # Получаем суммарное количество выпитой воды за день
-        total_today = get_water_total_today(user_id, cursor)
+        # Запись уходит в общую пачку, ответ — после фиксации транзакции
+        totals = await ingest_queue.log_water(user_id, amount)
+        total_today = totals.water
+        stats_cache.invalidate_user(user_id)
 
-        # Закрываем соединение с базой данных
-        close_database_connection(conn)
+        daily_water_goal = norms.water_goal
 
         # Расчет оставшегося количества
         remaining = max(0, daily_water_goal - total_today)
@@ -56,5 +47,5 @@ async def handle_log_water(message: Message):
         await message.reply("Пожалуйста, введите корректное количество воды в миллилитрах.")
     except Exception as e:
         await message.reply("Произошла ошибка при логировании воды.")
-        print(e)
+        logger.error("Ошибка при логировании воды для пользователя %s: %s", message.from_user.id, e)
 
@@ -1,25 +1,24 @@
 from datetime import datetime
 from aiogram import Router, F
 from aiogram.types import Message
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
-from models.db_queries import log_workout
-from utils.logging import setup_logger
+from models.db_pool import database
+from models.ingest_queue import ingest_queue
+from utils.stats_cache import stats_cache
+from utils.calculations import MET_VALUES, calculate_burned_calories
+from utils.logging import setup_logger, SAMPLED
 
 router = Router()
 logger = setup_logger()
 
-# MET-значения для фиксированных тренировок
-MET_VALUES = {
-    "бег": 9.8,
-    "йога": 2.5,
-    "силовая": 6.0,
-    "велосипед": 8.0
-}
+
+def _get_user_weight(conn, cursor, user_id):
+    cursor.execute("SELECT weight FROM users WHERE id = ?", (user_id,))
+    user_data = cursor.fetchone()
+    return user_data[0] if user_data else None
 
 @router.message(F.text.startswith("/log_workout"))
 async def handle_log_workout(message: Message):
-    logger.info(f"Получена команда /log_workout")
+    logger.info("Получена команда /log_workout", extra=SAMPLED)
     try:
         user_id = message.from_user.id
         args = message.text.split()
@@ -32,15 +31,12 @@ async def handle_log_workout(message: Message):
             await message.reply("Неверный тип тренировки. Доступные варианты: бег, йога, силовая, велосипед.")
             return
 
-        conn, cursor = get_database_connection(main_database)
-
         # Если пользователь указал "калории", просто сохраняем
         if workout_type == "калории":
             calories_burned = int(args[2])
-            log_workout(cursor, user_id, None, None, calories_burned)
-            conn.commit()
+            await ingest_queue.log_workout(user_id, None, None, calories_burned)
+            stats_cache.invalidate_user(user_id)
             await message.reply(f"🏋️‍♂️ Тренировка успешно записана! Сожжено калорий: {calories_burned} ккал.")
-            close_database_connection(conn)
             return
 
         # Если указан тип тренировки, рассчитываем калории
@@ -49,19 +45,15 @@ async def handle_log_workout(message: Message):
             await message.reply("Продолжительность тренировки должна быть положительным числом.")
             return
 
-        cursor.execute("SELECT weight FROM users WHERE id = ?", (user_id,))
-        user_data = cursor.fetchone()
-        if not user_data:
+        weight = await database.for_user(user_id).read(_get_user_weight, user_id)
+        if weight is None:
             await message.reply("Не удалось найти ваш профиль. Настройте его с помощью команды /set_profile.")
-            close_database_connection(conn)
             return
 
-        weight = user_data[0]
-        met = MET_VALUES[workout_type]
-        calories_burned = weight * met * (duration / 60)  # Рассчёт калорий
+        calories_burned = calculate_burned_calories(weight, workout_type, duration)
 
-        log_workout(cursor, user_id, workout_type, duration, calories_burned)
-        conn.commit()
+        await ingest_queue.log_workout(user_id, workout_type, duration, calories_burned)
+        stats_cache.invalidate_user(user_id)
 
         # Рассчёт дополнительной воды
         additional_water = duration * 10
@@ -73,9 +65,8 @@ async def handle_log_workout(message: Message):
             f"Сожжено калорий: {calories_burned:.1f} ккал\n\n"
             f"💧 Рекомендуется выпить {additional_water} мл воды после тренировки."
         )
-        close_database_connection(conn)
     except ValueError:
         await message.reply("Пожалуйста, введите корректное число для длительности или калорий.")
     except Exception as e:
-        logger.error(f"Ошибка при логировании тренировки: {e}")
+        logger.error("Ошибка при логировании тренировки: %s", e)
         await message.reply("Произошла ошибка при логировании тренировки.")
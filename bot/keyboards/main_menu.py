@@ -4,7 +4,7 @@ main_menu = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="/check_progress"),KeyboardButton(text="/stats")],
         [KeyboardButton(text="/log_water"),KeyboardButton(text="/log_calories"),KeyboardButton(text="/log_workout")],
-        [KeyboardButton(text="/set_profile")]
+        [KeyboardButton(text="/set_profile"),KeyboardButton(text="/export")]
     ],
     resize_keyboard=True
 )
\ No newline at end of file
@@ -1,49 +1,58 @@
-import os
-from aiogram import Bot, Dispatcher, F, types
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InputFile, FSInputFile
-from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.filters import Command 
 import asyncio
-#from aiogram.utils import executor
 
-from io import BytesIO
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from config.bot_token import BOT_TOKEN
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
-from models.db_tables import setup_users, setup_user_goals, setup_workouts, setup_calorie_intake, setup_water_intake, setup_weather
-from utils.user_stats import generate_user_stats
-
-from handlers import  start, profile, progress, water_logging, callorie_logging, workout_logging
+from config.db_settings import (
+    main_database, food_database, fsm_database, fsm_state_ttl, fsm_cache_size, norms_batch_enabled, retention_days
+)
+from config.webhook_settings import (
+    bot_mode,
+    webhook_base_url,
+    webhook_path,
+    webhook_secret,
+    webhook_host,
+    webhook_port,
+    webhook_workers,
+    webhook_queue_size,
+    webhook_dedup_size,
+    webhook_reuse_port,
+    telegram_api_url
+)
+from config.metrics_settings import metrics_host, metrics_port
+from models.db_utils import get_database_connection, close_database_connection, shard_database_names
+from models.db_pool import database
+from models.ingest_queue import ingest_queue
+from models.db_migrations import run_migrations, MAIN_MIGRATIONS, FOOD_MIGRATIONS, FSM_MIGRATIONS
+from utils.render_pool import render_pool
+from utils.user_stats import warm_up_renderer
+from utils.fsm_storage import SQLiteStorage
+from utils.openfoodfacts_api import food_client, food_store
+from utils.weather_api import weather_client, prefetch_weather_loop
+from utils.norms_batch import norms_batch_loop
+from utils.retention import retention_loop
+from utils.webhook import WebhookServer
+from utils.metrics import start_metrics_server
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.metrics import MetricsMiddleware
+
+from handlers import (
+    start, profile, progress, water_logging, callorie_logging, workout_logging, stats, export, history_import
+)
 
 from utils.logging import setup_logger
 
 logger = setup_logger()
 
 
-API_TOKEN = BOT_TOKEN
-
-
-bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+# Импорт модуля не трогает БД и сеть: бот создаётся и БД готовится в main()
+storage = SQLiteStorage(fsm_database, ttl=fsm_state_ttl, cache_size=fsm_cache_size)
 dp = Dispatcher(storage=storage)
-
-# Настройка базы данных
-logger.debug(f"Подготовка БД и таблиц начата")
-conn, cursor = get_database_connection(main_database)
-
-setup_users(conn, cursor)
-setup_user_goals(conn, cursor)
-setup_workouts(conn, cursor)
-setup_calorie_intake(conn, cursor)
-setup_water_intake(conn, cursor)
-setup_weather(conn, cursor)
-
-close_database_connection(conn)
-logger.debug(f"Подготовка БД и таблиц закончена")
-
+# Лимиты проверяются до фильтров и FSM, чтобы отброшенные сообщения ничего не стоили
+dp.message.outer_middleware(ThrottlingMiddleware())
+dp.message.middleware(MetricsMiddleware())
 
 dp.include_router(start.router)
 dp.include_router(profile.router)
@@ -51,25 +60,109 @@ dp.include_router(progress.router)
 dp.include_router(water_logging.router)
 dp.include_router(callorie_logging.router)
 dp.include_router(workout_logging.router)
-
-from aiogram.types import BufferedInputFile
-
-@dp.message(Command(commands=["stats"]))
-async def send_stats(message: Message):
-    logger.debug(f"Получена команда /stats")
-    user_id = message.from_user.id 
-    stats_image, caption = generate_user_stats(user_id)
-    stats_image.seek(0)
-    image_file = BufferedInputFile(file=stats_image.read(), filename="user_stats.png")
-    await message.answer_photo(photo=image_file, caption=caption)
+dp.include_router(stats.router)
+dp.include_router(export.router)
+dp.include_router(history_import.router)
+
+
+def setup_databases():
+    """
+    Применяет миграции ко всем БД бота.
+    """
+    logger.debug("Подготовка БД и таблиц начата")
+    # Шарды получают ту же схему, что и основная БД
+    shards = [(db_name, MAIN_MIGRATIONS) for db_name in shard_database_names() if db_name != main_database]
+    for db_name, migrations in (
+        (main_database, MAIN_MIGRATIONS),
+        *shards,
+        (food_database, FOOD_MIGRATIONS),
+        (fsm_database, FSM_MIGRATIONS),
+    ):
+        conn, cursor = get_database_connection(db_name)
+        try:
+            run_migrations(conn, cursor, migrations)
+        finally:
+            close_database_connection(conn)
+    logger.debug("Подготовка БД и таблиц закончена")
+
+
+def create_bot():
+    session = None
+    if telegram_api_url:
+        # Локальный сервер Bot API или tools/fake_telegram.py
+        session = AiohttpSession(api=TelegramAPIServer.from_base(telegram_api_url))
+    return Bot(token=BOT_TOKEN, session=session)
+
+
+async def run_webhook(bot):
+    server = WebhookServer(
+        dp, bot,
+        path=webhook_path,
+        secret=webhook_secret,
+        workers=webhook_workers,
+        queue_size=webhook_queue_size,
+        dedup_size=webhook_dedup_size
+    )
+    await server.start(webhook_host, webhook_port, url=webhook_base_url, reuse_port=webhook_reuse_port)
+    try:
+        await dp.emit_startup(bot=bot)
+        # Работаем, пока задачу не отменят (Ctrl+C / SIGTERM)
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(bot=bot)
+        logger.info("Webhook-сервер остановлен: %s", server.stats())
 
 
 async def main():
+    if bot_mode == "webhook" and not webhook_secret:
+        # Проверяем до открытия БД и запуска фоновых задач
+        raise ValueError("Для BOT_MODE=webhook задайте WEBHOOK_SECRET")
+    setup_databases()
+    bot = create_bot()
+    weather_prefetch = None
+    norms_batch = None
+    retention = None
+    renderer_warm_up = None
+    metrics_runner = None
     try:
-        await dp.start_polling(bot)
+        await database.open()
+        if metrics_port:
+            try:
+                metrics_runner = await start_metrics_server(metrics_host, metrics_port)
+            except OSError as e:
+                # Метрики не обязательны для работы бота: занятый порт не должен его останавливать
+                logger.error("Не удалось запустить /metrics на %s:%s: %s", metrics_host, metrics_port, e)
+        weather_prefetch = asyncio.create_task(prefetch_weather_loop())
+        if norms_batch_enabled:
+            norms_batch = asyncio.create_task(norms_batch_loop())
+        if retention_days > 0:
+            retention = asyncio.create_task(retention_loop())
+        # Процессы отрисовки с matplotlib поднимаются в фоне, не задерживая первые обновления
+        renderer_warm_up = asyncio.create_task(render_pool.warm_up(warm_up_renderer))
+        if bot_mode == "webhook":
+            await run_webhook(bot)
+        else:
+            await dp.start_polling(bot)
     finally:
+        if weather_prefetch is not None:
+            weather_prefetch.cancel()
+        if norms_batch is not None:
+            norms_batch.cancel()
+        if retention is not None:
+            retention.cancel()
+        if renderer_warm_up is not None:
+            renderer_warm_up.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await bot.session.close()
-        conn.close()
+        await ingest_queue.close()
+        await database.close()
+        await storage.close()
+        await food_client.close()
+        await food_store.close()
+        await weather_client.close()
+        render_pool.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,27 @@
+import time
+
+from aiogram import BaseMiddleware
+
+from utils.metrics import metrics
+
+handler_latency = metrics.histogram("bot_handler_seconds", "Время обработки сообщения хендлером", ("handler",))
+handler_errors = metrics.counter("bot_handler_errors_total", "Исключения, вышедшие из хендлера", ("handler",))
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Замеряет время каждого хендлера и считает необработанные исключения.
+    Ставится как внутренний middleware, чтобы в data уже был выбранный хендлер.
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, name)
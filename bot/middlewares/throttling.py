@@ -0,0 +1,74 @@
+import math
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+from config.throttling_settings import throttle_user_buckets, throttle_global_buckets
+from utils.rate_limit import TokenBucket, KeyedRateLimiter
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+throttled_messages = metrics.counter("bot_throttled_messages_total", "Сообщения, отброшенные лимитом частоты", ("kind",))
+
+
+def command_class(text):
+    """
+    Определяет класс команды по тексту сообщения.
+
+    :return: "render", "export", "lookup" или "logging"
+    """
+    parts = (text or "").split(maxsplit=1)
+    command = parts[0].split("@")[0] if parts else ""
+    if command == "/stats":
+        return "render"
+    if command == "/export":
+        return "export"
+    if command == "/log_calories" and len(parts) == 2:
+        try:
+            int(parts[1])
+        except ValueError:
+            return "lookup"
+    return "logging"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту сообщений корзинами токенов: на каждого пользователя по классу команды
+    и общим бюджетом для дорогих классов (отрисовка графиков, выгрузка и импорт истории, запросы к внешним API).
+    Пока пользователь упирается в лимит, ему отвечают один раз, остальные сообщения молча отбрасываются.
+    """
+
+    def __init__(self, user_buckets=throttle_user_buckets, global_buckets=throttle_global_buckets):
+        # Свой набор корзин на каждый класс: у всех корзин набора одинаковый срок пополнения
+        self._users = {kind: KeyedRateLimiter(rate, burst) for kind, (rate, burst) in user_buckets.items()}
+        self._global = {name: TokenBucket(rate, burst) for name, (rate, burst) in global_buckets.items()}
+
+    async def __call__(self, handler, event: Message, data):
+        if event.from_user is None:
+            return await handler(event, data)
+
+        user_id = event.from_user.id
+        # Присланный документ — импорт истории
+        kind = "import" if event.document else command_class(event.text)
+        allowed, bucket = self._users[kind].try_acquire(user_id)
+        retry_after = bucket.retry_after()
+        if allowed and kind in self._global:
+            global_bucket = self._global[kind]
+            if not global_bucket.try_acquire():
+                # Общий бюджет исчерпан: токен пользователя не тратим
+                allowed = False
+                bucket.refund()
+                retry_after = global_bucket.retry_after()
+
+        if allowed:
+            bucket.warned = False
+            return await handler(event, data)
+
+        throttled_messages.inc(kind)
+        if not bucket.warned:
+            bucket.warned = True
+            logger.warning("Пользователь %s упёрся в лимит частоты (%s)", user_id, kind)
+            await event.answer(f"Слишком много запросов. Попробуйте снова через {math.ceil(retry_after)} с.")
+        return None
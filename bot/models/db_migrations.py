@@ -0,0 +1,116 @@
+from models.db_tables import (
+    setup_users,
+    setup_user_goals,
+    setup_workouts,
+    setup_calorie_intake,
+    setup_water_intake,
+    setup_weather,
+    setup_daily_totals,
+    setup_compaction_state,
+    setup_history_imports,
+    setup_norms_batch_runs,
+    setup_food_products,
+    setup_fsm_states,
+    setup_fsm_generation
+)
+from models.db_queries import rebuild_daily_totals
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+
+def _create_tables(conn, cursor):
+    setup_users(conn, cursor)
+    setup_user_goals(conn, cursor)
+    setup_workouts(conn, cursor)
+    setup_calorie_intake(conn, cursor)
+    setup_water_intake(conn, cursor)
+    setup_weather(conn, cursor)
+
+
+def _add_intake_indexes(conn, cursor):
+    # Перед уникальным индексом оставляем по одной (последней) записи погоды на город и день
+    cursor.execute("""
+        DELETE FROM weather
+        WHERE id NOT IN (SELECT MAX(id) FROM weather GROUP BY city, date);
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_water_intake_user_date ON water_intake (user_id, date);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_calorie_intake_user_date ON calorie_intake (user_id, date);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workouts_user_date ON workouts (user_id, date);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_goals_user_updated ON user_goals (user_id, updated_at);")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_weather_city_date ON weather (city, date);")
+
+
+def _add_daily_totals(conn, cursor):
+    setup_daily_totals(conn, cursor)
+    rebuild_daily_totals(conn, cursor)
+
+
+def _add_history_import_progress(conn, cursor):
+    # Уже записанные импорты завершены; незавершённый импорт продолжается со строки после committed_line
+    cursor.execute("ALTER TABLE history_imports ADD COLUMN committed_line INTEGER NOT NULL DEFAULT 0;")
+    cursor.execute("ALTER TABLE history_imports ADD COLUMN completed INTEGER NOT NULL DEFAULT 1;")
+
+
+def _add_scheduled_goals_flag(conn, cursor):
+    # Нормы, записанные ночным пересчётом, не считаются активностью пользователя
+    cursor.execute("ALTER TABLE user_goals ADD COLUMN scheduled INTEGER NOT NULL DEFAULT 0;")
+
+
+# Миграции основной БД: номер версии -> функция (conn, cursor).
+# Новые миграции только добавляются в конец, уже выпущенные не меняются.
+MAIN_MIGRATIONS = {
+    1: _create_tables,
+    2: _add_intake_indexes,
+    3: _add_daily_totals,
+    4: _add_scheduled_goals_flag,
+    5: setup_compaction_state,
+    6: setup_history_imports,
+    7: setup_norms_batch_runs,
+    8: _add_history_import_progress,
+}
+
+FOOD_MIGRATIONS = {
+    1: setup_food_products,
+}
+
+FSM_MIGRATIONS = {
+    1: setup_fsm_states,
+    2: setup_fsm_generation,
+}
+
+
+def get_schema_version(cursor):
+    cursor.execute("PRAGMA user_version;")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(conn, cursor, migrations=MAIN_MIGRATIONS):
+    """
+    Применяет к БД миграции, версия которых больше PRAGMA user_version.
+    Каждая миграция выполняется в своей транзакции вместе с обновлением user_version:
+    при ошибке откатываются и изменения схемы, и версия, а повторный запуск ничего не делает.
+    Поэтому функции миграций не вызывают commit и executescript (он фиксирует транзакцию).
+
+    :param conn: Подключение к базе данных
+    :param cursor: Курсор базы данных
+    :param migrations: Словарь {версия: функция миграции}
+    :return: Версия схемы после применения миграций
+    """
+    version = get_schema_version(cursor)
+    for target in sorted(migrations):
+        if target <= version:
+            continue
+        logger.info("Применяется миграция БД %s (текущая версия %s)", target, version)
+        try:
+            cursor.execute("BEGIN;")
+            migrations[target](conn, cursor)
+            cursor.execute(f"PRAGMA user_version = {int(target)};")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error("Ошибка при применении миграции %s: %s", target, e)
+            raise
+        version = target
+    logger.debug("Версия схемы БД: %s", version)
+    return version
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.db_settings import main_database, db_readers, db_shards
+from models.db_utils import connect, shard_index, shard_database_names
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+db_latency = metrics.histogram(
+    "bot_db_query_seconds", "Время выполнения функций БД в потоке пула (с учётом commit)", ("db", "query", "mode")
+)
+db_errors = metrics.counter("bot_db_query_errors_total", "Исключения в функциях БД", ("db", "query", "mode"))
+
+
+class DatabasePool:
+    """
+    Асинхронный пул соединений SQLite: одно долгоживущее соединение на запись и несколько на чтение.
+
+    Запросы выполняются в отдельных потоках, поэтому цикл событий бота не блокируется.
+    В read()/write() передаётся функция, которая первыми аргументами получает (conn, cursor),
+    внутри неё можно вызывать функции из models/db_queries как обычно.
+    """
+
+    def __init__(self, db_name, readers=4):
+        self.db_name = db_name
+        self.readers = readers
+        self._open_lock = asyncio.Lock()
+        self._opened = False
+        self._writer = None
+        self._writer_executor = None
+        self._reader_executor = None
+        self._idle_readers = None
+
+    def _connect(self, query_only=False):
+        conn = connect(self.db_name, check_same_thread=False)
+        if query_only:
+            # Соединения на чтение не должны писать: все изменения идут через write()
+            conn.execute("PRAGMA query_only = ON;")
+        logger.debug("Пул %s: открыто соединение %s", self.db_name, conn)
+        return conn
+
+    async def open(self):
+        """
+        Открывает соединения пула. Повторный вызов ничего не делает.
+        """
+        async with self._open_lock:
+            if self._opened:
+                return
+            loop = asyncio.get_running_loop()
+            # Один поток на запись: SQLite всё равно допускает только одного писателя
+            self._writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+            self._reader_executor = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-reader")
+            self._writer = await loop.run_in_executor(self._writer_executor, self._connect)
+            self._idle_readers = asyncio.Queue()
+            for _ in range(self.readers):
+                conn = await loop.run_in_executor(self._reader_executor, self._connect, True)
+                self._idle_readers.put_nowait(conn)
+            self._opened = True
+            logger.info("Пул БД %s открыт: 1 соединение на запись, %s на чтение", self.db_name, self.readers)
+
+    async def close(self):
+        """
+        Закрывает все соединения пула и останавливает его потоки.
+        """
+        async with self._open_lock:
+            if not self._opened:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._writer_executor, self._writer.close)
+            for _ in range(self.readers):
+                conn = await self._idle_readers.get()
+                await loop.run_in_executor(self._reader_executor, conn.close)
+            self._writer_executor.shutdown()
+            self._reader_executor.shutdown()
+            self._writer = None
+            self._idle_readers = None
+            self._opened = False
+            logger.info("Пул БД %s закрыт", self.db_name)
+
+    def _run(self, conn, func, args, commit):
+        mode = "write" if commit else "read"
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        try:
+            result = func(conn, cursor, *args)
+            if commit:
+                conn.commit()
+            return result
+        except Exception:
+            db_errors.inc(self.db_name, func.__name__, mode)
+            if commit:
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            db_latency.observe(time.perf_counter() - started, self.db_name, func.__name__, mode)
+
+    async def read(self, func, *args):
+        """
+        Выполняет func(conn, cursor, *args) на свободном соединении для чтения.
+
+        :return: Результат func
+        """
+        if not self._opened:
+            await self.open()
+        conn = await self._idle_readers.get()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._reader_executor, self._run, conn, func, args, False)
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    async def write(self, func, *args):
+        """
+        Выполняет func(conn, cursor, *args) на соединении для записи в одной транзакции.
+        При успехе транзакция фиксируется, при исключении откатывается.
+
+        :return: Результат func
+        """
+        if not self._opened:
+            await self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer_executor, self._run, self._writer, func, args, True)
+
+
+class ShardedDatabase:
+    """
+    Основная БД, разделённая на шарды по user_id.
+
+    Данные пользователя (таблицы db_utils.SHARDED_TABLES) лежат в шарде for_user(user_id),
+    общие таблицы (погода) — в shared. У каждого шарда свой пул и свой писатель, поэтому
+    записи разных шардов идут параллельно. При одном шарде shared и шард — один и тот же пул.
+    """
+
+    def __init__(self, shared_name, shard_names, readers=4):
+        self.shared = DatabasePool(shared_name, readers=readers)
+        self.shards = [
+            self.shared if name == shared_name else DatabasePool(name, readers=readers)
+            for name in shard_names
+        ]
+
+    def shard_index(self, user_id):
+        return shard_index(user_id, len(self.shards))
+
+    def for_user(self, user_id):
+        """
+        :return: DatabasePool шарда пользователя
+        """
+        return self.shards[self.shard_index(user_id)]
+
+    def _pools(self):
+        return list({id(pool): pool for pool in [self.shared, *self.shards]}.values())
+
+    async def open(self):
+        await asyncio.gather(*(pool.open() for pool in self._pools()))
+
+    async def close(self):
+        await asyncio.gather(*(pool.close() for pool in self._pools()))
+
+    async def read_all(self, func, *args):
+        """
+        Выполняет func(conn, cursor, *args) на каждом шарде параллельно.
+
+        :return: Список результатов по порядку шардов
+        """
+        return await asyncio.gather(*(shard.read(func, *args) for shard in self.shards))
+
+
+database = ShardedDatabase(main_database, shard_database_names(db_shards), readers=db_readers)
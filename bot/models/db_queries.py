@@ -1,4 +1,5 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import NamedTuple
 
 from utils.logging import setup_logger
 
@@ -8,6 +9,19 @@ def save_user_profile(user_id, username, name, birth_date,
                         city, height, weight, gender,
                         prefered_water, prefered_calories, prefered_workout,
                         conn, cursor):
+    """
+    Создаёт или обновляет профиль пользователя.
+
+    :return: True, если изменились поля, от которых зависят нормы (город — через температуру,
+             рост, вес, дата рождения, предпочтения), или профиль создан впервые
+    """
+    cursor.execute("""
+        SELECT city = ? AND birth_date = ? AND height = ? AND weight = ?
+               AND prefered_water = ? AND prefered_calories = ? AND prefered_workout = ?
+        FROM users WHERE id = ?
+    """, (city, birth_date, height, weight, prefered_water, prefered_calories, prefered_workout, user_id))
+    row = cursor.fetchone()
+    norms_changed = row is None or not row[0]
     cursor.execute("""
         INSERT INTO users (id, name, birth_date, city, height, weight, gender, prefered_water, prefered_calories, prefered_workout, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
@@ -24,15 +38,16 @@ def save_user_profile(user_id, username, name, birth_date,
         ;
     """, (user_id, name, birth_date, city, height, weight, gender,prefered_water, prefered_calories, prefered_workout))
     conn.commit()
-    logger.debug(f"Сохранён профиль пользователя {name} (ID: {user_id}) в базу данных.")
+    logger.debug("Сохранён профиль пользователя %s (ID: %s) в базу данных.", name, user_id)
+    return norms_changed
 
 def get_user_profile(user_id, cursor):
-    logger.debug(f"Поиск профиля для {user_id}")
+    logger.debug("Поиск профиля для %s", user_id)
     cursor.execute("SELECT name, birth_date, city, height, weight, gender FROM users WHERE id = ?", (user_id,))
     return cursor.fetchone()
 
 def get_user_profile_full(user_id, cursor):
-    logger.debug(f"Поиск профиля для {user_id}")
+    logger.debug("Поиск профиля для %s", user_id)
     cursor.execute("SELECT name, birth_date, city, height, weight, gender, prefered_water, prefered_calories, prefered_workout, created_at FROM users WHERE id = ?", (user_id,))
     return cursor.fetchone()
 
@@ -57,7 +72,7 @@ def log_user_norms(user_id, calories_goal, water_goal, workout_goal, conn, curso
         user_id, calories_goal, water_goal, workout_goal, datetime.now()
     ))
     conn.commit()
-    logger.debug(f"Нормы для пользователя {user_id} сохранены или обновлены.")
+    logger.debug("Нормы для пользователя %s сохранены или обновлены.", user_id)
 
 def check_logged_user_norms(user_id, conn, cursor) -> bool:
     """
@@ -69,17 +84,19 @@ def check_logged_user_norms(user_id, conn, cursor) -> bool:
     :return: True, если запись существует, иначе False
     """
     today_date = datetime.now().date()
+    # Диапазон вместо DATE(updated_at), чтобы работал индекс (user_id, updated_at)
     query = """
     SELECT 1 FROM user_goals
-    WHERE user_id = ? AND DATE(updated_at) = ?;
+    WHERE user_id = ? AND updated_at >= ? AND updated_at < ?
+    LIMIT 1;
     """
     try:
-        cursor.execute(query, (user_id, today_date))
+        cursor.execute(query, (user_id, str(today_date), str(today_date + timedelta(days=1))))
         exists = cursor.fetchone() is not None
-        logger.debug(f"Проверка записи за {today_date} для пользователя {user_id}: {'существует' if exists else 'отсутствует'}.")
+        logger.debug("Проверка записи за %s для пользователя %s: %s.", today_date, user_id, 'существует' if exists else 'отсутствует')
         return exists
     except Exception as e:
-        logger.error(f"Ошибка при проверке записи для пользователя {user_id} за {today_date}: {e}")
+        logger.error("Ошибка при проверке записи для пользователя %s за %s: %s", user_id, today_date, e)
         raise
 
 
@@ -103,12 +120,12 @@ def last_logged_user_norms(user_id, conn, cursor):
         cursor.execute(query, (user_id,))
         result = cursor.fetchone()
         if result:
-            logger.debug(f"Последняя запись для пользователя {user_id}: {result}.")
+            logger.debug("Последняя запись для пользователя %s: %s.", user_id, result)
         else:
-            logger.debug(f"Для пользователя {user_id} нет записей в таблице user_goals.")
+            logger.debug("Для пользователя %s нет записей в таблице user_goals.", user_id)
         return result
     except Exception as e:
-        logger.error(f"Ошибка при получении последней записи для пользователя {user_id}: {e}")
+        logger.error("Ошибка при получении последней записи для пользователя %s: %s", user_id, e)
         raise
 
 
@@ -127,10 +144,12 @@ def log_water(cursor, user_id, amount):
     VALUES (?, ?, ?);
     """
     try:
-        cursor.execute(query, (user_id, datetime.now().date(), amount))
-        logger.debug(f"В таблицу water_intake добавлена запись: user_id={user_id}, water_consumed={amount} мл.")
+        today_date = datetime.now().date()
+        cursor.execute(query, (user_id, today_date, amount))
+        add_daily_totals(cursor, user_id, today_date, water=amount)
+        logger.debug("В таблицу water_intake добавлена запись: user_id=%s, water_consumed=%s мл.", user_id, amount)
     except Exception as e:
-        logger.error(f"Ошибка при добавлении записи в water_intake для пользователя {user_id}: {e}")
+        logger.error("Ошибка при добавлении записи в water_intake для пользователя %s: %s", user_id, e)
         raise
 
 
@@ -143,18 +162,19 @@ def get_water_total_today(user_id, cursor):
     :return: Суммарное количество воды за день (мл)
     """
     query = """
-    SELECT SUM(water_consumed)
-    FROM water_intake
-    WHERE user_id = ? AND date = ?;
+    SELECT water
+    FROM daily_totals
+    WHERE user_id = ? AND day = ?;
     """
+    today_date = datetime.now().date()
     try:
-        cursor.execute(query, (user_id, datetime.now().date()))
+        cursor.execute(query, (user_id, today_date))
         result = cursor.fetchone()
-        total = result[0] if result[0] is not None else 0
-        logger.debug(f"Суммарное количество воды за {datetime.now().date()} для пользователя {user_id}: {total} мл.")
+        total = result[0] if result is not None else 0
+        logger.debug("Суммарное количество воды за %s для пользователя %s: %s мл.", today_date, user_id, total)
         return total
     except Exception as e:
-        logger.error(f"Ошибка при получении суммарного количества воды для пользователя {user_id}: {e}")
+        logger.error("Ошибка при получении суммарного количества воды для пользователя %s: %s", user_id, e)
         raise
 
 
@@ -171,10 +191,12 @@ def log_calories(cursor, user_id, amount):
     VALUES (?, ?, ?);
     """
     try:
-        cursor.execute(query, (user_id, datetime.now().date(), amount))
-        logger.debug(f"В таблицу calorie_intake добавлена запись: user_id={user_id}, calories={amount} ккал.")
+        today_date = datetime.now().date()
+        cursor.execute(query, (user_id, today_date, amount))
+        add_daily_totals(cursor, user_id, today_date, calories=amount)
+        logger.debug("В таблицу calorie_intake добавлена запись: user_id=%s, calories=%s ккал.", user_id, amount)
     except Exception as e:
-        logger.error(f"Ошибка при добавлении записи в calorie_intake для пользователя {user_id}: {e}")
+        logger.error("Ошибка при добавлении записи в calorie_intake для пользователя %s: %s", user_id, e)
         raise
 
 
@@ -188,18 +210,19 @@ def get_calories_total_today(user_id, cursor):
     :return: Суммарное количество калорий за день (ккал)
     """
     query = """
-    SELECT SUM(calories)
-    FROM calorie_intake
-    WHERE user_id = ? AND date = ?;
+    SELECT calories
+    FROM daily_totals
+    WHERE user_id = ? AND day = ?;
     """
+    today_date = datetime.now().date()
     try:
-        cursor.execute(query, (user_id, datetime.now().date()))
+        cursor.execute(query, (user_id, today_date))
         result = cursor.fetchone()
-        total = result[0] if result[0] is not None else 0
-        logger.debug(f"Суммарное количество калорий за {datetime.now().date()} для пользователя {user_id}: {total} ккал.")
+        total = result[0] if result is not None else 0
+        logger.debug("Суммарное количество калорий за %s для пользователя %s: %s ккал.", today_date, user_id, total)
         return total
     except Exception as e:
-        logger.error(f"Ошибка при получении суммарного количества калорий для пользователя {user_id}: {e}")
+        logger.error("Ошибка при получении суммарного количества калорий для пользователя %s: %s", user_id, e)
         raise
 
 def is_weather_logged_today(city, cursor):
@@ -218,10 +241,10 @@ def is_weather_logged_today(city, cursor):
     try:
         cursor.execute(query, (city, today_date))
         exists = cursor.fetchone() is not None
-        logger.debug(f"Проверка существования записи о погоде для {city} на {today_date}: {'существует' if exists else 'отсутствует'}.")
+        logger.debug("Проверка существования записи о погоде для %s на %s: %s.", city, today_date, 'существует' if exists else 'отсутствует')
         return exists
     except Exception as e:
-        logger.error(f"Ошибка при проверке записи о погоде для {city}: {e}")
+        logger.error("Ошибка при проверке записи о погоде для %s: %s", city, e)
         raise
 
 
@@ -236,14 +259,16 @@ def log_weather(city, temperature, conn, cursor):
     """
     query = """
     INSERT INTO weather (city, date, temperature)
-    VALUES (?, ?, ?);
+    VALUES (?, ?, ?)
+    ON CONFLICT (city, date) DO UPDATE SET temperature = excluded.temperature;
     """
+    today_date = datetime.now().date()
     try:
-        cursor.execute(query, (city, datetime.now().date(), temperature))
+        cursor.execute(query, (city, today_date, temperature))
         conn.commit()
-        logger.debug(f"Добавлена запись о погоде: {city}, {temperature}°C на {datetime.now().date()}.")
+        logger.debug("Добавлена запись о погоде: %s, %s°C на %s.", city, temperature, today_date)
     except Exception as e:
-        logger.error(f"Ошибка при добавлении записи о погоде для {city}: {e}")
+        logger.error("Ошибка при добавлении записи о погоде для %s: %s", city, e)
         raise
 
 
@@ -265,10 +290,10 @@ def get_weather_for_today(city, cursor):
         cursor.execute(query, (city, today_date))
         result = cursor.fetchone()
         if result:
-            logger.debug(f"Температура для {city} на {today_date}: {result[0]}°C.")
+            logger.debug("Температура для %s на %s: %s°C.", city, today_date, result[0])
         return result[0] if result else None
     except Exception as e:
-        logger.error(f"Ошибка при получении температуры для {city}: {e}")
+        logger.error("Ошибка при получении температуры для %s: %s", city, e)
         raise
 
 
@@ -289,10 +314,10 @@ def get_user_city(user_id, cursor):
         cursor.execute(query, (user_id,))
         result = cursor.fetchone()
         if result:
-            logger.debug(f"Город пользователя {user_id}: {result[0]}.")
+            logger.debug("Город пользователя %s: %s.", user_id, result[0])
         return result[0] if result else None
     except Exception as e:
-        logger.error(f"Ошибка при получении города для пользователя {user_id}: {e}")
+        logger.error("Ошибка при получении города для пользователя %s: %s", user_id, e)
         raise
 
 
@@ -310,7 +335,9 @@ def log_workout(cursor, user_id, workout_type, duration, calories_burned):
     INSERT INTO workouts (user_id, date, workout_type, duration, calories_burned)
     VALUES (?, ?, ?, ?, ?);
     """
-    cursor.execute(query, (user_id, datetime.now().date(), workout_type, duration, calories_burned))
+    today_date = datetime.now().date()
+    cursor.execute(query, (user_id, today_date, workout_type, duration, calories_burned))
+    add_daily_totals(cursor, user_id, today_date, workout_minutes=duration or 0, burned=calories_burned or 0)
 
 
 def get_workout_stats_today(user_id, cursor):
@@ -322,20 +349,508 @@ def get_workout_stats_today(user_id, cursor):
     :return: Кортеж (общая продолжительность тренировок в минутах, общее количество сожжённых калорий)
     """
     query = """
-    SELECT SUM(duration) AS total_duration, SUM(calories_burned) AS total_calories
-    FROM workouts
-    WHERE user_id = ? AND date = ?;
+    SELECT workout_minutes, burned
+    FROM daily_totals
+    WHERE user_id = ? AND day = ?;
     """
+    today_date = datetime.now().date()
     try:
-        cursor.execute(query, (user_id, datetime.now().date()))
+        cursor.execute(query, (user_id, today_date))
         result = cursor.fetchone()
-        total_duration = result[0] if result[0] is not None else 0
-        total_calories = result[1] if result[1] is not None else 0
+        total_duration, total_calories = result if result is not None else (0, 0)
         logger.debug(
-            f"Тренировочная статистика за {datetime.now().date()} для пользователя {user_id}: "
-            f"{total_duration} минут, {total_calories} ккал."
+            "Тренировочная статистика за %s для пользователя %s: %s минут, %s ккал.",
+            today_date, user_id, total_duration, total_calories
         )
         return total_duration, total_calories
     except Exception as e:
-        logger.error(f"Ошибка при получении статистики тренировок для пользователя {user_id}: {e}")
+        logger.error("Ошибка при получении статистики тренировок для пользователя %s: %s", user_id, e)
+        raise
+
+
+def get_active_user_cities(since_date, cursor):
+    """
+    Возвращает города пользователей, которые что-либо записывали начиная с указанной даты.
+
+    :param since_date: Дата, начиная с которой пользователь считается активным
+    :param cursor: Курсор базы данных
+    :return: Список названий городов
+    """
+    query = """
+    SELECT DISTINCT city
+    FROM users
+    WHERE id IN (
+        SELECT user_id FROM water_intake WHERE date >= :since
+        UNION SELECT user_id FROM calorie_intake WHERE date >= :since
+        UNION SELECT user_id FROM workouts WHERE date >= :since
+        UNION SELECT user_id FROM user_goals WHERE updated_at >= :since AND scheduled = 0
+    );
+    """
+    try:
+        cursor.execute(query, {"since": since_date})
+        cities = [row[0] for row in cursor.fetchall()]
+        logger.debug("Города активных пользователей с %s: %s.", since_date, len(cities))
+        return cities
+    except Exception as e:
+        logger.error("Ошибка при получении городов активных пользователей: %s", e)
         raise
+
+
+ADD_DAILY_TOTALS = """
+    INSERT INTO daily_totals (user_id, day, water, calories, workout_minutes, burned)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        water = water + excluded.water,
+        calories = calories + excluded.calories,
+        workout_minutes = workout_minutes + excluded.workout_minutes,
+        burned = burned + excluded.burned;
+"""
+
+
+def add_daily_totals(cursor, user_id, day, water=0, calories=0, workout_minutes=0, burned=0):
+    """
+    Прибавляет значения к дневным итогам пользователя в таблице daily_totals.
+    Вызывается в той же транзакции, что и запись в исходную таблицу.
+
+    :param cursor: Курсор базы данных
+    :param user_id: ID пользователя
+    :param day: Дата записи
+    """
+    cursor.execute(ADD_DAILY_TOTALS, (user_id, day, water, calories, workout_minutes, burned))
+
+
+class DailyTotals(NamedTuple):
+    water: float = 0
+    calories: float = 0
+    workout_minutes: int = 0
+    burned: float = 0
+
+
+def get_daily_totals(user_id, day, cursor):
+    """
+    Возвращает итоги пользователя за день из daily_totals.
+
+    :param user_id: ID пользователя
+    :param day: Дата
+    :param cursor: Курсор базы данных
+    :return: DailyTotals (нули, если за день ничего не записано)
+    """
+    cursor.execute(
+        "SELECT water, calories, workout_minutes, burned FROM daily_totals WHERE user_id = ? AND day = ?;",
+        (user_id, day)
+    )
+    row = cursor.fetchone()
+    return DailyTotals._make(row) if row else DailyTotals()
+
+
+def log_intake_batch(cursor, water_rows=(), calorie_rows=(), workout_rows=()):
+    """
+    Записывает пачку записей воды, калорий и тренировок и обновляет daily_totals.
+    Все изменения выполняются в текущей транзакции.
+
+    :param cursor: Курсор базы данных
+    :param water_rows: Кортежи (user_id, date, мл)
+    :param calorie_rows: Кортежи (user_id, date, ккал)
+    :param workout_rows: Кортежи (user_id, date, тип, минуты, сожжённые ккал)
+    """
+    totals = {}
+
+    def add(user_id, day, water=0, calories=0, workout_minutes=0, burned=0):
+        current = totals.setdefault((user_id, day), [0, 0, 0, 0])
+        current[0] += water
+        current[1] += calories
+        current[2] += workout_minutes
+        current[3] += burned
+
+    if water_rows:
+        cursor.executemany("INSERT INTO water_intake (user_id, date, water_consumed) VALUES (?, ?, ?);", water_rows)
+        for user_id, day, amount in water_rows:
+            add(user_id, day, water=amount)
+    if calorie_rows:
+        cursor.executemany("INSERT INTO calorie_intake (user_id, date, calories) VALUES (?, ?, ?);", calorie_rows)
+        for user_id, day, amount in calorie_rows:
+            add(user_id, day, calories=amount)
+    if workout_rows:
+        cursor.executemany(
+            "INSERT INTO workouts (user_id, date, workout_type, duration, calories_burned) VALUES (?, ?, ?, ?, ?);",
+            workout_rows
+        )
+        for user_id, day, _, duration, calories_burned in workout_rows:
+            add(user_id, day, workout_minutes=duration or 0, burned=calories_burned or 0)
+
+    cursor.executemany(ADD_DAILY_TOTALS, [(user_id, day, *values) for (user_id, day), values in totals.items()])
+    logger.debug(
+        "Записана пачка: вода %s, калории %s, тренировки %s.", len(water_rows), len(calorie_rows), len(workout_rows)
+    )
+
+
+# Дневные итоги, посчитанные по исходным таблицам начиная с даты :since
+RAW_DAILY_TOTALS = """
+    SELECT user_id, day,
+           SUM(water) AS water,
+           SUM(calories) AS calories,
+           SUM(workout_minutes) AS workout_minutes,
+           SUM(burned) AS burned
+    FROM (
+        SELECT user_id, date AS day, water_consumed AS water, 0 AS calories, 0 AS workout_minutes, 0 AS burned
+        FROM water_intake WHERE date >= :since
+        UNION ALL
+        SELECT user_id, date, 0, calories, 0, 0
+        FROM calorie_intake WHERE date >= :since
+        UNION ALL
+        SELECT user_id, date, 0, 0, COALESCE(duration, 0), COALESCE(calories_burned, 0)
+        FROM workouts WHERE date >= :since
+    )
+    GROUP BY user_id, day
+"""
+
+
+def rebuild_daily_totals(conn, cursor, since=""):
+    """
+    Пересчитывает daily_totals по таблицам water_intake, calorie_intake и workouts.
+
+    :param since: Первый пересчитываемый день; итоги за более ранние дни не меняются.
+                  Для сжатой истории это get_compacted_before: сырых записей за эти дни в БД уже нет
+    :return: Количество пересчитанных строк daily_totals
+    """
+    cursor.execute("DELETE FROM daily_totals WHERE day >= ?;", (since,))
+    cursor.execute(f"""
+    INSERT INTO daily_totals (user_id, day, water, calories, workout_minutes, burned)
+    {RAW_DAILY_TOTALS};
+    """, {"since": since})
+    logger.debug("Пересчитаны дневные итоги: %s строк.", cursor.rowcount)
+    return cursor.rowcount
+
+
+def find_daily_totals_mismatches(cursor, limit=100, since=""):
+    """
+    Сравнивает daily_totals с итогами, посчитанными по исходным таблицам.
+
+    :param cursor: Курсор базы данных
+    :param limit: Максимальное количество возвращаемых расхождений
+    :param since: Первый проверяемый день (см. rebuild_daily_totals)
+    :return: Список (user_id, day, итоги в daily_totals, итоги по исходным таблицам)
+    """
+    query = f"""
+    WITH raw AS MATERIALIZED ({RAW_DAILY_TOTALS})
+    SELECT r.user_id, r.day, t.water, t.calories, t.workout_minutes, t.burned,
+           r.water, r.calories, r.workout_minutes, r.burned
+    FROM raw r
+    LEFT JOIN daily_totals t ON t.user_id = r.user_id AND t.day = r.day
+    WHERE t.user_id IS NULL
+       OR ABS(t.water - r.water) > 1e-6
+       OR ABS(t.calories - r.calories) > 1e-6
+       OR t.workout_minutes != r.workout_minutes
+       OR ABS(t.burned - r.burned) > 1e-6
+    UNION ALL
+    SELECT t.user_id, t.day, t.water, t.calories, t.workout_minutes, t.burned,
+           NULL, NULL, NULL, NULL
+    FROM daily_totals t
+    LEFT JOIN raw r ON r.user_id = t.user_id AND r.day = t.day
+    WHERE r.user_id IS NULL AND t.day >= :since
+    LIMIT :limit;
+    """
+    cursor.execute(query, {"since": since, "limit": limit})
+    return [(row[0], row[1], row[2:6], row[6:10]) for row in cursor.fetchall()]
+
+
+class ProgressSnapshot(NamedTuple):
+    """
+    Всё, что нужно экрану /check_progress: профиль, нормы за день и итоги за день.
+    Поля норм равны None, если нормы за этот день ещё не сохранены.
+    """
+    name: str
+    birth_date: str
+    city: str
+    height: float
+    weight: float
+    gender: str
+    prefered_water: int
+    prefered_calories: int
+    prefered_workout: int
+    calories_goal: float | None
+    water_goal: float | None
+    workout_goal: float | None
+    norms_updated_at: str | None
+    water_consumed: float
+    calories_consumed: float
+    workout_minutes: int
+    burned: float
+
+
+def get_progress_snapshot(user_id, day, cursor):
+    """
+    Одним запросом получает профиль пользователя, его нормы и итоги за день.
+
+    :param user_id: ID пользователя
+    :param day: Дата (datetime.date)
+    :param cursor: Курсор базы данных
+    :return: ProgressSnapshot или None, если профиль не найден
+    """
+    query = """
+    WITH norms AS (
+        SELECT calories_goal, water_goal, workout_goal, updated_at
+        FROM user_goals
+        WHERE user_id = :user_id AND updated_at >= :day AND updated_at < :next_day
+        ORDER BY updated_at DESC
+        LIMIT 1
+    )
+    SELECT u.name, u.birth_date, u.city, u.height, u.weight, u.gender,
+           u.prefered_water, u.prefered_calories, u.prefered_workout,
+           n.calories_goal, n.water_goal, n.workout_goal, n.updated_at,
+           COALESCE(t.water, 0), COALESCE(t.calories, 0),
+           COALESCE(t.workout_minutes, 0), COALESCE(t.burned, 0)
+    FROM users u
+    LEFT JOIN norms n
+    LEFT JOIN daily_totals t ON t.user_id = u.id AND t.day = :day
+    WHERE u.id = :user_id;
+    """
+    try:
+        cursor.execute(query, {"user_id": user_id, "day": str(day), "next_day": str(day + timedelta(days=1))})
+        row = cursor.fetchone()
+        return ProgressSnapshot._make(row) if row else None
+    except Exception as e:
+        logger.error("Ошибка при получении сводки прогресса для пользователя %s: %s", user_id, e)
+        raise
+
+
+def get_users_for_norms(day, cursor):
+    """
+    Возвращает параметры всех пользователей для пересчёта норм; возраст на дату day считается в SQLite.
+
+    :param day: Дата (datetime.date)
+    :param cursor: Курсор базы данных
+    :return: Список (id, age, height, weight, prefered_water, prefered_calories, prefered_workout, city)
+    """
+    query = """
+    SELECT id,
+           CAST(strftime('%Y', :day) AS INTEGER) - CAST(strftime('%Y', birth_date) AS INTEGER)
+               - (strftime('%m-%d', :day) < strftime('%m-%d', birth_date)),
+           height, weight, prefered_water, prefered_calories, prefered_workout, city
+    FROM users
+    ORDER BY id;
+    """
+    try:
+        cursor.execute(query, {"day": str(day)})
+        return cursor.fetchall()
+    except Exception as e:
+        logger.error("Ошибка при получении пользователей для пересчёта норм: %s", e)
+        raise
+
+
+def get_weather_by_city(day, cursor):
+    """
+    :return: Словарь {город: температура} за дату day
+    """
+    cursor.execute("SELECT city, temperature FROM weather WHERE date = ?;", (str(day),))
+    return dict(cursor.fetchall())
+
+
+def scheduled_norms_logged(day, cursor):
+    """
+    Проверяет, завершён ли пакетный пересчёт норм за день: отметку в norms_batch_runs
+    пересчёт ставит после записи норм всех пользователей БД.
+
+    :param day: Дата (datetime.date)
+    :return: True, если отметка за день есть
+    """
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM norms_batch_runs WHERE day = ?);", (str(day),))
+    return bool(cursor.fetchone()[0])
+
+
+def log_norms_batch_run(day, users, inserted, conn, cursor):
+    """
+    Отмечает, что пакетный пересчёт норм за день завершён.
+
+    :param day: Дата (datetime.date)
+    :param users: Количество пользователей в пересчёте
+    :param inserted: Количество добавленных записей норм
+    """
+    cursor.execute("""
+        INSERT INTO norms_batch_runs (day, users, inserted) VALUES (?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            users = excluded.users,
+            inserted = norms_batch_runs.inserted + excluded.inserted,
+            finished_at = CURRENT_TIMESTAMP;
+    """, (str(day), users, inserted))
+
+
+def log_scheduled_norms(rows, day, conn, cursor):
+    """
+    Записывает нормы за день пачкой. Пользователи, у которых запись за этот день уже есть,
+    пропускаются, поэтому повторный запуск ничего не меняет.
+
+    Строки сначала загружаются во временную таблицу, а проверка и вставка выполняются
+    одним INSERT ... SELECT: так быстрее, чем отдельный INSERT с подзапросом на каждую строку.
+
+    :param rows: Итерируемое (user_id, calories_goal, water_goal, workout_goal)
+    :param day: Дата (datetime.date)
+    :return: Количество добавленных записей
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS scheduled_norms (
+            user_id INTEGER, calories_goal REAL, water_goal REAL, workout_goal REAL
+        );
+    """)
+    cursor.execute("DELETE FROM scheduled_norms;")
+    cursor.executemany("INSERT INTO scheduled_norms VALUES (?, ?, ?, ?);", rows)
+    cursor.execute("""
+        INSERT INTO user_goals (user_id, calories_goal, water_goal, workout_goal, updated_at, scheduled)
+        SELECT s.user_id, s.calories_goal, s.water_goal, s.workout_goal, :updated_at, 1
+        FROM scheduled_norms s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM user_goals g
+            WHERE g.user_id = s.user_id AND g.updated_at >= :day AND g.updated_at < :next_day
+        );
+    """, {"updated_at": f"{day} 00:00:00", "day": str(day), "next_day": str(day + timedelta(days=1))})
+    inserted = cursor.rowcount
+    cursor.execute("DELETE FROM scheduled_norms;")
+    logger.debug("Записано норм за %s: %s.", day, inserted)
+    return inserted
+
+
+# Таблицы сырых записей, которые сжимаются в daily_totals и переносятся в архив
+RAW_INTAKE_TABLES = ("water_intake", "calorie_intake", "workouts")
+
+
+def get_compacted_before(cursor):
+    """
+    :return: Дата, раньше которой сырые записи перенесены в архив ('YYYY-MM-DD'), или "" если сжатия не было
+    """
+    cursor.execute("SELECT compacted_before FROM compaction_state WHERE id = 1;")
+    row = cursor.fetchone()
+    return row[0] if row else ""
+
+
+def set_compacted_before(day, cursor):
+    """
+    Сдвигает границу сжатой истории вперёд (назад она не двигается).
+
+    :param day: Дата (datetime.date)
+    """
+    cursor.execute("""
+        INSERT INTO compaction_state (id, compacted_before) VALUES (1, ?)
+        ON CONFLICT (id) DO UPDATE SET compacted_before = MAX(compacted_before, excluded.compacted_before);
+    """, (str(day),))
+
+
+def get_expired_rows(table, before, after_id, limit, cursor):
+    """
+    Возвращает следующую по id пачку сырых записей старше даты.
+
+    :param table: Одна из RAW_INTAKE_TABLES
+    :param before: Дата (datetime.date): выбираются записи с date < before
+    :param after_id: Выбираются записи с id > after_id
+    :param limit: Размер пачки
+    :return: (имена столбцов, строки по возрастанию id); id — первый столбец
+    """
+    if table not in RAW_INTAKE_TABLES:
+        raise ValueError(f"Таблица {table} не сжимается")
+    cursor.execute(
+        f"SELECT * FROM {table} WHERE id > ? AND date < ? ORDER BY id LIMIT ?;",
+        (after_id, str(before), limit)
+    )
+    return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def delete_expired_rows(table, before, first_id, last_id, cursor):
+    """
+    Удаляет сырые записи старше даты в диапазоне id — пачку, выбранную get_expired_rows.
+    id растут монотонно, поэтому новых записей в этом диапазоне появиться не может.
+
+    :return: Количество удалённых записей
+    """
+    if table not in RAW_INTAKE_TABLES:
+        raise ValueError(f"Таблица {table} не сжимается")
+    cursor.execute(
+        f"DELETE FROM {table} WHERE id BETWEEN ? AND ? AND date < ?;",
+        (first_id, last_id, str(before))
+    )
+    return cursor.rowcount
+
+
+# Разделы выгрузки истории пользователя (/export) по порядку: (раздел, запрос).
+# Сырые записи за сжатые дни перенесены в архив, за эти дни выгружаются дневные итоги.
+USER_EXPORT_QUERIES = (
+    ("profile", """
+        SELECT name, birth_date, weight, height, gender, city,
+               prefered_water, prefered_calories, prefered_workout, created_at
+        FROM users WHERE id = :user_id;
+    """),
+    ("user_goals", """
+        SELECT updated_at, calories_goal, water_goal, workout_goal, scheduled
+        FROM user_goals WHERE user_id = :user_id ORDER BY updated_at, id;
+    """),
+    ("daily_totals", """
+        SELECT day, water, calories, workout_minutes, burned
+        FROM daily_totals WHERE user_id = :user_id AND day < :compacted_before ORDER BY day;
+    """),
+    ("water_intake", """
+        SELECT date, water_consumed
+        FROM water_intake WHERE user_id = :user_id ORDER BY date, id;
+    """),
+    ("calorie_intake", """
+        SELECT date, calories
+        FROM calorie_intake WHERE user_id = :user_id ORDER BY date, id;
+    """),
+    ("workouts", """
+        SELECT date, workout_type, duration, calories_burned
+        FROM workouts WHERE user_id = :user_id ORDER BY date, id;
+    """),
+)
+
+
+def iter_user_history(user_id, cursor, chunk_size=1000):
+    """
+    Выполняет запросы USER_EXPORT_QUERIES по очереди и отдаёт строки пачками: в памяти
+    не больше chunk_size строк, сколько бы записей ни было у пользователя.
+
+    :param user_id: ID пользователя
+    :param cursor: Курсор базы данных
+    :param chunk_size: Размер пачки
+    :return: Итератор (раздел, имена столбцов, пачка строк)
+    """
+    params = {"user_id": user_id, "compacted_before": get_compacted_before(cursor)}
+    for section, query in USER_EXPORT_QUERIES:
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        while rows := cursor.fetchmany(chunk_size):
+            yield section, columns, rows
+
+
+def get_history_import(user_id, file_unique_id, cursor):
+    """
+    :return: Кортеж (rows, committed_line, completed) для ранее присланного файла или None
+    """
+    cursor.execute(
+        "SELECT rows, committed_line, completed FROM history_imports WHERE user_id = ? AND file_unique_id = ?;",
+        (user_id, file_unique_id)
+    )
+    return cursor.fetchone()
+
+
+def log_history_import_progress(user_id, file_unique_id, rows, committed_line, cursor):
+    """
+    Запоминает, до какой строки файла записи импортированы. Вызывается в транзакции, которая
+    вставляет пачку, поэтому при повторной отправке импорт продолжается ровно после неё.
+
+    :param rows: Количество записей в пачке
+    :param committed_line: Номер последней строки файла, обработанной пачкой
+    """
+    cursor.execute("""
+        INSERT INTO history_imports (user_id, file_unique_id, rows, committed_line, completed)
+        VALUES (?, ?, ?, ?, 0)
+        ON CONFLICT (user_id, file_unique_id) DO UPDATE SET
+            rows = history_imports.rows + excluded.rows,
+            committed_line = excluded.committed_line;
+    """, (user_id, file_unique_id, rows, committed_line))
+
+
+def complete_history_import(user_id, file_unique_id, cursor):
+    """
+    Отмечает файл импортированным целиком: повторная отправка такого файла отклоняется.
+    """
+    cursor.execute(
+        "UPDATE history_imports SET completed = 1 WHERE user_id = ? AND file_unique_id = ?;",
+        (user_id, file_unique_id)
+    )
@@ -1,8 +1,11 @@
-import sqlite3
 from utils.logging import setup_logger
 
 logger = setup_logger()
 
+# Функции создания таблиц вызываются из миграций (models/db_migrations.py) внутри их транзакции
+# и сами её не фиксируют: иначе сбой посреди миграции оставил бы схему изменённой наполовину.
+
+
 def setup_users(conn, cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -19,7 +22,6 @@ def setup_users(conn, cursor):
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         );
     """)
-    conn.commit()
     logger.debug("Создана (IF NOT EXISTS) таблица users.")
 
 
@@ -35,7 +37,6 @@ def setup_user_goals(conn, cursor):
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
     """)
-    conn.commit()
     logger.debug("Создана (IF NOT EXISTS) таблица user_goals.")
 
 def setup_workouts(conn, cursor):
@@ -50,7 +51,6 @@ def setup_workouts(conn, cursor):
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
     """)
-    conn.commit()
     logger.debug("Создана (IF NOT EXISTS) таблица workouts.")
 
 def setup_calorie_intake(conn, cursor):
@@ -63,7 +63,6 @@ def setup_calorie_intake(conn, cursor):
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
     """)
-    conn.commit()
     logger.debug("Создана (IF NOT EXISTS) таблица calorie_intake.")
 
 def setup_water_intake(conn, cursor):
@@ -76,7 +75,6 @@ def setup_water_intake(conn, cursor):
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
     """)
-    conn.commit()
     logger.debug("Создана (IF NOT EXISTS) таблица water_intake.")
 
 def setup_weather(conn, cursor):
@@ -88,5 +86,128 @@ def setup_weather(conn, cursor):
             temperature REAL NOT NULL
         );
     """)
-    conn.commit()
-    logger.debug("Создана (IF NOT EXISTS) таблица weather.")
\ No newline at end of file
+    logger.debug("Создана (IF NOT EXISTS) таблица weather.")
+
+def setup_daily_totals(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            user_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            water REAL NOT NULL DEFAULT 0, -- мл
+            calories REAL NOT NULL DEFAULT 0, -- ккал
+            workout_minutes INTEGER NOT NULL DEFAULT 0,
+            burned REAL NOT NULL DEFAULT 0, -- сожжённые ккал
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID;
+    """)
+    logger.debug("Создана (IF NOT EXISTS) таблица daily_totals.")
+
+def setup_compaction_state(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS compaction_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            -- Сырые записи раньше этой даты перенесены в архив, итоги за эти дни есть только в daily_totals
+            compacted_before DATE NOT NULL
+        );
+    """)
+    logger.debug("Создана (IF NOT EXISTS) таблица compaction_state.")
+
+
+def setup_history_imports(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history_imports (
+            user_id INTEGER NOT NULL,
+            file_unique_id TEXT NOT NULL, -- file_unique_id документа Telegram
+            rows INTEGER NOT NULL, -- импортировано записей
+            imported_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, file_unique_id)
+        ) WITHOUT ROWID;
+    """)
+    logger.debug("Создана (IF NOT EXISTS) таблица history_imports.")
+
+
+def setup_norms_batch_runs(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS norms_batch_runs (
+            day DATE PRIMARY KEY, -- день, за который пересчитаны нормы всех пользователей БД
+            users INTEGER NOT NULL, -- пользователей в пересчёте
+            inserted INTEGER NOT NULL, -- добавлено записей норм
+            finished_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+    """)
+    logger.debug("Создана (IF NOT EXISTS) таблица norms_batch_runs.")
+
+
+def setup_food_products(conn, cursor):
+    # Выражения выполняются по одному: executescript фиксирует открытую транзакцию
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            normalized_name TEXT NOT NULL,
+            calories REAL NOT NULL, -- ккал на 100 г
+            brand TEXT NOT NULL DEFAULT '',
+            categories TEXT NOT NULL DEFAULT '',
+            fetched_at REAL NOT NULL, -- unix time получения данных
+            UNIQUE (normalized_name, brand)
+        );
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_products_fts USING fts5(
+            normalized_name,
+            content='food_products',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_products_ai AFTER INSERT ON food_products BEGIN
+            INSERT INTO food_products_fts (rowid, normalized_name) VALUES (new.id, new.normalized_name);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_products_ad AFTER DELETE ON food_products BEGIN
+            INSERT INTO food_products_fts (food_products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_products_au AFTER UPDATE OF normalized_name ON food_products BEGIN
+            INSERT INTO food_products_fts (food_products_fts, rowid, normalized_name) VALUES ('delete', old.id, old.normalized_name);
+            INSERT INTO food_products_fts (rowid, normalized_name) VALUES (new.id, new.normalized_name);
+        END;
+    """)
+    # Результаты поиска по запросам пользователей; product_id IS NULL — продукт не найден
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_lookups (
+            term TEXT PRIMARY KEY,
+            product_id INTEGER,
+            fetched_at REAL NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES food_products(id)
+        );
+    """)
+    logger.debug("Создан (IF NOT EXISTS) кэш продуктов food_products.")
+
+
+def setup_fsm_states(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY, -- bot:chat:user:thread:business:destiny
+            state TEXT,
+            data TEXT NOT NULL DEFAULT '{}', -- JSON
+            expires_at REAL NOT NULL -- unix time, после которого запись считается брошенной
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_expires ON fsm_states (expires_at);")
+    logger.debug("Создана (IF NOT EXISTS) таблица fsm_states.")
+
+
+def setup_fsm_generation(conn, cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            -- Номер последней записи в fsm_states, увеличивается каждой записью любого процесса
+            generation INTEGER NOT NULL
+        );
+    """)
+    cursor.execute("INSERT OR IGNORE INTO fsm_generation (id, generation) VALUES (1, 0);")
+    logger.debug("Создана (IF NOT EXISTS) таблица fsm_generation.")
@@ -1,17 +1,94 @@
+import hashlib
 import sqlite3
+
+from config.db_settings import db_profile, db_cached_statements, main_database, db_shards, shard_database_template
 from utils.logging import setup_logger
 
 logger = setup_logger()
 
+# Таблицы с данными пользователей: строки лежат в шарде, который выбирается по user_id
+# (для users — по id). Остальные таблицы основной БД общие.
+SHARDED_TABLES = {
+    "users": "id",
+    "user_goals": "user_id",
+    "workouts": "user_id",
+    "calorie_intake": "user_id",
+    "water_intake": "user_id",
+    "daily_totals": "user_id",
+    "history_imports": "user_id",
+}
+
+# Допустимые значения строковых PRAGMA профиля
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def apply_db_profile(conn, profile=db_profile):
+    """
+    Применяет к соединению PRAGMA из профиля config.db_settings.db_profile.
+
+    :param conn: Подключение к базе данных
+    :param profile: Словарь {pragma: значение}
+    """
+    for pragma, value in profile.items():
+        if pragma in _PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in _PRAGMA_CHOICES[pragma]:
+                raise ValueError(f"Недопустимое значение PRAGMA {pragma}: {value}")
+        else:
+            value = int(value)
+        result = conn.execute(f"PRAGMA {pragma} = {value};").fetchone()
+        # journal_mode возвращает фактический режим: для :memory: WAL недоступен
+        if pragma == "journal_mode" and result and result[0].upper() != value:
+            logger.warning("Режим журнала %s не применён, используется %s", value, result[0])
+
+
+def connect(db_name, check_same_thread=True, profile=db_profile):
+    """
+    Открывает соединение SQLite с профилем из настроек.
+
+    :return: Подключение к базе данных
+    """
+    conn = sqlite3.connect(
+        db_name,
+        check_same_thread=check_same_thread,
+        cached_statements=db_cached_statements
+    )
+    apply_db_profile(conn, profile)
+    return conn
+
 
 def get_database_connection(db_name):
-    conn = sqlite3.connect(db_name)
+    conn = connect(db_name)
     cursor = conn.cursor()
-    logger.debug(f"Для БД {db_name} открыто соединение conn: {conn}, cursor: {cursor}")
+    logger.debug("Для БД %s открыто соединение conn: %s, cursor: %s", db_name, conn, cursor)
     return conn, cursor
 
 
 def close_database_connection(conn):
     if conn:
         conn.close()
-        logger.debug(f"Закрыто соединение conn: {conn}")
\ No newline at end of file
+        logger.debug("Закрыто соединение conn: %s", conn)
+
+
+def shard_index(user_id, shards=db_shards):
+    """
+    Возвращает номер шарда пользователя. Хэш стабилен между запусками и процессами,
+    а в отличие от user_id % shards не зависит от того, как распределены сами ID.
+    """
+    if shards == 1:
+        return 0
+    digest = hashlib.blake2b(int(user_id).to_bytes(8, "big", signed=True), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def shard_database_names(shards=db_shards, template=shard_database_template, shared=main_database):
+    """
+    :return: Имена файлов шардов по порядку номеров; при одном шарде это общая БД
+    """
+    if shards == 1:
+        return [shared]
+    return [template.format(index=index) for index in range(shards)]
@@ -0,0 +1,145 @@
+import re
+
+from utils.logging import setup_logger
+
+logger = setup_logger("queries")
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_food_name(text):
+    """
+    Приводит название продукта к виду для поиска: нижний регистр, ё -> е, без знаков препинания.
+
+    :param text: Название продукта или поисковый запрос
+    :return: Нормализованная строка (может быть пустой)
+    """
+    text = (text or "").lower().replace("ё", "е")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _fts_query(normalized):
+    # Каждое слово ищется по префиксу, все слова должны присутствовать
+    return " ".join(f'"{token}"*' for token in normalized.split())
+
+
+def _product_info(row):
+    name, calories, brand, categories = row
+    return {
+        'name': name,
+        'calories': calories,
+        'brand': brand or 'Неизвестно',
+        'categories': categories or 'Неизвестно'
+    }
+
+
+def find_food_lookup(conn, cursor, term):
+    """
+    Возвращает сохранённый результат поиска по нормализованному запросу.
+
+    :param term: Нормализованный запрос
+    :return: Кортеж (информация о продукте или None, fetched_at) или None, если запроса не было
+    """
+    cursor.execute("""
+        SELECT p.name, p.calories, p.brand, p.categories, l.product_id, l.fetched_at
+        FROM food_lookups l
+        LEFT JOIN food_products p ON p.id = l.product_id
+        WHERE l.term = ?;
+    """, (term,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    product = _product_info(row[:4]) if row[4] is not None else None
+    return product, row[5]
+
+
+def search_food_products(conn, cursor, term):
+    """
+    Ищет продукт в полнотекстовом индексе кэша.
+
+    :param term: Нормализованный запрос
+    :return: Кортеж (информация о продукте, fetched_at) или None
+    """
+    if not term:
+        return None
+    cursor.execute("""
+        SELECT p.name, p.calories, p.brand, p.categories, p.fetched_at
+        FROM food_products_fts f
+        JOIN food_products p ON p.id = f.rowid
+        WHERE food_products_fts MATCH ?
+        ORDER BY bm25(food_products_fts), length(p.normalized_name)
+        LIMIT 1;
+    """, (_fts_query(term),))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return _product_info(row[:4]), row[4]
+
+
+def find_cached_food(conn, cursor, term):
+    """
+    Ищет продукт в кэше: сначала по точному запросу, затем по полнотекстовому индексу.
+
+    :return: Кортеж (информация о продукте или None, fetched_at) или None при промахе
+    """
+    return find_food_lookup(conn, cursor, term) or search_food_products(conn, cursor, term)
+
+
+def _upsert_products(cursor, rows):
+    cursor.executemany("""
+        INSERT INTO food_products (name, normalized_name, calories, brand, categories, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (normalized_name, brand) DO UPDATE SET
+            name = excluded.name,
+            calories = excluded.calories,
+            categories = excluded.categories,
+            fetched_at = excluded.fetched_at;
+    """, rows)
+
+
+def save_food_lookup(conn, cursor, term, product_info, fetched_at):
+    """
+    Сохраняет результат запроса к OpenFoodFacts: продукт и привязку запроса к нему.
+
+    :param term: Нормализованный запрос
+    :param product_info: Словарь get_food_info или None, если продукт не найден
+    :param fetched_at: Время получения ответа (unix time)
+    """
+    product_id = None
+    if product_info is not None:
+        name = product_info['name']
+        brand = product_info['brand'] if product_info['brand'] not in (None, 'Неизвестно') else ''
+        categories = product_info['categories'] if product_info['categories'] not in (None, 'Неизвестно') else ''
+        normalized_name = normalize_food_name(name) or term
+        _upsert_products(cursor, [(name, normalized_name, product_info['calories'] or 0, brand, categories, fetched_at)])
+        cursor.execute(
+            "SELECT id FROM food_products WHERE normalized_name = ? AND brand = ?;",
+            (normalized_name, brand)
+        )
+        product_id = cursor.fetchone()[0]
+
+    cursor.execute("""
+        INSERT INTO food_lookups (term, product_id, fetched_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (term) DO UPDATE SET
+            product_id = excluded.product_id,
+            fetched_at = excluded.fetched_at;
+    """, (term, product_id, fetched_at))
+    logger.debug("Кэш продуктов: запрос '%s' -> %s", term, product_id)
+
+
+def seed_food_products(conn, cursor, rows, fetched_at):
+    """
+    Загружает продукты из дампа OpenFoodFacts.
+
+    :param rows: Итерируемое кортежей (название, ккал на 100 г, бренд, категории)
+    :param fetched_at: Время выгрузки дампа (unix time)
+    :return: Количество загруженных строк
+    """
+    batch = []
+    for name, calories, brand, categories in rows:
+        normalized_name = normalize_food_name(name)
+        if normalized_name:
+            batch.append((name, normalized_name, calories, brand or '', categories or '', fetched_at))
+    _upsert_products(cursor, batch)
+    return len(batch)
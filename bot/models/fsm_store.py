@@ -0,0 +1,77 @@
+from utils.logging import setup_logger
+
+logger = setup_logger("queries")
+
+
+def get_data_version(cursor):
+    """
+    Возвращает PRAGMA data_version: значение меняется, когда БД изменило другое соединение.
+    """
+    cursor.execute("PRAGMA data_version;")
+    return cursor.fetchone()[0]
+
+
+def get_fsm_generation(cursor):
+    """
+    :return: Номер последней записи хранилища FSM (fsm_generation)
+    """
+    cursor.execute("SELECT generation FROM fsm_generation WHERE id = 1;")
+    return cursor.fetchone()[0]
+
+
+def next_fsm_generation(conn, cursor):
+    """
+    Увеличивает номер записи хранилища FSM в текущей транзакции.
+    UPDATE выполняется первым, поэтому между чтением и увеличением номер не меняет другой процесс.
+
+    :return: Номер этой записи
+    """
+    cursor.execute("UPDATE fsm_generation SET generation = generation + 1 WHERE id = 1;")
+    return get_fsm_generation(cursor)
+
+
+def load_fsm_record(conn, cursor, key, now):
+    """
+    Возвращает состояние FSM по ключу.
+
+    :param key: Ключ хранилища
+    :param now: Текущее время (unix time), просроченные записи не возвращаются
+    :return: Кортеж (state, data в JSON, expires_at) или None
+    """
+    cursor.execute(
+        "SELECT state, data, expires_at FROM fsm_states WHERE key = ? AND expires_at > ?;",
+        (key, now)
+    )
+    return cursor.fetchone()
+
+
+def save_fsm_record(conn, cursor, key, state, data, expires_at):
+    """
+    Сохраняет состояние и данные FSM целиком.
+
+    :param data: Данные в JSON
+    :param expires_at: Время (unix time), после которого запись удаляется
+    """
+    cursor.execute("""
+        INSERT INTO fsm_states (key, state, data, expires_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (key) DO UPDATE SET
+            state = excluded.state,
+            data = excluded.data,
+            expires_at = excluded.expires_at;
+    """, (key, state, data, expires_at))
+
+
+def delete_fsm_record(conn, cursor, key):
+    cursor.execute("DELETE FROM fsm_states WHERE key = ?;", (key,))
+
+
+def purge_expired_fsm_records(conn, cursor, now):
+    """
+    Удаляет брошенные диалоги.
+
+    :return: Количество удалённых записей
+    """
+    cursor.execute("DELETE FROM fsm_states WHERE expires_at <= ?;", (now,))
+    logger.debug("Удалено просроченных состояний FSM: %s", cursor.rowcount)
+    return cursor.rowcount
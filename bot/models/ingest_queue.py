@@ -0,0 +1,183 @@
+import asyncio
+import time
+from datetime import datetime
+
+from config.db_settings import ingest_flush_interval_ms, ingest_batch_size
+from models.db_pool import database
+from models.db_queries import log_intake_batch, get_daily_totals
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+WATER = "water"
+CALORIES = "calories"
+WORKOUT = "workout"
+
+
+def _write_batch(conn, cursor, items):
+    """
+    Записывает пачку в одной транзакции и возвращает итоги дня для каждого (user_id, day).
+    """
+    rows = {WATER: [], CALORIES: [], WORKOUT: []}
+    for kind, user_id, day, values, _ in items:
+        rows[kind].append((user_id, day, *values))
+    log_intake_batch(cursor, rows[WATER], rows[CALORIES], rows[WORKOUT])
+    keys = {(user_id, day) for _, user_id, day, _, _ in items}
+    return {key: get_daily_totals(*key, cursor) for key in keys}
+
+
+class IngestQueue:
+    """
+    Очередь групповой записи для воды, калорий и тренировок.
+
+    Записи от разных пользователей копятся до flush_interval секунд или batch_size штук
+    и фиксируются одной транзакцией через executemany. Вызывающий ждёт, пока его запись
+    не будет зафиксирована, и получает итоги своего дня (DailyTotals).
+    Пачка делится по шардам пользователей, и шарды пишутся параллельно.
+    Если пачка не записалась, записи повторяются по одной, чтобы ошибка одной
+    не затронула остальных.
+    """
+
+    def __init__(self, database, flush_interval, batch_size):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._items = []
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task = None
+        # Метрики
+        self.batches = 0
+        self.rows = 0
+        self.max_batch = 0
+        self.commit_time = 0.0
+        self.max_commit_time = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _submit(self, kind, user_id, values):
+        future = asyncio.get_running_loop().create_future()
+        self._items.append((kind, user_id, datetime.now().date(), values, future))
+        self._has_items.set()
+        if len(self._items) >= self.batch_size:
+            self._full.set()
+        self._ensure_started()
+        return await future
+
+    async def log_water(self, user_id, amount):
+        """
+        :return: DailyTotals пользователя за сегодня после записи
+        """
+        return await self._submit(WATER, user_id, (amount,))
+
+    async def log_calories(self, user_id, amount):
+        """
+        :return: DailyTotals пользователя за сегодня после записи
+        """
+        return await self._submit(CALORIES, user_id, (amount,))
+
+    async def log_workout(self, user_id, workout_type, duration, calories_burned):
+        """
+        :return: DailyTotals пользователя за сегодня после записи
+        """
+        return await self._submit(WORKOUT, user_id, (workout_type, duration, calories_burned))
+
+    def _take_batch(self):
+        batch, self._items = self._items[:self.batch_size], self._items[self.batch_size:]
+        if not self._items:
+            self._has_items.clear()
+        if len(self._items) < self.batch_size:
+            self._full.clear()
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            # При закрытии не ждём заполнения пачки: остаток записывается сразу
+            if not self._closing and len(self._items) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush(self._take_batch())
+            if self._closing and not self._items:
+                return
+
+    async def _flush(self, batch):
+        by_shard = {}
+        for item in batch:
+            by_shard.setdefault(self.database.shard_index(item[1]), []).append(item)
+        await asyncio.gather(*(
+            self._flush_shard(self.database.shards[index], items) for index, items in by_shard.items()
+        ))
+
+    async def _flush_shard(self, shard, batch):
+        started = time.perf_counter()
+        try:
+            totals = await shard.write(_write_batch, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][-1].done():
+                    batch[0][-1].set_exception(e)
+                return
+            logger.error("Ошибка при записи пачки из %s записей, повторяем по одной: %s", len(batch), e)
+            for item in batch:
+                await self._flush_shard(shard, [item])
+            return
+
+        elapsed = time.perf_counter() - started
+        self.batches += 1
+        self.rows += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+        self.commit_time += elapsed
+        self.max_commit_time = max(self.max_commit_time, elapsed)
+
+        for _, user_id, day, _, future in batch:
+            if not future.done():
+                future.set_result(totals[(user_id, day)])
+
+    async def close(self):
+        """
+        Останавливает фоновую запись и фиксирует всё, что осталось в очереди.
+
+        Задача записи не отменяется: пачка, которую она уже забрала из очереди, дописывается,
+        и все ожидающие получают результат. Затем задача записывает остаток и завершается.
+        """
+        self._closing = True
+        # Будим задачу, ждёт ли она первых записей или заполнения пачки
+        self._has_items.set()
+        self._full.set()
+        try:
+            if self._task is not None:
+                await self._task
+                self._task = None
+            while self._items:
+                await self._flush(self._take_batch())
+        finally:
+            self._closing = False
+            if not self._items:
+                self._has_items.clear()
+                self._full.clear()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": self.rows / self.batches if self.batches else 0,
+            "max_batch": self.max_batch,
+            "avg_commit_ms": self.commit_time / self.batches * 1000 if self.batches else 0,
+            "max_commit_ms": self.max_commit_time * 1000,
+        }
+
+
+ingest_queue = IngestQueue(database, ingest_flush_interval_ms / 1000, ingest_batch_size)
+
+metrics.callback("bot_ingest_batches_total", "Пачки, записанные очередью групповой записи",
+                 lambda: ingest_queue.batches, kind="counter")
+metrics.callback("bot_ingest_rows_total", "Записи, прошедшие через очередь групповой записи",
+                 lambda: ingest_queue.rows, kind="counter")
+metrics.callback("bot_ingest_pending", "Записи, ожидающие фиксации", lambda: len(ingest_queue._items))
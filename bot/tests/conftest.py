@@ -0,0 +1,77 @@
+"""
+Общая настройка тестов.
+
+Настройки бота читаются из окружения при импорте модулей config, поэтому окружение
+задаётся здесь, до импорта кода бота: все файлы БД — во временном каталоге сессии,
+логи пишутся синхронно, /metrics выключен.
+
+Запуск из каталога bot:
+    python -m pytest -q
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
+
+SESSION_DIR = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.update({
+    "BOT_TOKEN": "123456:TEST",
+    "MAIN_DATABASE": os.path.join(SESSION_DIR, "health_tracker.db"),
+    "SHARD_DATABASE_TEMPLATE": os.path.join(SESSION_DIR, "health_tracker.shard{index}.db"),
+    "DB_SHARDS": "1",
+    "FOOD_DATABASE": os.path.join(SESSION_DIR, "food_cache.db"),
+    "FSM_DATABASE": os.path.join(SESSION_DIR, "fsm_storage.db"),
+    "ARCHIVE_DIRECTORY": os.path.join(SESSION_DIR, "archive"),
+    "EXPORT_DIRECTORY": SESSION_DIR,
+    "IMPORT_DIRECTORY": SESSION_DIR,
+    "METRICS_PORT": "0",
+    "LOG_ASYNC": "0",
+    "LOG_LEVEL": "WARNING",
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SESSION_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    """
+    Создаёт файл БД с применёнными миграциями.
+
+    :return: Функция (имя файла, миграции) -> путь к БД
+    """
+    from models.db_utils import get_database_connection, close_database_connection
+    from models.db_migrations import run_migrations, MAIN_MIGRATIONS
+
+    def make(name="health_tracker.db", migrations=MAIN_MIGRATIONS):
+        path = str(tmp_path / name)
+        conn, cursor = get_database_connection(path)
+        try:
+            run_migrations(conn, cursor, migrations)
+        finally:
+            close_database_connection(conn)
+        return path
+
+    return make
+
+
+@pytest.fixture
+def main_db(migrated_db, monkeypatch):
+    """
+    Подменяет основную БД пула models.db_pool.database (один шард) на временную.
+    Пул закрывает сам тест в том же цикле событий, где открывал.
+
+    :return: Путь к БД
+    """
+    from models.db_pool import database
+
+    path = migrated_db()
+    monkeypatch.setattr(database.shared, "db_name", path)
+    return path
@@ -0,0 +1,75 @@
+"""
+Дневные итоги daily_totals: поиск расхождений с сырыми таблицами и пересчёт
+(models/db_queries.py, tools/daily_totals.py).
+"""
+from models.db_queries import (
+    log_intake_batch,
+    find_daily_totals_mismatches,
+    rebuild_daily_totals,
+    set_compacted_before
+)
+from models.db_utils import get_database_connection, close_database_connection
+from tools.daily_totals import backfill, check
+
+
+def open_filled(path):
+    conn, cursor = get_database_connection(path)
+    log_intake_batch(
+        cursor,
+        [(1, "2024-05-01", 250), (1, "2024-05-01", 300), (2, "2024-05-02", 500)],
+        [(1, "2024-05-01", 450), (2, "2024-05-03", 700)],
+        [(1, "2024-05-02", "бег", 30, 300)],
+    )
+    conn.commit()
+    return conn, cursor
+
+
+def test_batch_writes_keep_totals_consistent(migrated_db):
+    conn, cursor = open_filled(migrated_db())
+    try:
+        assert find_daily_totals_mismatches(cursor) == []
+        cursor.execute("SELECT water, calories FROM daily_totals WHERE user_id = 1 AND day = '2024-05-01';")
+        assert cursor.fetchone() == (550, 450)
+        assert check(conn, cursor, limit=100)
+    finally:
+        close_database_connection(conn)
+
+
+def test_mismatches_found_and_backfill_fixes_them(migrated_db):
+    conn, cursor = open_filled(migrated_db())
+    try:
+        # Итоги разошлись: лишняя вода, запись без итогов и итоги без записей
+        cursor.execute("UPDATE daily_totals SET water = water + 1 WHERE user_id = 1 AND day = '2024-05-01';")
+        cursor.execute("INSERT INTO water_intake (user_id, date, water_consumed) VALUES (3, '2024-05-04', 200);")
+        cursor.execute("INSERT INTO daily_totals (user_id, day, calories) VALUES (4, '2024-05-05', 100);")
+        conn.commit()
+
+        mismatches = {(user_id, str(day)) for user_id, day, *_ in find_daily_totals_mismatches(cursor)}
+        assert mismatches == {(1, "2024-05-01"), (3, "2024-05-04"), (4, "2024-05-05")}
+        assert len(find_daily_totals_mismatches(cursor, limit=2)) == 2
+        assert not check(conn, cursor, limit=100)
+
+        backfill(conn, cursor)
+        assert find_daily_totals_mismatches(cursor) == []
+        assert check(conn, cursor, limit=100)
+    finally:
+        close_database_connection(conn)
+
+
+def test_compacted_days_are_not_rebuilt(migrated_db):
+    conn, cursor = open_filled(migrated_db())
+    try:
+        # Сырые записи до 2024-05-02 перенесены в архив: итоги за эти дни остаются только в daily_totals
+        set_compacted_before("2024-05-02", cursor)
+        cursor.execute("DELETE FROM water_intake WHERE date < '2024-05-02';")
+        cursor.execute("DELETE FROM calorie_intake WHERE date < '2024-05-02';")
+        conn.commit()
+
+        assert find_daily_totals_mismatches(cursor, since="2024-05-02") == []
+        assert rebuild_daily_totals(conn, cursor, "2024-05-02") == 3
+        conn.commit()
+        cursor.execute("SELECT water, calories FROM daily_totals WHERE user_id = 1 AND day = '2024-05-01';")
+        assert cursor.fetchone() == (550, 450)
+        assert check(conn, cursor, limit=100)
+    finally:
+        close_database_connection(conn)
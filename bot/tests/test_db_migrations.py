@@ -0,0 +1,77 @@
+"""
+Миграции (models/db_migrations.py): миграция и обновление user_version атомарны.
+"""
+import pytest
+
+from models.db_migrations import run_migrations, get_schema_version, MAIN_MIGRATIONS, FOOD_MIGRATIONS
+from models.db_tables import setup_users, setup_food_products
+from models.db_utils import get_database_connection, close_database_connection
+
+
+@pytest.fixture
+def db(tmp_path):
+    conn, cursor = get_database_connection(str(tmp_path / "migrations.db"))
+    yield conn, cursor
+    close_database_connection(conn)
+
+
+def tables(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    return {row[0] for row in cursor.fetchall()}
+
+
+class MigrationFailed(Exception):
+    pass
+
+
+def fail(conn, cursor):
+    raise MigrationFailed("сбой посреди миграции")
+
+
+def test_failed_migration_leaves_version_and_schema_unchanged(db):
+    conn, cursor = db
+
+    def create_users_and_fail(conn, cursor):
+        setup_users(conn, cursor)
+        cursor.execute("INSERT INTO users (name, birth_date, weight, height, gender, city) "
+                       "VALUES ('u', '1990-01-01', 70, 175, 'м', 'Moscow')")
+        fail(conn, cursor)
+
+    def create_log(conn, cursor):
+        cursor.execute("CREATE TABLE log (id INTEGER PRIMARY KEY)")
+
+    with pytest.raises(MigrationFailed):
+        run_migrations(conn, cursor, {1: create_log, 2: create_users_and_fail})
+
+    assert get_schema_version(cursor) == 1
+    assert "log" in tables(cursor)
+    assert "users" not in tables(cursor)
+
+    # После исправления миграция применяется с того же места
+    assert run_migrations(conn, cursor, {1: create_log, 2: setup_users}) == 2
+    assert "users" in tables(cursor)
+
+
+def test_failed_food_migration_is_rolled_back(db):
+    conn, cursor = db
+
+    def create_food_and_fail(conn, cursor):
+        setup_food_products(conn, cursor)
+        fail(conn, cursor)
+
+    with pytest.raises(MigrationFailed):
+        run_migrations(conn, cursor, {1: create_food_and_fail})
+
+    assert get_schema_version(cursor) == 0
+    assert tables(cursor) == set()
+
+
+@pytest.mark.parametrize("migrations", [MAIN_MIGRATIONS, FOOD_MIGRATIONS], ids=["main", "food"])
+def test_migrations_apply_once(db, migrations):
+    conn, cursor = db
+
+    assert run_migrations(conn, cursor, migrations) == max(migrations)
+    schema = tables(cursor)
+    assert run_migrations(conn, cursor, migrations) == max(migrations)
+    assert tables(cursor) == schema
+    assert not conn.in_transaction
@@ -0,0 +1,39 @@
+"""
+Короткий вариант benchmarks/db_stress.py: параллельные читатели и писатели на отдельных
+соединениях с профилем config.db_settings не получают "database is locked",
+а записанные строки и daily_totals сходятся.
+"""
+from argparse import Namespace
+
+from benchmarks.db_stress import prepare_database, run
+from config.db_settings import db_profile
+from models.db_queries import find_daily_totals_mismatches
+from models.db_utils import get_database_connection, close_database_connection
+
+USERS = 50
+
+
+def water_rows(db_name):
+    conn, cursor = get_database_connection(db_name)
+    try:
+        cursor.execute("SELECT COUNT(*) FROM water_intake;")
+        count = cursor.fetchone()[0]
+        return count, find_daily_totals_mismatches(cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def test_concurrent_access_without_locked_errors(tmp_path):
+    db_name = str(tmp_path / "stress.db")
+    prepare_database(db_name, rows=4000, users=USERS)
+    before, _ = water_rows(db_name)
+
+    counters = run(db_name, db_profile, Namespace(readers=4, writers=2, seconds=1.5, users=USERS))
+
+    assert counters.locked == 0
+    assert counters.errors == 0
+    assert counters.reads and counters.writes
+    after, mismatches = water_rows(db_name)
+    # Каждая успешная транзакция добавила ровно одну запись и обновила итоги дня
+    assert after - before == len(counters.writes)
+    assert mismatches == []
@@ -0,0 +1,252 @@
+"""
+Выгрузка истории (utils/export.py, handlers/export.py): разделы и строки в CSV и JSON Lines,
+повторный импорт выгрузки, итоги сжатых дней и удаление временного файла.
+"""
+import asyncio
+import csv
+import gzip
+import json
+import os
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from handlers import export as export_handler
+from models.db_pool import database
+from models.db_queries import save_user_profile, log_user_norms, log_intake_batch
+from models.db_utils import get_database_connection, close_database_connection
+from utils import export as export_module
+from utils.export import export_user_history
+from utils.history_import import ImportStats, import_history
+from utils.retention import compact_shard
+
+USER_ID = 5
+OTHER_USER_ID = 6
+IMPORTED_USER_ID = 9
+
+WATER = [("2024-05-01", 250.0), ("2024-05-01", 300.0), ("2024-05-02", 400.0), ("2024-05-05", 500.0)]
+CALORIES = [("2024-05-01", 450.0), ("2024-05-05", 600.0)]
+WORKOUTS = [("2024-05-02", "бег", 30, 300.0), ("2024-05-05", "йога", 20, 80.0)]
+RAW_SECTIONS = ("water_intake", "calorie_intake", "workouts")
+
+
+def seed(path):
+    conn, cursor = get_database_connection(path)
+    try:
+        save_user_profile(USER_ID, "user5", "Пользователь, «пять»", "1990-01-01", "Moscow", 175, 70, "м",
+                          0, 0, 0, conn, cursor)
+        log_user_norms(USER_ID, 2200, 2.5, 40, conn, cursor)
+        log_intake_batch(
+            cursor,
+            [(USER_ID, *row) for row in WATER] + [(OTHER_USER_ID, "2024-05-01", 999)],
+            [(USER_ID, *row) for row in CALORIES],
+            [(USER_ID, *row) for row in WORKOUTS],
+        )
+        conn.commit()
+    finally:
+        close_database_connection(conn)
+
+
+def read_export(path):
+    """
+    :return: Словарь {раздел: список словарей полей}; значения CSV — строки
+    """
+    sections = {}
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+        if path.endswith(".jsonl.gz"):
+            for line in file:
+                record = json.loads(line)
+                sections.setdefault(record.pop("table"), []).append(record)
+        else:
+            header = None
+            for row in csv.reader(file):
+                if row[0] == "table":
+                    header = row[1:]
+                    continue
+                sections.setdefault(row[0], []).append(dict(zip(header, row[1:])))
+    return sections
+
+
+def raw_rows(sections):
+    """
+    :return: Сырые записи выгрузки в виде WATER, CALORIES, WORKOUTS
+    """
+    return (
+        [(row["date"], float(row["water_consumed"])) for row in sections.get("water_intake", [])],
+        [(row["date"], float(row["calories"])) for row in sections.get("calorie_intake", [])],
+        [(row["date"], row["workout_type"], int(row["duration"]), float(row["calories_burned"]))
+         for row in sections.get("workouts", [])],
+    )
+
+
+def user_history(path, user_id):
+    """
+    :return: (сырые записи в виде WATER, CALORIES, WORKOUTS, дневные итоги) пользователя в БД
+    """
+    conn, cursor = get_database_connection(path)
+    try:
+        cursor.execute("SELECT date, water_consumed FROM water_intake WHERE user_id = ? ORDER BY date, id;", (user_id,))
+        water = cursor.fetchall()
+        cursor.execute("SELECT date, calories FROM calorie_intake WHERE user_id = ? ORDER BY date, id;", (user_id,))
+        calories = cursor.fetchall()
+        cursor.execute("""
+            SELECT date, workout_type, duration, calories_burned FROM workouts WHERE user_id = ? ORDER BY date, id;
+        """, (user_id,))
+        workouts = cursor.fetchall()
+        cursor.execute("""
+            SELECT day, water, calories, workout_minutes, burned FROM daily_totals WHERE user_id = ? ORDER BY day;
+        """, (user_id,))
+        return (water, calories, workouts), cursor.fetchall()
+    finally:
+        close_database_connection(conn)
+
+
+def run(scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await database.close()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "export"
+    directory.mkdir()
+    monkeypatch.setattr(export_module, "export_directory", str(directory))
+    return directory
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_sections_and_rows(main_db, export_dir, fmt):
+    seed(main_db)
+
+    async def scenario():
+        return await export_user_history(USER_ID, fmt)
+
+    export = run(scenario)
+    sections = read_export(export.path)
+
+    assert export.filename.endswith(f".{fmt}.gz")
+    assert export.size == os.path.getsize(export.path)
+    assert export.rows == 1 + 1 + len(WATER) + len(CALORIES) + len(WORKOUTS)
+    assert set(sections) == {"profile", "user_goals", *RAW_SECTIONS}
+    assert sections["profile"][0]["name"] == "Пользователь, «пять»"
+    assert float(sections["user_goals"][0]["calories_goal"]) == 2200
+    # Дни не сжимались: итогов в выгрузке нет, записи другого пользователя не попадают
+    assert raw_rows(sections) == (WATER, CALORIES, WORKOUTS)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_round_trip(main_db, export_dir, fmt):
+    seed(main_db)
+
+    async def scenario():
+        export = await export_user_history(USER_ID, fmt)
+        stats = await import_history(IMPORTED_USER_ID, export.path, ImportStats())
+        os.remove(export.path)
+        return stats
+
+    stats = run(scenario)
+    exported, exported_totals = user_history(main_db, USER_ID)
+    imported, imported_totals = user_history(main_db, IMPORTED_USER_ID)
+
+    assert (stats.water, stats.calories, stats.workouts) == (len(WATER), len(CALORIES), len(WORKOUTS))
+    # Профиль и нормы не импортируются
+    assert stats.skipped == 2
+    assert stats.invalid == 0
+    assert imported == exported
+    assert imported_totals == exported_totals
+
+
+def test_archived_days_are_exported_as_totals(main_db, export_dir, tmp_path):
+    seed(main_db)
+
+    async def scenario():
+        await compact_shard(database.shared, date(2024, 5, 3), directory=str(tmp_path / "archive"))
+        return await export_user_history(USER_ID, "csv")
+
+    sections = read_export(run(scenario).path)
+    totals = [
+        (row["day"], float(row["water"]), float(row["calories"]), int(row["workout_minutes"]), float(row["burned"]))
+        for row in sections["daily_totals"]
+    ]
+
+    assert totals == [("2024-05-01", 550.0, 450.0, 0, 0.0), ("2024-05-02", 400.0, 0.0, 30, 300.0)]
+    # Сырые записи сжатых дней перенесены в архив и не выгружаются
+    assert raw_rows(sections) == (WATER[3:], CALORIES[1:], WORKOUTS[1:])
+
+
+class FakeMessage:
+    def __init__(self, error=None):
+        self.from_user = SimpleNamespace(id=USER_ID)
+        self.error = error
+        self.documents = []
+        self.answers = []
+
+    async def answer_document(self, document, caption):
+        # Файл должен существовать, пока Telegram его не получил
+        assert os.path.exists(document.path)
+        if self.error is not None:
+            raise self.error
+        self.documents.append((document.filename, caption))
+
+    async def answer(self, text):
+        self.answers.append(text)
+
+    async def reply(self, text):
+        self.answers.append(text)
+
+
+@pytest.mark.parametrize("error", [None, ConnectionError("сеть недоступна")])
+def test_handler_removes_temp_file(main_db, export_dir, error):
+    seed(main_db)
+    message = FakeMessage(error)
+
+    async def scenario():
+        await export_handler.export_history(message, SimpleNamespace(args="json"))
+
+    if error is None:
+        run(scenario)
+        assert len(message.documents) == 1
+        assert message.documents[0][0].endswith(".jsonl.gz")
+    else:
+        with pytest.raises(ConnectionError):
+            run(scenario)
+    assert os.listdir(export_dir) == []
+
+
+def test_failed_export_removes_temp_file(main_db, export_dir, monkeypatch):
+    seed(main_db)
+    message = FakeMessage()
+
+    def fail(conn, cursor, user_id, path, fmt):
+        with open(path, "w") as file:
+            file.write("часть выгрузки")
+        raise OSError("нет места на диске")
+
+    monkeypatch.setattr(export_module, "write_user_history", fail)
+
+    async def scenario():
+        await export_handler.export_history(message, SimpleNamespace(args="csv"))
+
+    run(scenario)
+    assert message.documents == []
+    assert len(message.answers) == 1 and "Не удалось" in message.answers[0]
+    assert os.listdir(export_dir) == []
+
+
+def test_handler_removes_empty_export(main_db, export_dir):
+    message = FakeMessage()
+    message.from_user.id = IMPORTED_USER_ID
+
+    async def scenario():
+        await export_handler.export_history(message, SimpleNamespace(args=None))
+
+    run(scenario)
+    assert message.documents == []
+    assert len(message.answers) == 1 and "Данных пока нет" in message.answers[0]
+    assert os.listdir(export_dir) == []
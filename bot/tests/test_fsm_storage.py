@@ -0,0 +1,147 @@
+"""
+Хранилище FSM: чтение из кэша не занимает писателя, изменения другого процесса видны
+после проверки data_version.
+"""
+import asyncio
+import time
+from datetime import date
+
+from aiogram.fsm.storage.base import StorageKey
+
+from models.db_migrations import FSM_MIGRATIONS
+from utils.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+OTHER_KEY = StorageKey(bot_id=1, chat_id=20, user_id=20)
+
+
+def count_calls(storage):
+    """
+    Считает обращения хранилища к соединениям чтения и записи.
+
+    :return: Словарь {"read": n, "write": n}
+    """
+    calls = {"read": 0, "write": 0}
+    for name in calls:
+        method = getattr(storage._db, name)
+
+        async def counted(func, *args, name=name, method=method):
+            calls[name] += 1
+            return await method(func, *args)
+
+        setattr(storage._db, name, counted)
+    return calls
+
+
+def test_reads_do_not_use_writer(migrated_db):
+    path = migrated_db("fsm.db", FSM_MIGRATIONS)
+
+    async def scenario():
+        storage = SQLiteStorage(path, ttl=3600, cache_size=100, version_check_interval=60)
+        calls = count_calls(storage)
+        try:
+            assert await storage.get_state(KEY) is None
+            assert await storage.get_data(OTHER_KEY) == {}
+            assert calls == {"read": 2, "write": 0}
+
+            await storage.set_state(KEY, "Profile:age")
+            await storage.update_data(KEY, {"birth_date": date(1990, 5, 17)})
+            assert calls["write"] == 2
+
+            # В пределах интервала проверки состояние берётся из кэша без обращения к БД
+            reads = calls["read"]
+            for _ in range(10):
+                assert await storage.get_state(KEY) == "Profile:age"
+                assert await storage.get_data(KEY) == {"birth_date": date(1990, 5, 17)}
+            assert calls["read"] == reads
+            assert calls["write"] == 2
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_change_by_other_process_is_seen_after_interval(migrated_db):
+    path = migrated_db("fsm.db", FSM_MIGRATIONS)
+    interval = 0.2
+
+    async def scenario():
+        first = SQLiteStorage(path, ttl=3600, cache_size=100, version_check_interval=interval)
+        second = SQLiteStorage(path, ttl=3600, cache_size=100, version_check_interval=interval)
+        try:
+            await first.set_state(KEY, "Profile:age")
+            await first.set_data(KEY, {"age": 30})
+            assert await second.get_state(KEY) == "Profile:age"
+
+            await second.set_state(KEY, "Profile:height")
+            await second.update_data(KEY, {"height": 180})
+            time.sleep(interval)
+            assert await first.get_state(KEY) == "Profile:height"
+            assert await first.get_data(KEY) == {"age": 30, "height": 180}
+
+            await first.set_state(KEY, None)
+            time.sleep(interval)
+            assert await first.get_state(KEY) is None
+            assert await second.get_state(KEY) is None
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_own_writes_keep_cache(migrated_db):
+    path = migrated_db("fsm.db", FSM_MIGRATIONS)
+
+    async def scenario():
+        # Версия проверяется при каждом чтении
+        first = SQLiteStorage(path, ttl=3600, cache_size=100, version_check_interval=0)
+        second = SQLiteStorage(path, ttl=3600, cache_size=100, version_check_interval=0)
+        other_key = first._key(OTHER_KEY)
+        try:
+            await first.set_state(KEY, "Profile:age")
+            await first.set_state(OTHER_KEY, "Profile:city")
+            cached = first._cache[other_key]
+            for age in range(5):
+                await first.update_data(KEY, {"age": age})
+                assert await first.get_state(OTHER_KEY) == "Profile:city"
+            # Запись не перечитывалась из БД
+            assert first._cache[other_key] is cached
+
+            # Запись другого процесса сбрасывает кэш при проверке версии
+            await second.set_state(OTHER_KEY, "Profile:weight")
+            assert await first.get_state(KEY) == "Profile:age"
+            assert other_key not in first._cache
+            assert await first.get_state(OTHER_KEY) == "Profile:weight"
+
+            # Чужая запись перед собственной обнаруживается и без чтения
+            await second.set_state(OTHER_KEY, "Profile:height")
+            await first.set_data(KEY, {"age": 40})
+            assert other_key not in first._cache
+            assert await first.get_state(OTHER_KEY) == "Profile:height"
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_state_survives_restart(migrated_db):
+    path = migrated_db("fsm.db", FSM_MIGRATIONS)
+
+    async def scenario():
+        storage = SQLiteStorage(path, ttl=3600, cache_size=100)
+        try:
+            await storage.set_state(KEY, "Profile:weight")
+            await storage.set_data(KEY, {"birth_date": date(2000, 1, 2), "height": 175})
+        finally:
+            await storage.close()
+
+        storage = SQLiteStorage(path, ttl=3600, cache_size=100)
+        try:
+            assert await storage.get_state(KEY) == "Profile:weight"
+            assert await storage.get_data(KEY) == {"birth_date": date(2000, 1, 2), "height": 175}
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
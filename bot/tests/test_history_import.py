@@ -0,0 +1,176 @@
+"""
+Импорт истории (utils/history_import.py): разбор CSV, JSON Lines и gzip, отклонение
+некорректных строк и продолжение прерванного импорта при повторной отправке файла.
+"""
+import asyncio
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+
+from models.db_pool import database
+from models.db_queries import get_history_import
+from models.db_utils import get_database_connection, close_database_connection
+from utils.history_import import ImportStats, ImportFormatError, import_history, open_import_file, read_chunks
+
+USER_ID = 7
+TODAY = date(2024, 6, 1)
+
+CSV_TEXT = (
+    "table,date,water_consumed\n"
+    "water_intake,2024-05-01,250\n"
+    "water_intake,02.05.2024,300\n"
+    "\n"
+    "table,date,calories\n"
+    "calorie_intake,2024-05-01,450\n"
+    "table,date,workout_type,duration,calories_burned\n"
+    "workouts,2024-05-01,бег,30,\n"
+    "workouts,2024-05-02,йога,,120\n"
+    "table,user_id,calories_goal\n"
+    "user_goals,1,2000\n"
+)
+
+
+def read_all(file, stats, **kwargs):
+    water, calories, workouts = [], [], []
+    for water_rows, calorie_rows, workout_rows, _ in read_chunks(file, USER_ID, stats, today=TODAY, **kwargs):
+        water += water_rows
+        calories += calorie_rows
+        workouts += workout_rows
+    return water, calories, workouts
+
+
+def test_csv_sections():
+    stats = ImportStats()
+    water, calories, workouts = read_all(io.StringIO(CSV_TEXT), stats, weight=70)
+
+    assert water == [(USER_ID, "2024-05-01", 250.0), (USER_ID, "2024-05-02", 300.0)]
+    assert calories == [(USER_ID, "2024-05-01", 450.0)]
+    # Сожжённые калории бега считаются по весу, у йоги взяты из файла
+    assert workouts[0][:4] == (USER_ID, "2024-05-01", "бег", 30) and workouts[0][4] > 0
+    assert workouts[1] == (USER_ID, "2024-05-02", "йога", None, 120.0)
+    assert stats.skipped == 1
+    assert stats.invalid == 0
+
+
+def test_jsonl_records():
+    lines = [
+        {"table": "water_intake", "date": "2024-05-01", "water_consumed": 250},
+        {"table": "calorie_intake", "date": "2024-05-01", "calories": "450"},
+        {"table": "workouts", "date": "2024-05-01", "workout_type": "Бег", "calories_burned": 300},
+        {"table": "profile", "name": "Пользователь"},
+    ]
+    text = "\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n"
+    stats = ImportStats()
+    water, calories, workouts = read_all(io.StringIO(text), stats)
+
+    assert water == [(USER_ID, "2024-05-01", 250.0)]
+    assert calories == [(USER_ID, "2024-05-01", 450.0)]
+    assert workouts == [(USER_ID, "2024-05-01", "бег", None, 300.0)]
+    assert stats.skipped == 1
+
+
+def test_gzip_detected_by_signature(main_db, tmp_path):
+    # Расширение не важно: gzip распознаётся по первым байтам
+    path = tmp_path / "history.csv"
+    path.write_bytes(gzip.compress(CSV_TEXT.encode("utf-8")))
+    stats = ImportStats()
+    with open_import_file(path) as file:
+        water, calories, workouts = read_all(file, stats, weight=70)
+    assert (len(water), len(calories), len(workouts)) == (2, 1, 2)
+
+    # Обрезанный gzip — ошибка формата, а не падение импорта
+    path.write_bytes(gzip.compress(CSV_TEXT.encode("utf-8"))[:40])
+
+    async def scenario():
+        try:
+            await import_history(USER_ID, path, ImportStats())
+        finally:
+            await database.close()
+
+    with pytest.raises(ImportFormatError):
+        asyncio.run(scenario())
+
+
+def test_invalid_rows_are_rejected():
+    text = (
+        '{"table": "water_intake", "date": "2024-05-01", "water_consumed": 250}\n'
+        "не JSON\n"
+        '{"table": "water_intake", "date": "2024-13-01", "water_consumed": 250}\n'
+        '{"table": "water_intake", "date": "2030-01-01", "water_consumed": 250}\n'
+        '{"table": "water_intake", "date": "2024-05-01", "water_consumed": 0}\n'
+        '{"table": "calorie_intake", "date": "2024-05-01", "calories": "NaN"}\n'
+        '{"table": "workouts", "date": "2024-05-01", "workout_type": "бег"}\n'
+        '{"table": "sleep", "date": "2024-05-01"}\n'
+    )
+    stats = ImportStats()
+    water, calories, workouts = read_all(io.StringIO(text), stats)
+
+    assert water == [(USER_ID, "2024-05-01", 250.0)]
+    assert calories == [] and workouts == []
+    assert stats.invalid == 7
+    assert stats.errors == [
+        "строка 2: не удалось разобрать строку",
+        "строка 3: некорректная дата «2024-13-01»",
+        f"строка 4: дата 2030-01-01 вне диапазона 2000-01-01 — {TODAY}",
+        "строка 5: water_consumed вне диапазона 1–10000",
+        "строка 6: calories вне диапазона 1–20000",
+    ]
+
+
+def test_csv_without_header_is_format_error():
+    with pytest.raises(ImportFormatError):
+        read_all(io.StringIO("water_intake,2024-05-01,250\n"), ImportStats())
+
+
+def water_totals(path):
+    conn, cursor = get_database_connection(path)
+    try:
+        cursor.execute("SELECT COUNT(*), SUM(water_consumed) FROM water_intake WHERE user_id = ?;", (USER_ID,))
+        rows = cursor.fetchone()
+        return rows, get_history_import(USER_ID, "file-1", cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def test_interrupted_import_resumes_without_duplicates(main_db, tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text("table,date,water_consumed\n" + "".join(
+        f"water_intake,2024-05-{day:02d},{day * 10}\n" for day in range(1, 11)
+    ), encoding="utf-8")
+
+    async def fail_after_second_chunk(stats):
+        if stats.imported >= 6:
+            raise RuntimeError("обрыв соединения")
+
+    async def first_attempt():
+        try:
+            await import_history(USER_ID, path, ImportStats(), file_unique_id="file-1",
+                                 progress=fail_after_second_chunk, chunk_size=3)
+        finally:
+            await database.close()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(first_attempt())
+
+    (count, total), previous = water_totals(main_db)
+    # Две пачки по 3 записи зафиксированы вместе с отметкой строки, на которой они закончились
+    assert count == 6
+    assert previous == (6, 7, 0)
+
+    async def resend():
+        try:
+            return await import_history(USER_ID, path, ImportStats(), file_unique_id="file-1",
+                                        chunk_size=3, resume_line=previous[1])
+        finally:
+            await database.close()
+
+    stats = asyncio.run(resend())
+
+    (count, total), previous = water_totals(main_db)
+    assert stats.imported == 4
+    assert count == 10
+    assert total == sum(day * 10 for day in range(1, 11))
+    assert previous == (10, 11, 1)
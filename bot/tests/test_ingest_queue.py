@@ -0,0 +1,126 @@
+"""
+Очередь групповой записи (models/ingest_queue.py): сброс пачки по времени и по размеру,
+изоляция ошибочной записи и закрытие очереди, когда записи ещё не зафиксированы.
+"""
+import asyncio
+import sqlite3
+import time
+
+from models.db_pool import ShardedDatabase
+from models.ingest_queue import IngestQueue
+
+TIMEOUT = 5
+
+
+def _water_rows(conn, cursor):
+    cursor.execute("SELECT user_id, water_consumed FROM water_intake ORDER BY user_id;")
+    return cursor.fetchall()
+
+
+def run_queue(path, scenario, flush_interval, batch_size):
+    """
+    Открывает БД из одного шарда, выполняет scenario(queue, database) и закрывает очередь и БД.
+
+    :return: Результат scenario
+    """
+    async def main():
+        database = ShardedDatabase(path, [path], readers=1)
+        queue = IngestQueue(database, flush_interval=flush_interval, batch_size=batch_size)
+        await database.open()
+        try:
+            return await asyncio.wait_for(scenario(queue, database), TIMEOUT)
+        finally:
+            await asyncio.wait_for(queue.close(), TIMEOUT)
+            await database.close()
+
+    return asyncio.run(main())
+
+
+def test_batch_is_flushed_after_interval(migrated_db):
+    async def scenario(queue, database):
+        started = time.perf_counter()
+        totals = await asyncio.gather(*(queue.log_water(user_id, 100) for user_id in (1, 2, 3)))
+        return totals, time.perf_counter() - started, queue.stats(), await database.shared.read(_water_rows)
+
+    totals, elapsed, stats, rows = run_queue(migrated_db(), scenario, flush_interval=0.05, batch_size=100)
+
+    assert [total.water for total in totals] == [100, 100, 100]
+    assert elapsed >= 0.04
+    assert stats["batches"] == 1
+    assert stats["rows"] == 3
+    assert rows == [(1, 100), (2, 100), (3, 100)]
+
+
+def test_full_batch_is_flushed_without_waiting(migrated_db):
+    async def scenario(queue, database):
+        started = time.perf_counter()
+        await asyncio.gather(*(queue.log_water(user_id, 100) for user_id in range(1, 6)))
+        return time.perf_counter() - started, queue.stats()
+
+    elapsed, stats = run_queue(migrated_db(), scenario, flush_interval=10, batch_size=5)
+
+    assert elapsed < 5
+    assert stats["batches"] == 1
+    assert stats["max_batch"] == 5
+
+
+def test_bad_row_does_not_fail_batch(migrated_db):
+    async def scenario(queue, database):
+        results = await asyncio.gather(
+            queue.log_water(1, 100), queue.log_water(2, None), queue.log_water(3, 300),
+            return_exceptions=True
+        )
+        return results, queue.stats(), await database.shared.read(_water_rows)
+
+    results, stats, rows = run_queue(migrated_db(), scenario, flush_interval=0.01, batch_size=100)
+
+    assert results[0].water == 100
+    assert isinstance(results[1], (sqlite3.IntegrityError, TypeError))
+    assert results[2].water == 300
+    # Пачка откатилась, две исправные записи повторены по одной
+    assert stats["batches"] == 2
+    assert rows == [(1, 100), (3, 300)]
+
+
+def test_close_finishes_batch_in_flight(migrated_db, monkeypatch):
+    path = migrated_db()
+    flushing = asyncio.Event()
+
+    async def scenario(queue, database):
+        shard = database.shards[0]
+        write = shard.write
+
+        async def slow_write(func, *args):
+            flushing.set()
+            await asyncio.sleep(0.2)
+            return await write(func, *args)
+
+        monkeypatch.setattr(shard, "write", slow_write)
+        first = [asyncio.create_task(queue.log_water(user_id, 100)) for user_id in (1, 2, 3)]
+        await flushing.wait()
+        # Пачка уже забрана из очереди и пишется; новые записи ждут в очереди
+        second = [asyncio.create_task(queue.log_water(user_id, 200)) for user_id in (4, 5)]
+        await asyncio.sleep(0)
+        await queue.close()
+        assert all(task.done() for task in first + second)
+        totals = [task.result() for task in first + second]
+        return totals, await database.shared.read(_water_rows)
+
+    totals, rows = run_queue(path, scenario, flush_interval=0.01, batch_size=100)
+
+    assert [total.water for total in totals] == [100, 100, 100, 200, 200]
+    assert rows == [(1, 100), (2, 100), (3, 100), (4, 200), (5, 200)]
+
+
+def test_queue_accepts_writes_after_close(migrated_db):
+    async def scenario(queue, database):
+        await queue.log_water(1, 100)
+        await queue.close()
+        total = await queue.log_water(1, 50)
+        return total, await database.shared.read(_water_rows)
+
+    total, rows = run_queue(migrated_db(), scenario, flush_interval=0.01, batch_size=100)
+
+    assert total.water == 150
+    assert rows == [(1, 100), (1, 50)]
+
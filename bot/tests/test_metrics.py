@@ -0,0 +1,32 @@
+"""
+Эндпоинт /metrics выключен по умолчанию, а занятый порт даёт OSError без утечки сервера.
+"""
+import asyncio
+import importlib
+import socket
+
+import pytest
+
+import config.metrics_settings as metrics_settings
+from utils.metrics import start_metrics_server
+
+
+def test_metrics_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("METRICS_PORT", raising=False)
+    try:
+        assert importlib.reload(metrics_settings).metrics_port == 0
+    finally:
+        monkeypatch.undo()
+        importlib.reload(metrics_settings)
+
+
+def test_busy_port_raises_os_error():
+    async def scenario():
+        with socket.socket() as busy:
+            busy.bind(("127.0.0.1", 0))
+            busy.listen()
+            port = busy.getsockname()[1]
+            with pytest.raises(OSError):
+                await start_metrics_server("127.0.0.1", port)
+
+    asyncio.run(scenario())
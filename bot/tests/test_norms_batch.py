@@ -0,0 +1,76 @@
+"""
+Ночной пересчёт норм (utils/norms_batch.py): завершение пересчёта за день отмечается явно.
+"""
+import asyncio
+from datetime import datetime
+
+from models.db_pool import database
+from models.db_queries import save_user_profile, log_user_norms, scheduled_norms_logged
+from models.db_utils import get_database_connection, close_database_connection
+from utils import norms_batch
+from utils import weather_api
+from utils.weather_api import WeatherCache
+
+
+def batch_logged(path, day):
+    conn, cursor = get_database_connection(path)
+    try:
+        return scheduled_norms_logged(day, cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def test_batch_completion_is_not_inferred_from_last_user(monkeypatch, main_db):
+    async def fetch(city):
+        return 20
+
+    monkeypatch.setattr(norms_batch, "weather_cache", WeatherCache(ttl=3600))
+    monkeypatch.setattr(weather_api, "fetch_weather_from_api", fetch)
+    day = datetime.now().date()
+
+    conn, cursor = get_database_connection(main_db)
+    try:
+        for user_id in (1, 2, 3):
+            save_user_profile(user_id, "user", "Пользователь", "1990-01-01", "Moscow", 175, 70, "м", 0, 0, 0,
+                              conn, cursor)
+        # Пользователь с наибольшим id сам обновил нормы сегодня: пересчёт пропустит его,
+        # и по его записям завершение пересчёта не определить
+        log_user_norms(3, 2000, 2.0, 30, conn, cursor)
+    finally:
+        close_database_connection(conn)
+
+    assert not batch_logged(main_db, day)
+
+    async def scenario():
+        try:
+            return await norms_batch.recompute_all_norms(day), await norms_batch.recompute_all_norms(day)
+        finally:
+            await database.close()
+
+    first, repeated = asyncio.run(scenario())
+
+    assert first == 2
+    assert repeated == 0
+    assert batch_logged(main_db, day)
+
+
+def test_batch_norms_match_per_user_calculation(monkeypatch, main_db):
+    from benchmarks.norms_batch import fill, verify
+
+    async def fetch(city):
+        return None
+
+    monkeypatch.setattr(norms_batch, "weather_cache", WeatherCache(ttl=3600))
+    monkeypatch.setattr(weather_api, "fetch_weather_from_api", fetch)
+    users = 500
+    # Разные возраст, рост, вес и заданные пользователем нормы; погода известна для половины городов
+    fill(main_db, users, cities=20)
+
+    async def scenario():
+        try:
+            return await norms_batch.recompute_all_norms()
+        finally:
+            await database.close()
+
+    assert asyncio.run(scenario()) == users
+    assert verify(main_db, sample=users) == 0
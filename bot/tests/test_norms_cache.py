@@ -0,0 +1,134 @@
+"""
+Нормы пользователя (utils/norms_cache.py): температура не ждёт сеть, нормы без погоды
+не кэшируются на весь день, смена города сбрасывает кэш.
+"""
+import asyncio
+import time
+
+from models.db_pool import database
+from models.db_queries import save_user_profile
+from models.db_utils import get_database_connection, close_database_connection
+from utils import norms_cache as norms_module
+from utils import weather_api
+from utils.calculations import ADDITIONAL_WATER
+from utils.norms_cache import UserNormsCache, get_user_norms
+from utils.weather_api import WeatherCache
+
+USER_ID = 1
+
+
+def save_profile(path, city="Moscow", weight=70):
+    conn, cursor = get_database_connection(path)
+    try:
+        return save_user_profile(USER_ID, "user", "Пользователь", "1990-01-01", city, 175, weight, "м", 0, 0, 0,
+                                 conn, cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def use_fresh_caches(monkeypatch, fetch):
+    monkeypatch.setattr(norms_module, "norms_cache", UserNormsCache(100))
+    cache = WeatherCache(ttl=3600)
+    monkeypatch.setattr(norms_module, "weather_cache", cache)
+    monkeypatch.setattr(weather_api, "fetch_weather_from_api", fetch)
+    return cache
+
+
+def test_norms_do_not_wait_for_weather_api(monkeypatch, main_db):
+    save_profile(main_db)
+    requests = []
+
+    async def slow_fetch(city):
+        requests.append(city)
+        await asyncio.sleep(0.5)
+        return 30
+
+    use_fresh_caches(monkeypatch, slow_fetch)
+    monkeypatch.setattr(norms_module, "norms_weather_retry", 0)
+
+    async def scenario():
+        try:
+            started = time.perf_counter()
+            first = await get_user_norms(USER_ID)
+            elapsed = time.perf_counter() - started
+            # Погода загружена в фоне; нормы без неё не остались в кэше
+            await asyncio.sleep(0.7)
+            second = await get_user_norms(USER_ID)
+            third = await get_user_norms(USER_ID)
+            return first, elapsed, second, third
+        finally:
+            await database.close()
+
+    first, elapsed, second, third = asyncio.run(scenario())
+
+    assert elapsed < 0.3
+    assert first.extra_water == 0
+    assert not first.weather_fresh
+    assert second.extra_water == ADDITIONAL_WATER
+    assert second.water_goal == first.water_goal + ADDITIONAL_WATER
+    assert second.weather_fresh
+    # Нормы со свежей погодой кэшируются до конца дня
+    assert third is second
+    assert requests == ["moscow"]
+
+
+def test_norms_without_weather_are_cached_briefly(monkeypatch, main_db):
+    save_profile(main_db)
+    requests = []
+
+    async def failing_fetch(city):
+        requests.append(city)
+        return None
+
+    use_fresh_caches(monkeypatch, failing_fetch)
+    monkeypatch.setattr(norms_module, "norms_weather_retry", 0.2)
+
+    async def scenario():
+        try:
+            first = await get_user_norms(USER_ID)
+            cached = await get_user_norms(USER_ID)
+            await asyncio.sleep(0.3)
+            retried = await get_user_norms(USER_ID)
+            await asyncio.sleep(0.05)
+            return first, cached, retried
+        finally:
+            await database.close()
+
+    first, cached, retried = asyncio.run(scenario())
+
+    assert first.extra_water == 0
+    assert cached is first
+    assert retried is not first
+    # После истечения norms_weather_retry погода запрашивается снова
+    assert requests == ["moscow", "moscow"]
+
+
+def test_wait_weather_uses_loaded_temperature(monkeypatch, main_db):
+    save_profile(main_db)
+
+    async def fetch(city):
+        await asyncio.sleep(0.1)
+        return 30
+
+    use_fresh_caches(monkeypatch, fetch)
+
+    async def scenario():
+        try:
+            quick = await get_user_norms(USER_ID)
+            waited = await get_user_norms(USER_ID, wait_weather=True)
+            return quick, waited
+        finally:
+            await database.close()
+
+    quick, waited = asyncio.run(scenario())
+
+    assert not quick.weather_fresh
+    assert waited.weather_fresh
+    assert waited.extra_water == ADDITIONAL_WATER
+
+
+def test_city_change_counts_as_norms_change(main_db):
+    assert save_profile(main_db, city="Moscow")
+    assert not save_profile(main_db, city="Moscow")
+    assert save_profile(main_db, city="Sochi")
+    assert save_profile(main_db, city="Sochi", weight=71)
@@ -0,0 +1,202 @@
+"""
+Поиск продуктов (utils/openfoodfacts_api.py) против локальной заглушки OpenFoodFacts.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from models.db_migrations import FOOD_MIGRATIONS
+from models.db_pool import DatabasePool
+from models.food_store import find_cached_food, save_food_lookup
+from utils import openfoodfacts_api
+from utils.http_client import HttpClient
+
+
+class FoodStub:
+    """
+    Заглушка cgi/search.pl: запоминает запросы и отвечает через delay секунд по режиму mode.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.mode = "found"
+        self.delay = 0
+        self.calories = 52
+
+    async def handle(self, request):
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        if self.mode == "error":
+            return web.Response(status=500, text="Internal Server Error")
+        if self.mode == "empty":
+            return web.json_response({"products": []})
+        return web.json_response({"products": [{
+            "product_name": "Молоко ультрапастеризованное",
+            "nutriments": {"energy-kcal_100g": self.calories},
+            "brands": "Стаб",
+            "categories": "Молочные продукты",
+        }]})
+
+
+@asynccontextmanager
+async def food_api(monkeypatch, db_path, timeout=0.5):
+    stub = FoodStub()
+    app = web.Application()
+    app.router.add_get("/cgi/search.pl", stub.handle)
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    client = HttpClient("openfoodfacts-test", max_connections=2, timeout=timeout)
+    store = DatabasePool(db_path, readers=1)
+    monkeypatch.setattr(openfoodfacts_api, "OPENFOODFACTS_API_URL", str(server.make_url("/cgi/search.pl")))
+    monkeypatch.setattr(openfoodfacts_api, "food_client", client)
+    monkeypatch.setattr(openfoodfacts_api, "food_store", store)
+    try:
+        yield stub, store
+    finally:
+        await asyncio.gather(*openfoodfacts_api._refreshing.values(), return_exceptions=True)
+        await client.close()
+        await store.close()
+        await server.close()
+
+
+def test_search_sends_encoded_params_and_fields(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+    query = "молоко & хлеб 2.5%?x=1"
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path) as (stub, store):
+            info = await openfoodfacts_api.search_food_api(query)
+            return info, stub.requests
+
+    info, requests = asyncio.run(scenario())
+
+    assert len(requests) == 1
+    params = requests[0].query
+    # Спецсимволы запроса не ломают строку параметров: заглушка получает его целиком
+    assert params["search_terms"] == query
+    assert "%26" in requests[0].query_string
+    assert params["fields"] == openfoodfacts_api.PRODUCT_FIELDS
+    assert set(params["fields"].split(",")) == {"product_name", "nutriments", "brands", "categories"}
+    assert params["action"] == "process"
+    assert params["page_size"] == "1"
+    assert params["json"] == "1"
+    assert info == {
+        "name": "Молоко ультрапастеризованное",
+        "calories": 52,
+        "brand": "Стаб",
+        "categories": "Молочные продукты",
+    }
+
+
+def test_timeout_returns_none_and_is_not_cached(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path, timeout=0.2) as (stub, store):
+            stub.delay = 2
+            started = time.perf_counter()
+            info = await openfoodfacts_api.get_food_info("молоко")
+            elapsed = time.perf_counter() - started
+            return info, elapsed, await store.read(find_cached_food, "молоко")
+
+    info, elapsed, cached = asyncio.run(scenario())
+
+    assert info is None
+    assert elapsed < 1.5
+    assert cached is None
+
+
+def test_http_error_returns_none_and_is_not_cached(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path) as (stub, store):
+            stub.mode = "error"
+            info = await openfoodfacts_api.get_food_info("молоко")
+            stub.mode = "found"
+            retried = await openfoodfacts_api.get_food_info("молоко")
+            return info, retried, len(stub.requests)
+
+    info, retried, requests = asyncio.run(scenario())
+
+    assert info is None
+    # Ошибка не запоминается как «не найден»: следующий запрос снова идёт в API
+    assert retried["calories"] == 52
+    assert requests == 2
+
+
+def test_cache_hit_by_exact_term_and_full_text(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path) as (stub, store):
+            first = await openfoodfacts_api.get_food_info("Молоко")
+            # Тот же нормализованный запрос
+            exact = await openfoodfacts_api.get_food_info("  молоко! ")
+            # Другой запрос, который находится полнотекстовым поиском по префиксам слов
+            fts = await openfoodfacts_api.get_food_info("ультрапаст молок")
+            return first, exact, fts, len(stub.requests)
+
+    first, exact, fts, requests = asyncio.run(scenario())
+
+    assert requests == 1
+    assert exact == first
+    assert fts == first
+
+
+def test_negative_cache(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path) as (stub, store):
+            stub.mode = "empty"
+            missing = await openfoodfacts_api.get_food_info("несуществующий продукт")
+            cached_missing = await openfoodfacts_api.get_food_info("несуществующий продукт")
+            requests_while_fresh = len(stub.requests)
+
+            # Отрицательный ответ устарел: продукт снова ищется в API
+            monkeypatch.setattr(openfoodfacts_api, "food_negative_ttl", 0)
+            stub.mode = "found"
+            found = await openfoodfacts_api.get_food_info("несуществующий продукт")
+            return missing, cached_missing, requests_while_fresh, found, len(stub.requests)
+
+    missing, cached_missing, requests_while_fresh, found, requests = asyncio.run(scenario())
+
+    assert missing is None
+    assert cached_missing is None
+    assert requests_while_fresh == 1
+    assert found["calories"] == 52
+    assert requests == 2
+
+
+def test_stale_entry_returned_and_refreshed_in_background(monkeypatch, migrated_db):
+    db_path = migrated_db("food_cache.db", FOOD_MIGRATIONS)
+    stale_info = {"name": "Молоко", "calories": 40, "brand": "Стаб", "categories": "Молочные продукты"}
+
+    async def scenario():
+        async with food_api(monkeypatch, db_path) as (stub, store):
+            stale_at = time.time() - openfoodfacts_api.food_cache_ttl - 60
+            await store.write(save_food_lookup, "молоко", stale_info, stale_at)
+            stub.calories = 64
+            stub.delay = 0.1
+
+            # Обе выдачи — из кэша, обновление запускается один раз
+            results = await asyncio.gather(
+                openfoodfacts_api.get_food_info("молоко"),
+                openfoodfacts_api.get_food_info("молоко"),
+            )
+            tasks = list(openfoodfacts_api._refreshing.values())
+            await asyncio.gather(*tasks)
+            refreshed, fetched_at = await store.read(find_cached_food, "молоко")
+            return results, len(tasks), len(stub.requests), refreshed, fetched_at, stale_at
+
+    results, tasks, requests, refreshed, fetched_at, stale_at = asyncio.run(scenario())
+
+    assert [info["calories"] for info in results] == [40, 40]
+    assert tasks == 1
+    assert requests == 1
+    assert refreshed["calories"] == 64
+    assert fetched_at > stale_at
@@ -0,0 +1,92 @@
+"""
+Лимиты частоты (utils/rate_limit.py, middlewares/throttling.py): пополнение корзин,
+удаление простаивающих корзин и возврат токена пользователя при исчерпанном общем бюджете.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from middlewares.throttling import ThrottlingMiddleware
+from utils.rate_limit import TokenBucket, KeyedRateLimiter
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(rate=1.0, burst=2, now=0.0)
+    assert bucket.try_acquire(0.0) and bucket.try_acquire(0.0)
+    assert not bucket.try_acquire(0.0)
+    assert bucket.retry_after() == 1.0
+
+    assert not bucket.try_acquire(0.5)
+    assert bucket.retry_after() == 0.5
+    assert bucket.try_acquire(1.0)
+
+    # Пополнение не превышает ёмкость
+    bucket._refill(100.0)
+    assert bucket.tokens == 2
+    bucket.refund()
+    assert bucket.tokens == 2
+
+
+def test_idle_buckets_are_evicted():
+    # Выгрузка: корзина пополняется не позже чем через 1200 с после последнего обращения
+    limiter = KeyedRateLimiter(rate=1 / 600, burst=2)
+    assert limiter.try_acquire(1, now=0.0)[0]
+    assert limiter.try_acquire(1, now=0.0)[0]
+    assert not limiter.try_acquire(1, now=0.0)[0]
+    for user_id in range(2, 102):
+        limiter.try_acquire(user_id, now=float(user_id))
+
+    limiter.try_acquire(1000, now=1000.0)
+    assert len(limiter) == 102
+
+    # Удаляются все корзины, к которым не обращались 1200 с, в том числе опустошённая
+    limiter.try_acquire(1001, now=1250.0)
+    assert len(limiter) == 53
+    assert 1 not in limiter._buckets and 50 not in limiter._buckets and 51 in limiter._buckets
+
+    # Новая корзина полная, как и удалённая к этому времени
+    allowed, bucket = limiter.try_acquire(1, now=1250.0)
+    assert allowed and bucket.tokens == 1
+
+
+def test_recent_buckets_are_kept():
+    limiter = KeyedRateLimiter(rate=1.0, burst=10)
+    limiter.try_acquire("a", now=0.0)
+    limiter.try_acquire("b", now=5.0)
+    limiter.try_acquire("c", now=10.5)
+    # "a" не обращался 10 с и полностью пополнился, "b" ещё нет
+    assert len(limiter) == 2
+    allowed, bucket = limiter.try_acquire("b", now=11.0)
+    assert allowed and bucket.tokens == 9
+
+
+def message(user_id, text, answers):
+    async def answer(text):
+        answers.append((user_id, text))
+
+    return SimpleNamespace(from_user=SimpleNamespace(id=user_id), document=None, text=text, answer=answer)
+
+
+def test_global_budget_refunds_user_token():
+    middleware = ThrottlingMiddleware(
+        user_buckets={"render": (1 / 30, 3), "logging": (1.0, 10)},
+        global_buckets={"render": (1 / 3600, 1)},
+    )
+    answers = []
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.from_user.id)
+
+    async def scenario():
+        await middleware(handler, message(1, "/stats", answers), {})
+        await middleware(handler, message(2, "/stats", answers), {})
+        await middleware(handler, message(2, "/stats", answers), {})
+        await middleware(handler, message(2, "/water", answers), {})
+
+    asyncio.run(scenario())
+
+    assert handled == [1, 2]
+    # Общий бюджет исчерпан первым сообщением: у второго пользователя токен возвращён,
+    # а об ограничении ему сказали один раз
+    assert middleware._users["render"]._buckets[2].tokens >= 2.99
+    assert len(answers) == 1 and answers[0][0] == 2
@@ -0,0 +1,68 @@
+"""
+Пул отрисовки (utils/render_pool.py): не больше workers + queue_size задач одновременно,
+слот задачи, не дождавшейся результата, освобождается, когда процесс закончит работу.
+Вместо отрисовки процессы выполняют встроенные функции: их можно передать в spawn-процесс.
+"""
+import asyncio
+import time
+
+import pytest
+
+from utils.render_pool import RenderPool, RenderPoolBusy
+
+SLOW = 0.6
+TIMEOUT = 0.2
+
+
+async def wait_idle(pool, slots, timeout=5):
+    """
+    Ждёт, пока освободятся все slots слотов пула.
+
+    :return: Освободились ли слоты за timeout секунд
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while pool._slots._value < slots and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    return pool._slots._value == slots
+
+
+def test_in_flight_limit_and_timeout():
+    async def scenario():
+        pool = RenderPool(workers=1, queue_size=1, timeout=TIMEOUT)
+        try:
+            await pool.warm_up(int)
+            assert await pool.submit(pow, 2, 10) == 1024
+
+            # Один процесс занят, вторая задача ждёт в очереди: больше задач не принимается
+            slow = [asyncio.create_task(pool.submit(time.sleep, SLOW)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(RenderPoolBusy):
+                await pool.submit(pow, 2, 10)
+
+            results = await asyncio.gather(*slow, return_exceptions=True)
+            assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+            # Процесс ещё выполняет брошенные задачи: слоты заняты до их завершения
+            with pytest.raises(RenderPoolBusy):
+                await pool.submit(pow, 2, 10)
+
+            assert await wait_idle(pool, 2)
+            assert await pool.submit(pow, 3, 3) == 27
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failed_render_releases_slot():
+    async def scenario():
+        pool = RenderPool(workers=1, queue_size=0, timeout=5)
+        try:
+            with pytest.raises(ZeroDivisionError):
+                await pool.submit(divmod, 1, 0)
+            assert not pool._slots.locked()
+            assert await pool.submit(divmod, 7, 2) == (3, 1)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,157 @@
+"""
+Перешардирование (tools/reshard.py) и маршрутизация по шардам (models/db_pool.ShardedDatabase,
+models/ingest_queue.py): при переносе 1 → 3 → 1 шард данные не теряются и не перемешиваются.
+"""
+import asyncio
+
+from models.db_pool import ShardedDatabase
+from models.db_queries import (
+    save_user_profile,
+    log_user_norms,
+    log_intake_batch,
+    log_history_import_progress,
+    set_compacted_before,
+    get_compacted_before
+)
+from models.db_utils import (
+    SHARDED_TABLES,
+    get_database_connection,
+    close_database_connection,
+    shard_index,
+    shard_database_names
+)
+from models.ingest_queue import IngestQueue
+from tools.reshard import reshard
+
+USERS = range(1, 31)
+COMPACTED_BEFORE = "2024-01-01"
+
+
+def seed(path):
+    conn, cursor = get_database_connection(path)
+    try:
+        for user_id in USERS:
+            save_user_profile(user_id, f"user{user_id}", "Пользователь", "1990-01-01", "Moscow", 170 + user_id % 10,
+                              60 + user_id, "м", 0, 0, 0, conn, cursor)
+            log_user_norms(user_id, 2000 + user_id, 2.0, 30, conn, cursor)
+            log_intake_batch(
+                cursor,
+                [(user_id, "2024-05-01", 100 * user_id), (user_id, "2024-05-02", 250)],
+                [(user_id, "2024-05-01", 10 * user_id)],
+                [(user_id, "2024-05-03", "бег", user_id, 5 * user_id)] if user_id % 3 else [],
+            )
+            log_history_import_progress(user_id, f"file-{user_id}", 3, 4, cursor)
+        set_compacted_before(COMPACTED_BEFORE, cursor)
+        conn.commit()
+    finally:
+        close_database_connection(conn)
+
+
+def _user_rows(conn, cursor, user_id):
+    """
+    :return: Словарь {таблица: отсортированные строки пользователя без id записей}
+    """
+    rows = {}
+    for table, key in SHARDED_TABLES.items():
+        cursor.execute(f"PRAGMA table_info({table});")
+        columns = [row[1] for row in cursor.fetchall() if not (row[1] == "id" and key != "id")]
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE {key} = ?;", (user_id,))
+        rows[table] = sorted(cursor.fetchall(), key=repr)
+    return rows
+
+
+def _count_rows(conn, cursor):
+    counts = {}
+    for table in SHARDED_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table};")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def _compacted_before(conn, cursor):
+    return get_compacted_before(cursor)
+
+
+def snapshot(shared, names):
+    """
+    Читает данные через ShardedDatabase: for_user для каждого пользователя и read_all по шардам.
+
+    :return: (строки пользователей, количество строк по таблицам, граница сжатия каждого шарда)
+    """
+    async def scenario():
+        database = ShardedDatabase(shared, names, readers=1)
+        await database.open()
+        try:
+            users = {user_id: await database.for_user(user_id).read(_user_rows, user_id) for user_id in USERS}
+            per_shard = await database.read_all(_count_rows)
+            totals = {table: sum(counts[table] for counts in per_shard) for table in SHARDED_TABLES}
+            return users, totals, await database.read_all(_compacted_before)
+        finally:
+            await database.close()
+
+    return asyncio.run(scenario())
+
+
+def assert_placement(names):
+    """
+    Проверяет, что строки каждого пользователя лежат только в его шарде.
+    """
+    for index, name in enumerate(names):
+        conn, cursor = get_database_connection(name)
+        try:
+            for table, key in SHARDED_TABLES.items():
+                cursor.execute(f"SELECT DISTINCT {key} FROM {table};")
+                assert all(shard_index(user_id, len(names)) == index for user_id, in cursor.fetchall()), table
+        finally:
+            close_database_connection(conn)
+
+
+def test_reshard_one_to_three_and_back(migrated_db, tmp_path):
+    shared = migrated_db()
+    seed(shared)
+    users, totals, compacted = snapshot(shared, [shared])
+    assert compacted == [COMPACTED_BEFORE]
+
+    names = shard_database_names(3, str(tmp_path / "shard{index}.db"), shared)
+    copied = reshard([shared], names, purge=True)
+    assert copied == totals
+    assert_placement(names)
+    # Пользователи распределились по всем шардам
+    assert {shard_index(user_id, 3) for user_id in USERS} == {0, 1, 2}
+    assert snapshot(shared, names) == (users, totals, [COMPACTED_BEFORE] * 3)
+
+    back = shard_database_names(1, str(tmp_path / "unused{index}.db"), shared)
+    assert back == [shared]
+    assert reshard(names, back, purge=True) == totals
+    assert snapshot(shared, back) == (users, totals, [COMPACTED_BEFORE])
+
+
+def test_ingest_queue_writes_to_user_shard(migrated_db, tmp_path):
+    shared = migrated_db()
+    names = shard_database_names(3, str(tmp_path / "shard{index}.db"), shared)
+    for index in range(3):
+        migrated_db(f"shard{index}.db")
+
+    async def scenario():
+        database = ShardedDatabase(shared, names, readers=1)
+        queue = IngestQueue(database, flush_interval=0.01, batch_size=100)
+        await database.open()
+        try:
+            totals = await asyncio.gather(*(queue.log_water(user_id, 10 * user_id) for user_id in USERS))
+            await queue.close()
+            return totals
+        finally:
+            await database.close()
+
+    totals = asyncio.run(scenario())
+
+    assert [day.water for day in totals] == [10 * user_id for user_id in USERS]
+    assert_placement(names)
+    counts = []
+    for name in names:
+        conn, cursor = get_database_connection(name)
+        try:
+            counts.append(_count_rows(conn, cursor)["water_intake"])
+        finally:
+            close_database_connection(conn)
+    assert counts == [sum(1 for user_id in USERS if shard_index(user_id, 3) == index) for index in range(3)]
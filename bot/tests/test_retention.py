@@ -0,0 +1,64 @@
+"""
+Перенос старых записей в архив (utils/retention.py): ряды /stats не меняются,
+в архиве ровно перенесённые записи, daily_totals живого диапазона совпадает с сырыми таблицами.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from benchmarks.retention import fill, load_series
+from models.db_pool import database
+from models.db_queries import RAW_INTAKE_TABLES, get_compacted_before, find_daily_totals_mismatches
+from models.db_utils import get_database_connection, close_database_connection
+from utils.retention import archive_files, compact_all, read_archive
+
+USERS = 20
+DAYS = 90
+KEEP_DAYS = 30
+
+
+def raw_rows_before(path, before):
+    """
+    :return: (сырых записей раньше before, граница сжатия, расхождения daily_totals после неё)
+    """
+    conn, cursor = get_database_connection(path)
+    try:
+        left = 0
+        for table in RAW_INTAKE_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE date < ?;", (str(before),))
+            left += cursor.fetchone()[0]
+        compacted_before = get_compacted_before(cursor)
+        return left, compacted_before, find_daily_totals_mismatches(cursor, since=compacted_before)
+    finally:
+        close_database_connection(conn)
+
+
+def test_compaction_keeps_stats_series(main_db, tmp_path):
+    directory = str(tmp_path / "archive")
+    fill(main_db, USERS, DAYS)
+    before = datetime.now().date() - timedelta(days=KEEP_DAYS)
+    expired, _, _ = raw_rows_before(main_db, before)
+    series_before = load_series(main_db, range(1, USERS + 1), DAYS)
+
+    async def scenario():
+        try:
+            first = await compact_all(keep_days=KEEP_DAYS, chunk_size=500, directory=directory)
+            repeated = await compact_all(keep_days=KEEP_DAYS, chunk_size=500, directory=directory)
+            return first, repeated
+        finally:
+            await database.close()
+
+    moved, repeated = asyncio.run(scenario())
+
+    series_after = load_series(main_db, range(1, USERS + 1), DAYS)
+    assert all((series_before[user_id] == series_after[user_id]).all() for user_id in series_before)
+    left, compacted_before, mismatches = raw_rows_before(main_db, before)
+    assert moved == expired > 0
+    assert repeated == 0
+    assert left == 0
+    assert compacted_before == str(before)
+    assert mismatches == []
+    archived = sum(
+        sum(1 for _ in read_archive(path))
+        for table in RAW_INTAKE_TABLES for path in archive_files(main_db, table, directory)
+    )
+    assert archived == moved
@@ -0,0 +1,23 @@
+"""
+Запуск бота не импортирует тяжёлые библиотеки: NumPy и matplotlib нужны только /stats
+и ночному пересчёту норм и загружаются при первом использовании.
+"""
+import os
+import subprocess
+import sys
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("numpy", "matplotlib")
+
+
+def test_main_does_not_import_heavy_modules():
+    code = (
+        "import sys, main; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BOT_DIR, env=os.environ.copy(),
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
@@ -0,0 +1,149 @@
+"""
+Кэш графиков /stats (utils/stats_cache.py) и его использование в handlers/stats.py:
+вытеснение LRU, гонка чтения с записью, замена отклонённого file_id.
+"""
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+
+from handlers import stats as stats_handler
+from models.db_pool import database
+from utils import norms_cache as norms_module
+from utils.norms_cache import UserNorms, ensure_norms_logged
+from utils.render_pool import RenderPoolBusy
+from utils.stats_cache import StatsChartCache, StatsChart
+
+DAY = date(2024, 5, 1)
+
+
+def chart(key, image=b"png"):
+    return StatsChart(key=key, caption=f"caption {key}", image=image)
+
+
+def test_lru_eviction():
+    cache = StatsChartCache(2)
+    cache.put(chart("a"))
+    cache.put(chart("b"))
+    assert cache.get("a").key == "a"
+    cache.put(chart("c"))
+    # "b" использовался раньше всех
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    for user_id in (1, 2, 3):
+        cache.bind_user(user_id, DAY, 7, "a", cache.begin_read(user_id))
+    assert cache.get_for_user(1, DAY, 7) is None
+    assert cache.get_for_user(3, DAY, 7).key == "a"
+
+
+def test_hits_and_misses_are_counted_per_level():
+    cache = StatsChartCache(10)
+    assert cache.get_for_user(1, DAY, 7) is None
+    assert cache.get("a") is None
+    cache.put(chart("a"))
+    cache.bind_user(1, DAY, 7, "a", cache.begin_read(1))
+    assert cache.get_for_user(1, DAY, 7).key == "a"
+    # Другой день и другой период — промахи
+    assert cache.get_for_user(1, date(2024, 5, 2), 7) is None
+    assert cache.get_for_user(1, DAY, 30) is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "user_hits": 1, "user_misses": 3, "size": 1}
+
+
+def test_write_during_read_prevents_binding():
+    cache = StatsChartCache(10)
+    cache.put(chart("old"))
+
+    token = cache.begin_read(1)
+    # Пока данные читались, пользователь записал воду: график по прочитанным данным уже устарел
+    cache.invalidate_user(1)
+    cache.bind_user(1, DAY, 7, "old", token)
+    assert cache.get_for_user(1, DAY, 7) is None
+
+    # Более новое чтение отменяет метку предыдущего
+    first = cache.begin_read(1)
+    second = cache.begin_read(1)
+    cache.bind_user(1, DAY, 7, "old", first)
+    assert cache.get_for_user(1, DAY, 7) is None
+    cache.bind_user(1, DAY, 7, "old", second)
+    assert cache.get_for_user(1, DAY, 7).key == "old"
+
+
+def test_norms_change_invalidates_user_chart(monkeypatch, main_db):
+    cache = StatsChartCache(10)
+    monkeypatch.setattr(norms_module, "stats_cache", cache)
+    cache.put(chart("a"))
+    cache.bind_user(1, DAY, 7, "a", cache.begin_read(1))
+    norms = UserNorms(calories_goal=2000, water_goal=2100, workout_goal=30, proteins=100, fats=70, carbs=250)
+
+    async def scenario():
+        try:
+            await ensure_norms_logged(1, norms)
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+    assert cache.get_for_user(1, DAY, 7) is None
+
+
+class FakeMessage:
+    def __init__(self, reject_file_id=True):
+        self.from_user = SimpleNamespace(id=1)
+        self.reject_file_id = reject_file_id
+        self.photos = []
+        self.answers = []
+
+    async def answer_photo(self, photo, caption):
+        if isinstance(photo, str) and self.reject_file_id:
+            raise TelegramBadRequest(method=None, message="wrong file identifier")
+        self.photos.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="new-file-id")])
+
+    async def answer(self, text):
+        self.answers.append(text)
+
+    async def reply(self, text):
+        self.answers.append(text)
+
+
+def test_rejected_file_id_is_replaced(monkeypatch):
+    cache = StatsChartCache(10)
+    cached = cache.put(StatsChart(key="stale", caption="старый", file_id="old-file-id"))
+    rendered = chart("fresh")
+    results = [cached, rendered]
+
+    async def generate(user_id, days):
+        result = results.pop(0)
+        return cache.put(result) if result is rendered else result
+
+    monkeypatch.setattr(stats_handler, "stats_cache", cache)
+    monkeypatch.setattr(stats_handler, "generate_user_stats", generate)
+    message = FakeMessage()
+    asyncio.run(stats_handler.send_stats(message, SimpleNamespace(args=None)))
+
+    assert cache.get("stale") is None
+    assert len(message.photos) == 1 and message.photos[0].data == b"png"
+    assert cache.get("fresh").file_id == "new-file-id"
+    assert cache.get("fresh").image is None
+
+
+def test_fallback_render_errors_are_handled(monkeypatch):
+    cache = StatsChartCache(10)
+    for error, text in ((RenderPoolBusy(), "слишком много"), (asyncio.TimeoutError(), "вовремя")):
+        cached = cache.put(StatsChart(key="stale", caption="старый", file_id="old-file-id"))
+        results = [cached, error]
+
+        async def generate(user_id, days):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        monkeypatch.setattr(stats_handler, "stats_cache", cache)
+        monkeypatch.setattr(stats_handler, "generate_user_stats", generate)
+        message = FakeMessage()
+        asyncio.run(stats_handler.send_stats(message, SimpleNamespace(args=None)))
+
+        assert message.photos == []
+        assert len(message.answers) == 1 and text in message.answers[0]
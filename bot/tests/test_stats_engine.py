@@ -0,0 +1,180 @@
+"""
+Расчёты /stats (utils/stats_engine.py): загрузка рядов с протягиванием норм, границы корзин,
+скользящее среднее и выполнение норм.
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from models.db_utils import get_database_connection, close_database_connection
+from utils.stats_engine import (
+    CALORIES,
+    WATER,
+    WORKOUT,
+    load_user_series,
+    bucket_bounds,
+    rolling_mean,
+    adherence,
+    summarize
+)
+
+USER_ID = 1
+START = date(2024, 3, 1)
+DAYS = 10
+
+
+def load(path, totals=(), goals=(), start=START, days=DAYS):
+    """
+    Записывает дневные итоги (день, ккал, мл, минуты) и нормы (updated_at, ккал, л, минуты)
+    и загружает ряды пользователя.
+
+    :return: (values, goals) из load_user_series
+    """
+    conn, cursor = get_database_connection(path)
+    try:
+        cursor.executemany(
+            "INSERT INTO daily_totals (user_id, day, calories, water, workout_minutes) VALUES (?, ?, ?, ?, ?);",
+            [(USER_ID, *row) for row in totals]
+        )
+        cursor.executemany(
+            "INSERT INTO user_goals (user_id, updated_at, calories_goal, water_goal, workout_goal)"
+            " VALUES (?, ?, ?, ?, ?);",
+            [(USER_ID, *row) for row in goals]
+        )
+        conn.commit()
+        return load_user_series(conn, cursor, USER_ID, start, days)
+    finally:
+        close_database_connection(conn)
+
+
+def test_totals_are_placed_by_day(migrated_db):
+    values, _ = load(migrated_db(), totals=[
+        ("2024-02-29", 999, 999, 99),
+        ("2024-03-01", 1800, 1500, 30),
+        ("2024-03-04", 2100, 2000, 0),
+        ("2024-03-10", 1500, 500, 45),
+        ("2024-03-11", 999, 999, 99),
+    ])
+
+    assert values.shape == (DAYS, 3)
+    assert values[0].tolist() == [1800, 1500, 30]
+    assert values[3].tolist() == [2100, 2000, 0]
+    assert values[9].tolist() == [1500, 500, 45]
+    assert values.sum() == 1800 + 1500 + 30 + 2100 + 2000 + 1500 + 500 + 45
+
+
+def test_goals_are_carried_forward(migrated_db):
+    _, goals = load(migrated_db(), goals=[
+        ("2024-01-10 09:00:00", 1000, 1.0, 10),
+        ("2024-02-20 09:00:00", 2000, 2.0, 30),
+        ("2024-03-05 10:00:00", 2500, 2.5, 40),
+        # Два пересчёта за один день: действует последний
+        ("2024-03-08 08:00:00", 2600, 2.6, 50),
+        ("2024-03-08 20:00:00", 2700, 2.7, 60),
+        ("2024-03-11 09:00:00", 9999, 9.9, 99),
+    ])
+
+    # Норма до начала периода действует с первого дня
+    assert goals[:4].tolist() == [[2000, 2.0, 30]] * 4
+    assert goals[4:7].tolist() == [[2500, 2.5, 40]] * 3
+    assert goals[7:].tolist() == [[2700, 2.7, 60]] * 3
+
+
+def test_days_before_first_goal_have_no_goal(migrated_db):
+    _, goals = load(migrated_db(), goals=[("2024-03-04 12:00:00", 2000, 2.0, 30)])
+
+    assert np.isnan(goals[:3]).all()
+    assert goals[3:].tolist() == [[2000, 2.0, 30]] * 7
+
+
+def test_no_goals(migrated_db):
+    values, goals = load(migrated_db(), totals=[("2024-03-02", 1800, 1500, 30)])
+
+    assert np.isnan(goals).all()
+    assert adherence(values, goals).shape == (3,)
+    assert np.isnan(adherence(values, goals)).all()
+
+
+def test_week_buckets():
+    starts, labels = bucket_bounds(date(2024, 1, 29), 10, "week")
+
+    assert starts.tolist() == [0, 7]
+    assert labels == ["29.01", "05.02"]
+
+
+def test_month_buckets_start_on_first_day():
+    # 30–31 января, весь февраль високосного года, 1–4 марта
+    starts, labels = bucket_bounds(date(2024, 1, 30), 35, "month")
+
+    assert starts.tolist() == [0, 2, 31]
+    assert labels == ["01.24", "02.24", "03.24"]
+    assert np.add.reduceat(np.ones(35), starts).tolist() == [2, 29, 4]
+
+
+def test_unknown_bucket():
+    with pytest.raises(ValueError):
+        bucket_bounds(START, DAYS, "year")
+
+
+@pytest.mark.parametrize("start, days, bucket, sizes", [
+    (date(2024, 3, 1), 40, "week", [7, 7, 7, 7, 7, 5]),
+    (date(2023, 12, 30), 130, "month", [2, 31, 29, 31, 30, 7]),
+])
+def test_summary_buckets_sum_days(start, days, bucket, sizes):
+    values = np.ones((days, 3))
+    values[:, WATER] = np.arange(days)
+    summary = summarize(values, np.full((days, 3), np.nan), start)
+
+    assert summary.bucket == bucket
+    assert summary.rolling is None
+    assert len(summary.labels) == len(sizes)
+    assert summary.buckets[:, CALORIES].tolist() == sizes
+    assert summary.buckets.sum(axis=0).tolist() == values.sum(axis=0).tolist()
+
+
+def test_rolling_mean_shorter_than_window():
+    values = np.arange(1, 6, dtype=np.float64)[:, None].repeat(3, axis=1)
+
+    result = rolling_mean(values)
+
+    assert result[:, WORKOUT].tolist() == [1, 1.5, 2, 2.5, 3]
+
+
+def test_rolling_mean_full_window():
+    values = np.arange(1, 10, dtype=np.float64)[:, None].repeat(3, axis=1)
+
+    result = rolling_mean(values)
+
+    assert result[6, CALORIES] == pytest.approx(4)
+    assert result[8, CALORIES] == pytest.approx(sum(range(3, 10)) / 7)
+
+
+def test_short_period_has_no_rolling_mean():
+    summary = summarize(np.ones((7, 3)), np.full((7, 3), np.nan), START)
+
+    assert summary.bucket == "day"
+    assert summary.rolling is None
+    assert summarize(np.ones((8, 3)), np.full((8, 3), np.nan), START).rolling.shape == (8, 3)
+
+
+def test_adherence_counts_only_days_with_goal():
+    values = np.array([
+        [1500, 2.0, 30],
+        [1500, 2.0, 30],
+        [2500, 1.0, 60],
+        [0, 3.0, 0],
+    ])
+    goals = np.array([
+        [np.nan, np.nan, np.nan],
+        [2000, 2.0, 30],
+        [2000, 2.0, 30],
+        [2000, 2.0, 30],
+    ])
+
+    result = adherence(values, goals)
+
+    # Калории: превышение и незаписанный день не считаются выполнением
+    assert result[CALORIES] == pytest.approx(1 / 3)
+    assert result[WATER] == pytest.approx(2 / 3)
+    assert result[WORKOUT] == pytest.approx(2 / 3)
@@ -0,0 +1,59 @@
+"""
+Кэш погоды (utils/weather_api.py): строка из БД заполняет только отсутствующую запись,
+устаревшая запись обновляется из API.
+"""
+import asyncio
+
+from models.db_pool import database
+from models.db_queries import log_weather, get_weather_for_today
+from models.db_utils import get_database_connection, close_database_connection
+from utils import weather_api
+from utils.weather_api import WeatherCache
+
+CITY = "moscow"
+
+
+def stored_temperature(path):
+    conn, cursor = get_database_connection(path)
+    try:
+        return get_weather_for_today(CITY, cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def test_stale_entry_is_refreshed_from_api(monkeypatch, main_db):
+    conn, cursor = get_database_connection(main_db)
+    try:
+        log_weather(CITY, 10, conn, cursor)
+    finally:
+        close_database_connection(conn)
+
+    requests = []
+
+    async def fetch(city):
+        requests.append(city)
+        return 25
+
+    monkeypatch.setattr(weather_api, "fetch_weather_from_api", fetch)
+    cache = WeatherCache(ttl=0.1)
+
+    async def scenario():
+        try:
+            # Первая загрузка берёт сегодняшнюю строку из БД без запроса к API
+            first = await cache.get_temperature("Moscow")
+            assert requests == []
+            await asyncio.sleep(0.15)
+            # Запись устарела: отдаётся старое значение, а обновление идёт в API, а не в БД
+            stale, fresh = cache.peek_temperature("Moscow")
+            assert (stale, fresh) == (10, False)
+            await asyncio.gather(*cache._inflight.values())
+            return first, cache.peek_temperature("Moscow")
+        finally:
+            await database.close()
+
+    first, refreshed = asyncio.run(scenario())
+
+    assert first == 10
+    assert requests == [CITY]
+    assert refreshed == (25, True)
+    assert stored_temperature(main_db) == 25
@@ -0,0 +1,177 @@
+"""
+Webhook-режим (utils/webhook.py): обновления отправляет и ответы бота принимает
+локальная имитация Telegram из tools/fake_telegram.py.
+"""
+import asyncio
+import socket
+from argparse import Namespace
+from contextlib import asynccontextmanager
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from aiohttp.test_utils import TestServer
+
+from tools.fake_telegram import FakeBotAPI, send_updates
+from utils.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "test-secret"
+PATH = "/telegram/webhook"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def webhook_bot(workers=4, queue_size=100, dedup_size=1000):
+    """
+    Бот с одним обработчиком, который ждёт события release и отвечает на сообщение.
+
+    :return: (WebhookServer, FakeBotAPI, адрес webhook, release)
+    """
+    api = FakeBotAPI()
+    api_server = TestServer(api.app(), host="127.0.0.1")
+    await api_server.start_server()
+    bot = Bot(
+        token="123456:TEST",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(str(api_server.make_url(""))))
+    )
+    release = asyncio.Event()
+    release.set()
+    router = Router()
+
+    @router.message()
+    async def reply(message: Message):
+        await release.wait()
+        await message.answer("ok")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    server = WebhookServer(dp, bot, PATH, SECRET, workers, queue_size, dedup_size)
+    port = free_port()
+    await server.start("127.0.0.1", port)
+    try:
+        yield server, api, f"http://127.0.0.1:{port}{PATH}", release
+    finally:
+        release.set()
+        await server.stop(drain_timeout=5)
+        await bot.session.close()
+        await api_server.close()
+
+
+def sender_args(webhook, secret=SECRET, updates=50, duplicates=0.0, concurrency=10):
+    return Namespace(
+        webhook=webhook, secret=secret, updates=updates, users=10, duplicates=duplicates,
+        concurrency=concurrency, text=["/log_water 250"]
+    )
+
+
+async def wait_replies(api, count, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while api.replies < count and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_duplicate_updates_are_processed_once():
+    async def scenario():
+        async with webhook_bot() as (server, api, url, release):
+            sent, statuses, _ = await send_updates(sender_args(url, updates=50, duplicates=0.5))
+            await wait_replies(api, 50)
+            # Время на обработку лишних ответов, если повторы всё-таки прошли
+            await asyncio.sleep(0.1)
+            return sent, statuses, server.stats(), api.replies
+
+    sent, statuses, stats, replies = asyncio.run(scenario())
+
+    assert sent > 50
+    assert statuses == {200: sent}
+    assert stats["received"] == 50
+    assert stats["duplicates"] == sent - 50
+    assert replies == 50
+
+
+def test_wrong_secret_is_rejected():
+    async def scenario():
+        async with webhook_bot() as (server, api, url, release):
+            wrong = await send_updates(sender_args(url, secret="wrong", updates=5))
+            missing = await send_updates(sender_args(url, secret="", updates=5))
+            return wrong, missing, server.stats()
+
+    (_, wrong, _), (_, missing, _), stats = asyncio.run(scenario())
+
+    assert wrong == {401: 5}
+    assert missing == {401: 5}
+    assert stats["received"] == 0
+
+
+async def post_raw(url, secret: bytes):
+    """
+    Отправляет обновление с заголовком секрета из произвольных байтов в обход проверок клиента.
+
+    :return: HTTP-статус ответа
+    """
+    host, port = url.split("/")[2].split(":")
+    reader, writer = await asyncio.open_connection(host, int(port))
+    body = b'{"update_id": 1}'
+    writer.write(
+        b"POST " + PATH.encode() + b" HTTP/1.1\r\nHost: " + host.encode() + b"\r\n"
+        + SECRET_HEADER.encode() + b": " + secret + b"\r\n"
+        + b"Content-Type: application/json\r\nContent-Length: " + str(len(body)).encode()
+        + b"\r\nConnection: close\r\n\r\n" + body
+    )
+    status_line = await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+def test_non_ascii_secret_is_rejected():
+    async def scenario():
+        async with webhook_bot() as (server, api, url, release):
+            statuses = [
+                await post_raw(url, "секрет".encode("utf-8")),
+                await post_raw(url, b"\xff\xfe"),
+                await post_raw(url, SECRET.encode() + "é".encode("utf-8")),
+            ]
+            return statuses, server.stats()
+
+    statuses, stats = asyncio.run(scenario())
+
+    assert statuses == [401, 401, 401]
+    assert stats["received"] == 0
+
+
+def test_full_queue_returns_503_and_retry_is_accepted():
+    async def scenario():
+        # Один обработчик занят первым обновлением, в очереди помещается ещё два
+        async with webhook_bot(workers=1, queue_size=2) as (server, api, url, release):
+            release.clear()
+            _, first, _ = await send_updates(sender_args(url, updates=10, concurrency=1))
+            rejected = server.stats()["rejected"]
+
+            # Telegram повторяет доставку: принятые раньше отбрасываются, отклонённые принимаются
+            release.set()
+            await wait_replies(api, 3)
+            _, retry, _ = await send_updates(sender_args(url, updates=10, concurrency=1))
+            await wait_replies(api, 10)
+            return first, rejected, retry, server.stats(), api.replies
+
+    first, rejected, retry, stats, replies = asyncio.run(scenario())
+
+    assert first.get(503, 0) >= 7
+    assert first.get(503) == rejected
+    assert retry == {200: 10}
+    assert stats["received"] == 10
+    assert stats["duplicates"] == 10 - rejected
+    assert replies == 10
+
+
+def test_secret_is_required():
+    with pytest.raises(ValueError):
+        WebhookServer(Dispatcher(), None, PATH, "", workers=1, queue_size=1, dedup_size=1)
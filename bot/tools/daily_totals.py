@@ -0,0 +1,66 @@
+"""
+Обслуживание таблицы дневных итогов daily_totals.
+
+    backfill — пересчитать daily_totals по water_intake, calorie_intake и workouts;
+    check    — сравнить daily_totals с исходными таблицами (код выхода 1 при расхождениях).
+
+Дни, сырые записи которых перенесены в архив (utils.retention), не пересчитываются и не проверяются.
+
+Запуск из каталога bot:
+    python -m tools.daily_totals check
+"""
+import argparse
+import sys
+
+from config.db_settings import main_database
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations
+from models.db_queries import rebuild_daily_totals, find_daily_totals_mismatches, get_compacted_before
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+
+def backfill(conn, cursor):
+    since = get_compacted_before(cursor)
+    rows = rebuild_daily_totals(conn, cursor, since)
+    conn.commit()
+    logger.info("daily_totals пересчитана%s: %s строк", f" с {since}" if since else "", rows)
+
+
+def check(conn, cursor, limit):
+    mismatches = find_daily_totals_mismatches(cursor, limit, get_compacted_before(cursor))
+    for user_id, day, stored, expected in mismatches:
+        logger.warning(
+            "Расхождение для пользователя %s за %s: daily_totals=%s, исходные таблицы=%s",
+            user_id, day, stored, expected
+        )
+    if mismatches:
+        logger.error(
+            "Найдено расхождений: %s%s", len(mismatches), " (показаны первые)" if len(mismatches) == limit else ""
+        )
+        return False
+    logger.info("daily_totals совпадает с исходными таблицами")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backfill", "check"])
+    parser.add_argument("--db", default=main_database, help="файл БД")
+    parser.add_argument("--limit", type=int, default=100, help="сколько расхождений показать")
+    args = parser.parse_args()
+
+    conn, cursor = get_database_connection(args.db)
+    try:
+        run_migrations(conn, cursor)
+        if args.command == "backfill":
+            backfill(conn, cursor)
+        elif not check(conn, cursor, args.limit):
+            sys.exit(1)
+    finally:
+        close_database_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Локальная имитация Telegram для проверки webhook-режима без сети.
+
+Поднимает фиктивный Bot API (отвечает на sendMessage/sendPhoto и т.п.) и отправляет
+на webhook бота синтетические обновления, часть из них — повторно, как при ретраях Telegram.
+
+Запуск из каталога bot, бот:
+    BOT_MODE=webhook WEBHOOK_SECRET=secret TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+имитация:
+    python -m tools.fake_telegram --secret secret --updates 500 --duplicates 0.1
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import aiohttp
+from aiohttp import web
+
+from utils.webhook import SECRET_HEADER
+
+
+class FakeBotAPI:
+    """
+    Отвечает на вызовы Bot API так, чтобы aiogram принял ответ, и считает их.
+
+    Для режима polling отдаёт через getUpdates обновления, добавленные push_update().
+    Ответы бота можно получать по chat_id через listen().
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.replies = 0
+        self._message_id = 0
+        self._pending = []
+        self._has_updates = asyncio.Event()
+        self._listeners = {}
+        # Устанавливается при первом getUpdates: бот начал опрос
+        self.polling = asyncio.Event()
+
+    def push_update(self, update):
+        self._pending.append(update)
+        self._has_updates.set()
+
+    def listen(self, chat_id):
+        """
+        :return: Очередь, в которую попадают названия методов ответов бота в этот чат
+        """
+        return self._listeners.setdefault(chat_id, asyncio.Queue())
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def _get_updates(self, form):
+        self.polling.set()
+        if not self._pending:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), float(form.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        updates, self._pending = self._pending[:100], self._pending[100:]
+        return updates
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        form = await request.post()
+        result = True
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        elif method == "getUpdates":
+            result = await self._get_updates(form)
+        elif method.startswith("send"):
+            self.replies += 1
+            self._message_id += 1
+            chat_id = int(form.get("chat_id", 0))
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": form.get("text", ""),
+            }
+            if method == "sendPhoto":
+                result["photo"] = [{"file_id": f"fake{self._message_id}", "file_unique_id": f"fake{self._message_id}",
+                                    "width": 1, "height": 1}]
+            if method == "sendDocument":
+                result["document"] = {"file_id": f"fake{self._message_id}", "file_unique_id": f"fake{self._message_id}"}
+            if chat_id in self._listeners:
+                self._listeners[chat_id].put_nowait(method)
+        return web.json_response({"ok": True, "result": result})
+
+
+def make_update(update_id, user_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"},
+            "text": text,
+        },
+    }
+
+
+async def send_updates(args):
+    statuses = {}
+    timings = []
+    rnd = random.Random(42)
+    headers = {SECRET_HEADER: args.secret} if args.secret else {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(update):
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(args.webhook, json=update) as response:
+                    await response.read()
+                    timings.append(time.perf_counter() - started)
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        updates = []
+        for update_id in range(1, args.updates + 1):
+            update = make_update(update_id, rnd.randint(1, args.users), rnd.choice(args.text))
+            updates.append(update)
+            if rnd.random() < args.duplicates:
+                updates.append(update)
+        await asyncio.gather(*(post(update) for update in updates))
+
+    timings.sort()
+    return len(updates), statuses, timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhook", default="http://127.0.0.1:8080/telegram/webhook", help="адрес webhook бота")
+    parser.add_argument("--secret", default="", help="значение WEBHOOK_SECRET бота")
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081, help="порт фиктивного Bot API")
+    parser.add_argument("--updates", type=int, default=200, help="количество уникальных обновлений")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="доля обновлений, отправляемых повторно")
+    parser.add_argument("--concurrency", type=int, default=20, help="одновременных запросов к webhook")
+    parser.add_argument("--text", nargs="+", default=["/log_water 250", "/check_progress"],
+                        help="тексты сообщений")
+    parser.add_argument("--wait", type=float, default=5, help="сколько ждать ответов бота после отправки, с")
+    args = parser.parse_args()
+
+    api = FakeBotAPI()
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.api_host, args.api_port).start()
+
+    try:
+        sent, statuses, timings = await send_updates(args)
+        deadline = time.monotonic() + args.wait
+        while api.replies < args.updates and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        await runner.cleanup()
+
+    print(f"Отправлено запросов: {sent} (уникальных обновлений: {args.updates})")
+    print(f"Ответы webhook: {statuses}")
+    if timings:
+        print(f"Подтверждение: p50 {timings[len(timings) // 2] * 1000:.2f} мс, "
+              f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.2f} мс")
+    print(f"Ответов бота пользователям: {api.replies}, вызовы Bot API: {api.calls}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
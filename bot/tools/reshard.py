@@ -0,0 +1,207 @@
+"""
+Офлайн-перешардирование основной БД: переносит данные пользователей из текущего набора
+шардов в новый с другим количеством файлов. Бот на время переноса должен быть остановлен.
+
+Строки каждой таблицы из db_utils.SHARDED_TABLES копируются в шард db_utils.shard_index
+по новому количеству шардов. Новые файлы должны иметь другие имена, чем исходные
+(например, другой шаблон), и не содержать данных пользователей. Автоинкрементные id
+записей назначаются заново, id пользователей сохраняются. Общие таблицы (погода)
+остаются в общей БД. Граница сжатой истории (utils.retention) переносится в новые шарды.
+
+Запуск из каталога bot, с одного файла на 4 шарда:
+    python -m tools.reshard --from-shards 1 --to-shards 4 --to-template "shards4/health_tracker.{index}.db" --purge-source
+после чего бот запускается с DB_SHARDS=4 SHARD_DATABASE_TEMPLATE="shards4/health_tracker.{index}.db".
+"""
+import argparse
+import os
+import sys
+import time
+
+from config.db_settings import main_database, db_shards, shard_database_template
+from models.db_utils import (
+    SHARDED_TABLES,
+    get_database_connection,
+    close_database_connection,
+    shard_index,
+    shard_database_names
+)
+from models.db_migrations import run_migrations
+from models.db_queries import get_compacted_before, set_compacted_before
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+# SQLite по умолчанию позволяет подключить (ATTACH) не больше 10 БД к одному соединению
+ATTACH_LIMIT = 10
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table});")
+    key = SHARDED_TABLES[table]
+    # id записей назначается в новом шарде заново: в разных исходных шардах они пересекаются
+    return [row[1] for row in cursor.fetchall() if not (row[1] == "id" and key != "id")]
+
+
+def _count_user_rows(db_name):
+    conn, cursor = get_database_connection(db_name)
+    try:
+        counts = {}
+        for table in SHARDED_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table};")
+            counts[table] = cursor.fetchone()[0]
+        return counts
+    finally:
+        close_database_connection(conn)
+
+
+def _get_compacted_before(db_name):
+    conn, cursor = get_database_connection(db_name)
+    try:
+        return get_compacted_before(cursor)
+    finally:
+        close_database_connection(conn)
+
+
+def _set_compacted_before(db_name, day):
+    conn, cursor = get_database_connection(db_name)
+    try:
+        set_compacted_before(day, cursor)
+        conn.commit()
+    finally:
+        close_database_connection(conn)
+
+
+def prepare(db_names):
+    """
+    Создаёт файлы и применяет к ним актуальную схему основной БД.
+    """
+    for db_name in db_names:
+        directory = os.path.dirname(db_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn, cursor = get_database_connection(db_name)
+        try:
+            run_migrations(conn, cursor)
+        finally:
+            close_database_connection(conn)
+
+
+def copy_source(source, targets):
+    """
+    Раскладывает строки одной исходной БД по целевым шардам.
+
+    :return: Словарь {таблица: скопировано строк}
+    """
+    conn, cursor = get_database_connection(source)
+    shards = len(targets)
+    conn.create_function("shard_index", 1, lambda user_id: shard_index(user_id, shards), deterministic=True)
+    copied = dict.fromkeys(SHARDED_TABLES, 0)
+    try:
+        for first in range(0, shards, ATTACH_LIMIT):
+            group = range(first, min(first + ATTACH_LIMIT, shards))
+            for index in group:
+                cursor.execute(f"ATTACH DATABASE ? AS shard{index};", (targets[index],))
+            cursor.execute("BEGIN;")
+            for table, key in SHARDED_TABLES.items():
+                columns = ", ".join(_columns(cursor, table))
+                for index in group:
+                    cursor.execute(f"""
+                        INSERT INTO shard{index}.{table} ({columns})
+                        SELECT {columns} FROM main.{table}
+                        WHERE shard_index({key}) = ?
+                        ORDER BY {key};
+                    """, (index,))
+                    copied[table] += cursor.rowcount
+            conn.commit()
+            for index in group:
+                cursor.execute(f"DETACH DATABASE shard{index};")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_database_connection(conn)
+    return copied
+
+
+def purge_source(source):
+    conn, cursor = get_database_connection(source)
+    try:
+        for table in SHARDED_TABLES:
+            cursor.execute(f"DELETE FROM {table};")
+        conn.commit()
+        cursor.execute("VACUUM;")
+    finally:
+        close_database_connection(conn)
+
+
+def reshard(sources, targets, purge=False):
+    """
+    Переносит данные пользователей из sources в targets.
+
+    :param sources: Файлы текущих шардов по порядку номеров
+    :param targets: Файлы новых шардов по порядку номеров
+    :param purge: Удалить данные пользователей из исходных файлов после проверки переноса
+    :return: Словарь {таблица: перенесено строк}
+    :raises ValueError: Если наборы файлов пересекаются или новые шарды уже содержат данные
+    """
+    if {os.path.abspath(name) for name in sources} & {os.path.abspath(name) for name in targets}:
+        raise ValueError("Новые шарды должны храниться в других файлах, чем текущие")
+    prepare(sources)
+    prepare(targets)
+    for target in targets:
+        if any(_count_user_rows(target).values()):
+            raise ValueError(f"В {target} уже есть данные пользователей")
+
+    expected = dict.fromkeys(SHARDED_TABLES, 0)
+    copied = dict.fromkeys(SHARDED_TABLES, 0)
+    for source in sources:
+        for table, count in _count_user_rows(source).items():
+            expected[table] += count
+        started = time.perf_counter()
+        for table, count in copy_source(source, targets).items():
+            copied[table] += count
+        logger.info("%s перенесён за %.1f с", source, time.perf_counter() - started)
+
+    if copied != expected:
+        raise RuntimeError(f"Перенесено {copied}, ожидалось {expected}; исходные файлы не изменены")
+
+    # Сырых записей раньше границы нет хотя бы в одном исходном шарде, поэтому пересчитывать
+    # daily_totals за эти дни нельзя ни в одном новом
+    compacted_before = max(_get_compacted_before(source) for source in sources)
+    if compacted_before:
+        for target in targets:
+            _set_compacted_before(target, compacted_before)
+
+    if purge:
+        for source in sources:
+            purge_source(source)
+            logger.info("Данные пользователей удалены из %s", source)
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shared", default=main_database, help="общая БД (при одном шарде — единственный файл)")
+    parser.add_argument("--from-shards", type=int, default=db_shards)
+    parser.add_argument("--from-template", default=shard_database_template)
+    parser.add_argument("--to-shards", type=int, required=True)
+    parser.add_argument("--to-template", default=shard_database_template)
+    parser.add_argument("--purge-source", action="store_true",
+                        help="удалить данные пользователей из исходных файлов после переноса")
+    args = parser.parse_args()
+
+    sources = shard_database_names(args.from_shards, args.from_template, args.shared)
+    targets = shard_database_names(args.to_shards, args.to_template, args.shared)
+    try:
+        copied = reshard(sources, targets, purge=args.purge_source)
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for table, count in copied.items():
+        print(f"{table}: {count}")
+    print(f"\nЗапускайте бота с DB_SHARDS={args.to_shards} SHARD_DATABASE_TEMPLATE=\"{args.to_template}\"")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Загрузка продуктов из дампа OpenFoodFacts в локальный кэш продуктов.
+
+Поддерживаются CSV-выгрузка (en.openfoodfacts.org.products.csv, разделитель — табуляция)
+и JSONL-выгрузка (openfoodfacts-products.jsonl), в том числе сжатые gzip.
+
+Запуск из каталога bot:
+    python -m tools.seed_food_store en.openfoodfacts.org.products.csv.gz
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+
+from config.db_settings import food_database
+from models.db_utils import get_database_connection, close_database_connection
+from models.db_migrations import run_migrations, FOOD_MIGRATIONS
+from models.food_store import seed_food_products
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+CHUNK_SIZE = 10000
+
+
+def _open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _to_calories(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_csv_dump(dump):
+    csv.field_size_limit(sys.maxsize)
+    for row in csv.DictReader(dump, delimiter="\t", quoting=csv.QUOTE_NONE):
+        calories = _to_calories(row.get("energy-kcal_100g"))
+        if row.get("product_name") and calories is not None:
+            yield row["product_name"], calories, row.get("brands"), row.get("categories")
+
+
+def read_jsonl_dump(dump):
+    for line in dump:
+        try:
+            product = json.loads(line)
+        except ValueError:
+            continue
+        calories = _to_calories(product.get("nutriments", {}).get("energy-kcal_100g"))
+        if product.get("product_name") and calories is not None:
+            yield product["product_name"], calories, product.get("brands"), product.get("categories")
+
+
+def seed(path, db_name):
+    """
+    Загружает дамп порциями по CHUNK_SIZE строк, каждая порция — отдельная транзакция.
+
+    :return: Количество загруженных продуктов
+    """
+    fetched_at = os.path.getmtime(path)
+    conn, cursor = get_database_connection(db_name)
+    run_migrations(conn, cursor, FOOD_MIGRATIONS)
+    total = 0
+    with _open_dump(path) as dump:
+        reader = read_jsonl_dump if ".jsonl" in path or ".json" in path else read_csv_dump
+        chunk = []
+        for row in reader(dump):
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                total += seed_food_products(conn, cursor, chunk, fetched_at)
+                conn.commit()
+                chunk = []
+                logger.info("Загружено продуктов: %s", total)
+        total += seed_food_products(conn, cursor, chunk, fetched_at)
+        conn.commit()
+    close_database_connection(conn)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="путь к дампу OpenFoodFacts (.csv, .jsonl, можно .gz)")
+    parser.add_argument("--db", default=food_database, help="файл кэша продуктов")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = seed(args.dump, args.db)
+    logger.info("Загрузка завершена: %s продуктов за %.1f с", total, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
 from datetime import datetime, date
 from models.db_queries import log_user_norms
 
+# Температурный порог и дополнительная норма воды в жару
+TEMPERATURE_THRESHOLD = 25
+ADDITIONAL_WATER = 500
+
+# MET-значения для фиксированных тренировок
+MET_VALUES = {
+    "бег": 9.8,
+    "йога": 2.5,
+    "силовая": 6.0,
+    "велосипед": 8.0
+}
+
 def calculate_water_norm(weight):
     """
     Рассчитать норму воды на основе веса.
@@ -15,9 +27,24 @@ def calculate_calorie_norm(weight, height, age):
     return 10 * weight + 6.25 * height - 5 * age + 5  # Формула Харриса-Бенедикта
 
 
+def calculate_burned_calories(weight, workout_type, duration):
+    """
+    Рассчитать сожжённые калории по MET-значению тренировки.
+
+    :param duration: Продолжительность в минутах
+    """
+    return weight * MET_VALUES[workout_type] * (duration / 60)
+
+
+def _round(value, digits=2):
+    # Массивы NumPy (пакетный пересчёт норм) округляются своим методом
+    return value.round(digits) if hasattr(value, "round") else round(value, digits)
+
+
 def calculate_user_norms(height, weight, age):
     """
     Рассчитывает нормы калорий, воды, макронутриентов и дневной активности для пользователя.
+    Параметры могут быть и массивами NumPy одной длины.
     """
     # Расчет калорий и воды
     calories_goal = weight * 10 + height * 6.25 - age * 5 + 5
@@ -33,14 +60,35 @@ def calculate_user_norms(height, weight, age):
     daily_activity_minutes = weekly_activity_minutes / 7
 
     return {
-        "calories_goal": round(calories_goal, 2),
-        "water_goal": round(water_goal, 2),
-        "proteins": round(proteins, 2),
-        "fats": round(fats, 2),
-        "carbs": round(carbs, 2),
-        "daily_activity_minutes": round(daily_activity_minutes, 2)
+        "calories_goal": _round(calories_goal),
+        "water_goal": _round(water_goal),
+        "proteins": _round(proteins),
+        "fats": _round(fats),
+        "carbs": _round(carbs),
+        "daily_activity_minutes": _round(daily_activity_minutes)
     }
 
+def calculate_goals(height, weight, age, prefered_water, prefered_calories, prefered_workout, temperature=None):
+    """
+    Рассчитывает дневные цели пользователя: заданные в профиле предпочтения имеют приоритет
+    над нормами из calculate_user_norms, а в жару к норме воды добавляется ADDITIONAL_WATER.
+
+    :param temperature: Температура в городе пользователя за день или None, если неизвестна
+    :return: Словарь calculate_user_norms, в котором calories_goal, water_goal и workout_goal —
+             итоговые цели, extra_water — надбавка за погоду, а макронутриенты рассчитаны по норме калорий
+    """
+    norms = calculate_user_norms(height, weight, age)
+    norms["workout_goal"] = norms.pop("daily_activity_minutes")
+    if prefered_calories > 0:
+        norms["calories_goal"] = prefered_calories
+    if prefered_water > 0:
+        norms["water_goal"] = prefered_water
+    if prefered_workout > 0:
+        norms["workout_goal"] = prefered_workout
+    norms["extra_water"] = ADDITIONAL_WATER if temperature is not None and temperature > TEMPERATURE_THRESHOLD else 0
+    norms["water_goal"] += norms["extra_water"]
+    return norms
+
 def calculate_additional_water(temperature):
     """
     Рассчитывает дополнительную норму воды в зависимости от температуры.
@@ -0,0 +1,98 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from config.export_settings import export_chunk_rows, export_compress_level, export_directory
+from models.db_pool import database
+from models.db_queries import iter_user_history
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+# Формат выгрузки -> расширение файла
+EXPORT_FORMATS = {"csv": "csv.gz", "jsonl": "jsonl.gz"}
+
+# json.dumps с нестандартными параметрами создаёт кодировщик на каждый вызов
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass
+class ExportFile:
+    path: str
+    filename: str
+    rows: int
+    size: int
+
+
+def _write_csv(file, history):
+    # Разделы идут подряд, у каждого своя строка заголовка; первый столбец — имя раздела
+    writer = csv.writer(file)
+    current = None
+    rows = 0
+    for section, columns, chunk in history:
+        if section != current:
+            writer.writerow(["table", *columns])
+            current = section
+        writer.writerows([section, *row] for row in chunk)
+        rows += len(chunk)
+    return rows
+
+
+def _write_jsonl(file, history):
+    encode = _json_encoder.encode
+    rows = 0
+    for section, columns, chunk in history:
+        keys = ("table", *columns)
+        file.write("".join(f"{encode(dict(zip(keys, (section, *row))))}\n" for row in chunk))
+        rows += len(chunk)
+    return rows
+
+
+_WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl}
+
+
+def write_user_history(conn, cursor, user_id, path, fmt, chunk_size=export_chunk_rows):
+    """
+    Пишет историю пользователя в gzip-файл, читая строки пачками по chunk_size.
+    Выполняется в потоке пула БД; все разделы читаются в одной транзакции, то есть из одного снимка.
+
+    :param path: Путь к файлу выгрузки
+    :param fmt: Ключ EXPORT_FORMATS
+    :return: Количество выгруженных строк
+    """
+    cursor.execute("BEGIN;")
+    try:
+        with gzip.open(path, "wt", compresslevel=export_compress_level, encoding="utf-8", newline="") as file:
+            return _WRITERS[fmt](file, iter_user_history(user_id, cursor, chunk_size))
+    finally:
+        conn.rollback()
+
+
+async def export_user_history(user_id, fmt="csv"):
+    """
+    Выгружает всю историю пользователя во временный файл: запросы и сжатие выполняются
+    в потоке пула БД, а в памяти одновременно находится не больше одной пачки строк.
+
+    :return: ExportFile; файл удаляет вызывающий после отправки
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    extension = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix=f"export-{user_id}-", suffix=f".{extension}", dir=export_directory)
+    os.close(fd)
+    started = time.perf_counter()
+    try:
+        rows = await database.for_user(user_id).read(write_user_history, user_id, path, fmt)
+    except BaseException:
+        os.remove(path)
+        raise
+    size = os.path.getsize(path)
+    logger.info(
+        "Выгрузка пользователя %s (%s): %s строк, %s байт за %.2f с", user_id, fmt, rows, size, time.perf_counter() - started
+    )
+    return ExportFile(path=path, filename=f"health_tracker_{datetime.now().date()}.{extension}", rows=rows, size=size)
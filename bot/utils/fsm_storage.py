@@ -0,0 +1,222 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from aiogram.fsm.state import State
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.storage.base import BaseStorage
+
+from config.db_settings import fsm_version_check_interval
+from models.db_pool import DatabasePool
+from models.fsm_store import (
+    get_data_version,
+    get_fsm_generation,
+    next_fsm_generation,
+    load_fsm_record,
+    save_fsm_record,
+    delete_fsm_record,
+    purge_expired_fsm_records
+)
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+# Как часто удалять брошенные диалоги из БД, с
+PURGE_INTERVAL = 600
+
+
+def _encode_value(value):
+    # Дата рождения в мастере профиля хранится как date, её тип нужно сохранить
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Тип {type(value).__name__} не сохраняется в хранилище FSM")
+
+
+def _decode_value(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def encode_data(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_encode_value)
+
+
+def decode_data(payload):
+    return json.loads(payload, object_hook=_decode_value)
+
+
+def _read_record(conn, cursor, key, now, cached_version, cached_generation):
+    """
+    Загружает запись, только если хранилище записывал кто-то кроме этого процесса
+    или записи нет в кэше.
+    Выполняется на соединении чтения: его data_version меняется и после записей этого процесса,
+    поэтому при изменении data_version сравнивается ещё и номер записи fsm_generation.
+
+    :param cached_version: data_version при прошлой проверке или None, если записи нет в кэше
+    :param cached_generation: Последний номер записи, известный процессу, или None
+    :return: Кортеж (data_version, номер записи или None, если БД не менялась, загружена ли запись, строка или None)
+    """
+    version = get_data_version(cursor)
+    if cached_version is not None and version == cached_version:
+        return version, None, False, None
+    generation = get_fsm_generation(cursor)
+    if cached_generation is not None and generation <= cached_generation:
+        return version, generation, False, None
+    return version, generation, True, load_fsm_record(conn, cursor, key, now)
+
+
+def _write_record(conn, cursor, key, state, data, expires_at, purge_before):
+    """
+    :return: Номер этой записи (fsm_generation)
+    """
+    generation = next_fsm_generation(conn, cursor)
+    if state is None and data is None:
+        delete_fsm_record(conn, cursor, key)
+    else:
+        save_fsm_record(conn, cursor, key, state, data, expires_at)
+    if purge_before is not None:
+        purge_expired_fsm_records(conn, cursor, purge_before)
+    return generation
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в SQLite с LRU-кэшем в памяти.
+
+    Состояние и данные диалога хранятся одной строкой (данные — компактный JSON).
+    Запись без действий дольше ttl секунд считается брошенной и удаляется.
+
+    Чтение идёт через соединение чтения, писатель занят только сохранением состояний.
+    Не чаще раза в version_check_interval секунд проверяется PRAGMA data_version. Если БД
+    изменилась, по номеру записи fsm_generation определяется, писал ли в неё другой процесс:
+    только тогда кэш сбрасывается, собственные записи кэш не сбрасывают.
+    Между проверками состояние из кэша отдаётся без обращения к БД.
+    """
+
+    def __init__(self, db_name, ttl, cache_size, version_check_interval=fsm_version_check_interval):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.version_check_interval = version_check_interval
+        self._db = DatabasePool(db_name, readers=1)
+        self._cache = OrderedDict()
+        self._version = None
+        # Последний номер записи, изменения до которого отражены в кэше
+        self._generation = None
+        self._checked_at = float("-inf")
+        self._writes = 0
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _key(key):
+        parts = (key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny)
+        return ":".join("" if part is None else str(part) for part in parts)
+
+    def _remember(self, key, entry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _check_generation(self, generation, own=False):
+        """
+        Сбрасывает кэш, если в хранилище писал другой процесс.
+
+        :param generation: Номер записи, прочитанный из БД, или None, если БД не менялась
+        :param own: Номер получен собственной записью: номера до неё заняты чужими записями
+        """
+        if generation is None:
+            return
+        seen = generation - 1 if own else generation
+        if self._generation is None or seen > self._generation:
+            self._cache.clear()
+        self._generation = max(generation, self._generation or 0)
+
+    async def _get_record(self, key):
+        """
+        :return: Кортеж (state, data)
+        """
+        now = time.time()
+        entry = self._cache.get(key)
+        check_version = time.monotonic() - self._checked_at >= self.version_check_interval
+        if entry is not None and not check_version:
+            loaded = False
+        else:
+            checked_at, writes = time.monotonic(), self._writes
+            version, generation, loaded, row = await self._db.read(
+                _read_record, key, now,
+                *((self._version, self._generation) if entry is not None else (None, None))
+            )
+            self._checked_at = checked_at
+            self._version = version
+            self._check_generation(generation)
+            entry = self._cache.get(key)
+            # Пока шло чтение, этот процесс мог записать состояние: в кэше оно новее прочитанного
+            if writes != self._writes and entry is not None:
+                loaded = False
+            elif not loaded and entry is None:
+                # Кэш сбросила параллельная проверка версии
+                _, _, loaded, row = await self._db.read(_read_record, key, now, None, None)
+
+        if loaded:
+            entry = (row[0], decode_data(row[1]), row[2]) if row else (None, {}, now + self.ttl)
+            self._remember(key, entry)
+        elif entry[2] <= now:
+            entry = (None, {}, now + self.ttl)
+            self._remember(key, entry)
+        else:
+            self._cache.move_to_end(key)
+        return entry[0], entry[1]
+
+    async def _set_record(self, key, state, data):
+        now = time.time()
+        expires_at = now + self.ttl
+        purge_before = None
+        if now - self._last_purge >= PURGE_INTERVAL:
+            purge_before = now
+            self._last_purge = now
+
+        # Пустой диалог не храним в БД
+        empty = state is None and not data
+        self._writes += 1
+        generation = await self._db.write(
+            _write_record, key, state, None if empty else encode_data(data), expires_at, purge_before
+        )
+        self._check_generation(generation, own=True)
+        self._remember(key, (state, data, expires_at))
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        storage_key = self._key(key)
+        _, data = await self._get_record(storage_key)
+        await self._set_record(storage_key, state, data)
+
+    async def get_state(self, key):
+        state, _ = await self._get_record(self._key(key))
+        return state
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key = self._key(key)
+        state, _ = await self._get_record(storage_key)
+        await self._set_record(storage_key, state, data.copy())
+
+    async def get_data(self, key):
+        _, data = await self._get_record(self._key(key))
+        return data.copy()
+
+    async def update_data(self, key, data):
+        storage_key = self._key(key)
+        state, current_data = await self._get_record(storage_key)
+        current_data = {**current_data, **data}
+        await self._set_record(storage_key, state, current_data)
+        return current_data.copy()
+
+    async def close(self):
+        await self._db.close()
@@ -0,0 +1,256 @@
+import asyncio
+import csv
+import gzip
+import itertools
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from config.import_settings import import_chunk_rows
+from models.db_pool import database
+from models.db_queries import log_intake_batch, log_history_import_progress, complete_history_import
+from utils.calculations import MET_VALUES, calculate_burned_calories
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+# Самая ранняя дата записи, которую принимает импорт
+MIN_DATE = date(2000, 1, 1)
+# Разделы выгрузки /export, которые не импортируются: профиль и нормы задаются в боте
+SKIPPED_SECTIONS = {"profile", "user_goals", "daily_totals"}
+# Сколько ошибок в строках показывать пользователю
+MAX_REPORTED_ERRORS = 5
+
+
+class ImportFormatError(ValueError):
+    """
+    Файл нельзя разобрать дальше: не CSV/JSON Lines, не UTF-8, повреждённый gzip, нет заголовка.
+    """
+
+
+@dataclass
+class ImportStats:
+    """
+    Ход импорта: счётчики записанных записей обновляются после фиксации каждой пачки.
+    """
+    water: int = 0
+    calories: int = 0
+    workouts: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def imported(self):
+        return self.water + self.calories + self.workouts
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line}: {message}")
+
+
+def open_import_file(path):
+    """
+    Открывает файл импорта как текст; gzip распознаётся по сигнатуре, а не по расширению.
+    """
+    with open(path, "rb") as file:
+        gzipped = file.read(2) == b"\x1f\x8b"
+    opener = gzip.open if gzipped else open
+    return opener(path, "rt", encoding="utf-8-sig", newline="")
+
+
+def _iter_csv(lines, offset):
+    # Формат выгрузки /export: разделы подряд, перед каждым заголовок с первым столбцом table
+    reader = csv.reader(lines)
+    header = None
+    for row in reader:
+        line = offset + reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        if row[0].strip().lower() == "table":
+            header = [cell.strip().lower() for cell in row]
+            continue
+        if header is None:
+            raise ImportFormatError("первая строка CSV должна быть заголовком, начинающимся со столбца table")
+        yield line, dict(zip(header, row))
+
+
+def _iter_jsonl(lines, offset):
+    for line, text in enumerate(lines, start=offset + 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = None
+        yield line, record if isinstance(record, dict) else None
+
+
+def iter_records(file):
+    """
+    Читает записи файла по одной; формат определяется по первой непустой строке:
+    JSON Lines, если она начинается с "{", иначе CSV.
+
+    :return: Итератор (номер строки, словарь полей или None, если строку не удалось разобрать)
+    """
+    offset = 0
+    first = file.readline()
+    while first and not first.strip():
+        offset += 1
+        first = file.readline()
+    if not first:
+        return
+    lines = itertools.chain([first], file)
+    if first.lstrip().startswith("{"):
+        yield from _iter_jsonl(lines, offset)
+    else:
+        yield from _iter_csv(lines, offset)
+
+
+def _parse_date(value, today):
+    text = str(value or "").strip()
+    try:
+        day = date.fromisoformat(text)
+    except ValueError:
+        try:
+            day = datetime.strptime(text, "%d.%m.%Y").date()
+        except ValueError:
+            raise ValueError(f"некорректная дата «{text}»") from None
+    if not MIN_DATE <= day <= today:
+        raise ValueError(f"дата {day} вне диапазона {MIN_DATE} — {today}")
+    return str(day)
+
+
+def _parse_number(record, name, low, high, required=True):
+    value = record.get(name)
+    if value is None or str(value).strip() == "":
+        if required:
+            raise ValueError(f"не указано поле {name}")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} — не число") from None
+    # NaN не проходит ни одно сравнение
+    if not low <= number <= high:
+        raise ValueError(f"{name} вне диапазона {low}–{high}")
+    return number
+
+
+def _workout_row(record, user_id, day, weight):
+    workout_type = str(record.get("workout_type") or "").strip().lower()
+    if not workout_type or len(workout_type) > 64:
+        raise ValueError("не указан тип тренировки")
+    duration = _parse_number(record, "duration", 0, 1440, required=False)
+    burned = _parse_number(record, "calories_burned", 0, 10000, required=False)
+    if burned is None and duration and weight and workout_type in MET_VALUES:
+        burned = calculate_burned_calories(weight, workout_type, duration)
+    if not duration and not burned:
+        raise ValueError("нужна продолжительность или сожжённые калории")
+    return user_id, day, workout_type, None if duration is None else int(duration), burned or 0
+
+
+def read_chunks(file, user_id, stats, weight=None, chunk_size=import_chunk_rows, today=None, resume_line=0):
+    """
+    Разбирает и проверяет записи файла и отдаёт их пачками для log_intake_batch.
+    Строки с ошибками пропускаются и учитываются в stats.
+
+    :param weight: Вес пользователя для расчёта сожжённых калорий, если они не указаны
+    :param resume_line: Строки до этой включительно уже импортированы и пропускаются
+    :return: Итератор (water_rows, calorie_rows, workout_rows, последняя обработанная строка),
+             в каждой пачке до chunk_size записей
+    """
+    today = today or datetime.now().date()
+    water_rows, calorie_rows, workout_rows = [], [], []
+    for line, record in iter_records(file):
+        # Заголовки разделов CSV читаются и в пропущенной части, поэтому пропуск — после разбора
+        if line <= resume_line:
+            continue
+        if record is None:
+            stats.add_error(line, "не удалось разобрать строку")
+            continue
+        table = str(record.get("table") or "").strip().lower()
+        if table in SKIPPED_SECTIONS:
+            stats.skipped += 1
+            continue
+        try:
+            day = _parse_date(record.get("date"), today)
+            if table == "water_intake":
+                water_rows.append((user_id, day, _parse_number(record, "water_consumed", 1, 10000)))
+            elif table == "calorie_intake":
+                calorie_rows.append((user_id, day, _parse_number(record, "calories", 1, 20000)))
+            elif table == "workouts":
+                workout_rows.append(_workout_row(record, user_id, day, weight))
+            else:
+                raise ValueError(f"неизвестная таблица «{table}»")
+        except ValueError as e:
+            stats.add_error(line, str(e))
+            continue
+        if len(water_rows) + len(calorie_rows) + len(workout_rows) >= chunk_size:
+            yield water_rows, calorie_rows, workout_rows, line
+            water_rows, calorie_rows, workout_rows = [], [], []
+    if water_rows or calorie_rows or workout_rows:
+        yield water_rows, calorie_rows, workout_rows, line
+
+
+def _next_chunk(chunks):
+    try:
+        return next(chunks, None)
+    except UnicodeDecodeError:
+        raise ImportFormatError("файл не в кодировке UTF-8") from None
+    except (csv.Error, OSError, EOFError) as e:
+        # OSError — в том числе gzip.BadGzipFile, EOFError — обрезанный gzip
+        raise ImportFormatError(str(e) or type(e).__name__) from None
+
+
+def _log_chunk(conn, cursor, user_id, file_unique_id, water_rows, calorie_rows, workout_rows, line):
+    log_intake_batch(cursor, water_rows, calorie_rows, workout_rows)
+    if file_unique_id:
+        rows = len(water_rows) + len(calorie_rows) + len(workout_rows)
+        log_history_import_progress(user_id, file_unique_id, rows, line, cursor)
+
+
+def _complete_import(conn, cursor, user_id, file_unique_id):
+    complete_history_import(user_id, file_unique_id, cursor)
+
+
+async def import_history(user_id, path, stats, weight=None, file_unique_id=None, progress=None,
+                         chunk_size=import_chunk_rows, resume_line=0):
+    """
+    Импортирует воду, калории и тренировки из файла.
+
+    Файл читается и проверяется в отдельном потоке по одной пачке, каждая пачка вставляется
+    своей транзакцией через log_intake_batch (вместе с daily_totals). Записи других
+    пользователей шарда ждут не дольше одной пачки, а в памяти не больше одной пачки.
+
+    :param stats: ImportStats, заполняется по ходу импорта
+    :param file_unique_id: Если указан, в той же транзакции, что и пачка, в history_imports
+                           запоминается последняя импортированная строка, а после последней
+                           пачки файл отмечается импортированным целиком
+    :param progress: async-функция (stats), вызывается после каждой пачки
+    :param resume_line: Номер строки, после которой продолжить прерванный импорт этого файла
+    :raises ImportFormatError: Если файл не удалось дочитать; уже записанные пачки остаются,
+                               и повторная отправка файла продолжит импорт после них
+    """
+    shard = database.for_user(user_id)
+    file = await asyncio.to_thread(open_import_file, path)
+    try:
+        chunks = read_chunks(file, user_id, stats, weight, chunk_size, resume_line=resume_line)
+        while (chunk := await asyncio.to_thread(_next_chunk, chunks)) is not None:
+            water_rows, calorie_rows, workout_rows, line = chunk
+            await shard.write(_log_chunk, user_id, file_unique_id, water_rows, calorie_rows, workout_rows, line)
+            stats.water += len(water_rows)
+            stats.calories += len(calorie_rows)
+            stats.workouts += len(workout_rows)
+            if progress is not None:
+                await progress(stats)
+    finally:
+        file.close()
+    if file_unique_id:
+        await shard.write(_complete_import, user_id, file_unique_id)
+    logger.info(
+        "Импорт пользователя %s: вода %s, калории %s, тренировки %s, пропущено %s, с ошибками %s",
+        user_id, stats.water, stats.calories, stats.workouts, stats.skipped, stats.invalid
+    )
+    return stats
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import aiohttp
+
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+http_latency = metrics.histogram("bot_http_request_seconds", "Время запросов к внешним API", ("client",))
+http_errors = metrics.counter("bot_http_request_errors_total", "Неудачные запросы к внешним API", ("client",))
+
+
+class HttpClient:
+    """
+    Асинхронный HTTP-клиент с общим пулом keep-alive соединений.
+
+    Сессия создаётся при первом запросе внутри цикла событий. Количество одновременных
+    запросов ограничено max_connections, время каждого запроса — timeout секундами.
+    """
+
+    def __init__(self, name, max_connections=10, timeout=10, headers=None):
+        self.name = name
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = headers or {}
+        self._limit = asyncio.Semaphore(max_connections)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self.headers
+            )
+            logger.debug("HTTP-клиент %s: открыта сессия на %s соединений", self.name, self.max_connections)
+        return self._session
+
+    async def get_json(self, url, params=None):
+        """
+        Выполняет GET-запрос и возвращает разобранный JSON.
+        Параметры запроса кодируются aiohttp.
+
+        :raises aiohttp.ClientError: При сетевой ошибке или статусе ответа >= 400
+        :raises asyncio.TimeoutError: Если ответ не получен за timeout
+        """
+        async with self._limit:
+            started = time.perf_counter()
+            try:
+                async with self._get_session().get(url, params=params) as response:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except Exception:
+                http_errors.inc(self.name)
+                raise
+            finally:
+                http_latency.observe(time.perf_counter() - started, self.name)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug("HTTP-клиент %s: сессия закрыта", self.name)
+        self._session = None
@@ -1,23 +1,113 @@
+import atexit
 import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from config.logging_settings import log_level, log_async, log_queue_size, log_sample_rate
+
+LOG_FORMAT = "[%(asctime)s] [%(levelname)s]: [%(module)s] - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# extra для частых INFO-событий: в лог попадает доля log_sample_rate таких записей.
+# Пример: logger.info("Получена команда /start от %s", user_id, extra=SAMPLED)
+SAMPLED = {"sampled": True}
+
+_queue_handlers = []
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает долю rate записей INFO и ниже, помеченных extra=SAMPLED; остальные записи — все.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or not getattr(record, "sampled", False) or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Кладёт записи в очередь, не блокируя вызывающего: если очередь заполнена,
+    запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Стандартный QueueHandler форматирует сообщение здесь, в потоке вызывающего;
+        # запись передаётся как есть и форматируется в потоке QueueListener.
+        # Поэтому аргументы логирования не должны изменяться после вызова логгера.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    QueueListener, который при остановке дописывает очередь, даже если она заполнена,
+    и допускает повторную остановку (вручную и при выходе из процесса).
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def console_handler(level, stream=None):
+    handler = logging.StreamHandler(stream)
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+def queue_handler(target, queue_size=log_queue_size):
+    """
+    Оборачивает обработчик очередью: target вызывается в фоновом потоке QueueListener,
+    который останавливается (дописав очередь) при выходе из процесса.
+
+    :return: (DroppingQueueHandler, DrainingQueueListener)
+    """
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    listener = DrainingQueueListener(handler.queue, target, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    _queue_handlers.append(handler)
+    return handler, listener
+
+
+def dropped_records():
+    return sum(handler.dropped for handler in _queue_handlers)
+
+
+def queued_records():
+    return sum(handler.queue.qsize() for handler in _queue_handlers)
+
 
 # Настройка логирования
-def setup_logger(name="bot_logger", level=logging.INFO):
+def setup_logger(name="bot_logger", level=log_level):
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    # Консольный обработчик
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
-
-    # Форматирование сообщений
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s]: [%(module)s] - %(message)s",  # Новый формат
-        datefmt="%Y-%m-%d %H:%M:%S"  # Формат даты
-    )
-    console_handler.setFormatter(formatter)
-
-    # Добавляем обработчик в логгер
+    # Обработчики добавляются один раз: все модули используют общий логгер
     if not logger.handlers:
-        logger.addHandler(console_handler)
+        handler = console_handler(level)
+        if log_async:
+            handler, _ = queue_handler(handler)
+        logger.addHandler(handler)
+        if log_sample_rate < 1:
+            logger.addFilter(SamplingFilter(log_sample_rate))
 
     return logger
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from config.api import WEATHER_ACTIVE_DAYS
+from config.db_settings import norms_batch_chunk
+from models.db_pool import database
+from models.db_queries import (
+    get_users_for_norms,
+    get_weather_by_city,
+    scheduled_norms_logged,
+    log_scheduled_norms,
+    log_norms_batch_run
+)
+from utils.calculations import calculate_user_norms, TEMPERATURE_THRESHOLD, ADDITIONAL_WATER
+from utils.logging import setup_logger
+from utils.weather_api import weather_cache, normalize_city, get_active_cities
+
+logger = setup_logger()
+
+
+def calculate_goals_batch(age, height, weight, prefered_water, prefered_calories, prefered_workout, temperature):
+    """
+    Векторный вариант calculations.calculate_goals: все аргументы — массивы одной длины,
+    неизвестная температура — NaN.
+
+    :return: (calories_goal, water_goal, workout_goal) — массивы float64
+    """
+    # NumPy нужен только ночному пересчёту и не замедляет запуск бота
+    import numpy as np
+
+    # Формулы calculate_user_norms работают и с массивами NumPy
+    norms = calculate_user_norms(height, weight, age)
+    calories_goal = np.where(prefered_calories > 0, prefered_calories, norms["calories_goal"])
+    water_goal = np.where(prefered_water > 0, prefered_water, norms["water_goal"])
+    workout_goal = np.where(prefered_workout > 0, prefered_workout, norms["daily_activity_minutes"])
+    # Сравнение с NaN ложно: без данных о погоде надбавки нет
+    with np.errstate(invalid="ignore"):
+        water_goal = water_goal + np.where(temperature > TEMPERATURE_THRESHOLD, ADDITIONAL_WATER, 0)
+    return calories_goal.astype(np.float64), water_goal.astype(np.float64), workout_goal.astype(np.float64)
+
+
+def compute_norms(users, temperatures):
+    """
+    Считает нормы всех пользователей одним векторным проходом.
+
+    :param users: Строки get_users_for_norms
+    :param temperatures: Словарь {нормализованный город: температура}
+    :return: (user_ids, calories_goal, water_goal, workout_goal)
+    """
+    import numpy as np
+
+    # Числовые столбцы — одной матрицей: так быстрее, чем отдельный массив из каждого столбца
+    cities = [row[7] for row in users]
+    values = np.array([row[:7] for row in users], dtype=np.float64)
+    city_temperature = {city: temperatures.get(normalize_city(city), np.nan) for city in set(cities)}
+    temperature = np.fromiter((city_temperature[city] for city in cities), np.float64, count=len(cities))
+    user_ids, age, height, weight, prefered_water, prefered_calories, prefered_workout = values.T
+    goals = calculate_goals_batch(
+        age, height, weight, prefered_water, prefered_calories, prefered_workout, temperature
+    )
+    return (user_ids.astype(np.int64), *goals)
+
+
+def _get_users_for_norms(conn, cursor, day):
+    return get_users_for_norms(day, cursor)
+
+
+def _get_weather_by_city(conn, cursor, day):
+    return get_weather_by_city(day, cursor)
+
+
+def _log_chunk(conn, cursor, rows, day):
+    return log_scheduled_norms(rows, day, conn, cursor)
+
+
+def _scheduled_norms_logged(conn, cursor, day):
+    return scheduled_norms_logged(day, cursor)
+
+
+def _log_batch_run(conn, cursor, day, users, inserted):
+    return log_norms_batch_run(day, users, inserted, conn, cursor)
+
+
+async def _recompute_shard(shard, day, temperatures, chunk_size):
+    """
+    Пересчитывает нормы пользователей шарда и после последней пачки отмечает день как выполненный.
+
+    :return: (количество пользователей шарда, количество добавленных записей)
+    """
+    users = await shard.read(_get_users_for_norms, day)
+    if not users:
+        await shard.write(_log_batch_run, day, 0, 0)
+        return 0, 0
+    user_ids, calories_goal, water_goal, workout_goal = await asyncio.to_thread(compute_norms, users, temperatures)
+
+    inserted = 0
+    for offset in range(0, len(user_ids), chunk_size):
+        part = slice(offset, offset + chunk_size)
+        rows = zip(
+            user_ids[part].tolist(), calories_goal[part].tolist(),
+            water_goal[part].tolist(), workout_goal[part].tolist()
+        )
+        inserted += await shard.write(_log_chunk, rows, day)
+    await shard.write(_log_batch_run, day, len(user_ids), inserted)
+    return len(user_ids), inserted
+
+
+async def recompute_all_norms(day=None, chunk_size=norms_batch_chunk):
+    """
+    Пересчитывает и записывает нормы всех пользователей за день. Шарды обрабатываются параллельно.
+
+    Запись идёт пачками по chunk_size строк в отдельных транзакциях, чтобы не задерживать
+    записи обработчиков на всё время пересчёта.
+
+    :return: Количество добавленных записей норм
+    """
+    day = day or datetime.now().date()
+    started = time.perf_counter()
+
+    # Погода на новый день для городов активных пользователей; остальные получат надбавку при первом запросе
+    await weather_cache.prefetch(await get_active_cities(day - timedelta(days=WEATHER_ACTIVE_DAYS)))
+    temperatures = await database.shared.read(_get_weather_by_city, day)
+
+    results = await asyncio.gather(*(
+        _recompute_shard(shard, day, temperatures, chunk_size) for shard in database.shards
+    ))
+    users = sum(count for count, _ in results)
+    inserted = sum(added for _, added in results)
+
+    logger.info(
+        "Нормы за %s пересчитаны для %s пользователей, добавлено %s записей за %.2f с",
+        day, users, inserted, time.perf_counter() - started
+    )
+    return inserted
+
+
+def seconds_until_next_day():
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+
+async def norms_batch_loop():
+    """
+    Фоновая задача: пересчитывает нормы сразу после каждой смены дня, а при запуске —
+    если пересчёт за сегодня ещё не выполнялся.
+    """
+    while True:
+        try:
+            if not all(await database.read_all(_scheduled_norms_logged, datetime.now().date())):
+                await recompute_all_norms()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Ошибка при пересчёте норм пользователей: %s", e)
+        await asyncio.sleep(seconds_until_next_day() + 1)
@@ -0,0 +1,172 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from config.db_settings import norms_cache_size, norms_weather_retry
+from models.db_pool import database
+from models.db_queries import get_progress_snapshot, log_user_norms
+from utils.calculations import calculate_goals, calculate_age
+from utils.logging import setup_logger
+from utils.metrics import metrics
+from utils.stats_cache import stats_cache
+from utils.weather_api import weather_cache
+
+logger = setup_logger()
+
+
+@dataclass
+class UserNorms:
+    """
+    Дневные цели пользователя с макронутриентами.
+    """
+    calories_goal: float
+    water_goal: float
+    workout_goal: float
+    proteins: float
+    fats: float
+    carbs: float
+    # Надбавка к норме воды за погоду, уже включённая в water_goal
+    extra_water: float = 0
+    # Рассчитаны ли нормы по свежей температуре (а не по устаревшей или без неё)
+    weather_fresh: bool = True
+    # Записаны ли эти цели в user_goals за день
+    logged: bool = False
+
+
+class UserNormsCache:
+    """
+    LRU-кэш рассчитанных норм пользователей.
+
+    Запись действительна в течение дня, для которого рассчитана (возраст и записи норм
+    привязаны к дате), или ttl секунд, если он передан в put, и сбрасывается, когда профиль
+    меняет город, рост, вес, дату рождения или предпочтения. Все методы вызываются из цикла событий.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def get(self, user_id, day):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != day or (entry[2] is not None and time.monotonic() >= entry[2]):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def begin_read(self, user_id):
+        """
+        Отмечает начало чтения профиля пользователя для расчёта норм.
+
+        :return: Метка чтения для put
+        """
+        token = object()
+        self._pending[user_id] = token
+        return token
+
+    def put(self, user_id, day, norms, token, ttl=None):
+        """
+        Сохраняет нормы, если профиль не менялся с момента begin_read.
+
+        :param ttl: Сколько секунд хранить запись; None — до конца дня
+        """
+        if self._pending.get(user_id) is not token:
+            return
+        del self._pending[user_id]
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[user_id] = (day, norms, expires_at)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        self._pending.pop(user_id, None)
+        self._entries.pop(user_id, None)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+
+norms_cache = UserNormsCache(norms_cache_size)
+
+metrics.callback("bot_norms_cache_hits_total", "Попадания в кэш норм пользователей", lambda: norms_cache.hits, kind="counter")
+metrics.callback("bot_norms_cache_misses_total", "Промахи кэша норм пользователей", lambda: norms_cache.misses, kind="counter")
+
+
+def _get_progress_snapshot(conn, cursor, user_id, day):
+    return get_progress_snapshot(user_id, day, cursor)
+
+
+def _log_norms(conn, cursor, user_id, calories_goal, water_goal, workout_goal):
+    log_user_norms(user_id, calories_goal, water_goal, workout_goal, conn, cursor)
+
+
+def norms_from_snapshot(snapshot, temperature=None):
+    """
+    Рассчитывает нормы по профилю из ProgressSnapshot и температуре в городе пользователя.
+    """
+    goals = calculate_goals(
+        snapshot.height, snapshot.weight, calculate_age(snapshot.birth_date),
+        snapshot.prefered_water, snapshot.prefered_calories, snapshot.prefered_workout,
+        temperature
+    )
+    norms = UserNorms(**goals)
+    # Нормы уже записаны за день (в том числе ночным пересчётом), если с тех пор не менялись профиль и погода
+    norms.logged = snapshot.norms_updated_at is not None and (
+        (snapshot.calories_goal, snapshot.water_goal, snapshot.workout_goal)
+        == (norms.calories_goal, norms.water_goal, norms.workout_goal)
+    )
+    return norms
+
+
+async def get_user_norms(user_id, snapshot=None, wait_weather=False):
+    """
+    Возвращает нормы пользователя на сегодня: из кэша или по профилю из БД.
+
+    Температура берётся из памяти кэша погоды без запроса к API, поэтому запись воды
+    и калорий не ждёт weatherstack. Если свежей температуры нет, её загрузка идёт в фоне,
+    а нормы кэшируются только на norms_weather_retry секунд.
+
+    :param snapshot: Уже прочитанный ProgressSnapshot за сегодня, чтобы не читать профиль повторно
+    :param wait_weather: Дождаться температуры, если её нет в памяти (/check_progress её показывает)
+    :return: UserNorms или None, если профиль не найден
+    """
+    today = datetime.now().date()
+    norms = norms_cache.get(user_id, today)
+    if norms is not None and (norms.weather_fresh or not wait_weather):
+        return norms
+
+    token = norms_cache.begin_read(user_id)
+    if snapshot is None:
+        snapshot = await database.for_user(user_id).read(_get_progress_snapshot, user_id, today)
+        if snapshot is None:
+            return None
+    if wait_weather:
+        await weather_cache.get_temperature(snapshot.city)
+    temperature, fresh = weather_cache.peek_temperature(snapshot.city)
+    norms = norms_from_snapshot(snapshot, temperature)
+    norms.weather_fresh = fresh
+    norms_cache.put(user_id, today, norms, token, ttl=None if fresh else norms_weather_retry)
+    return norms
+
+
+async def ensure_norms_logged(user_id, norms):
+    """
+    Записывает нормы в user_goals, если за сегодня они ещё не записаны.
+    """
+    if norms.logged:
+        return
+    await database.for_user(user_id).write(_log_norms, user_id, norms.calories_goal, norms.water_goal, norms.workout_goal)
+    norms.logged = True
+    # Новая запись user_goals меняет линию нормы на графике /stats
+    stats_cache.invalidate_user(user_id)
+    logger.info("Запись норм для %s добавлена за %s.", user_id, datetime.now().date())
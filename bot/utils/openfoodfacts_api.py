@@ -1,12 +1,105 @@
-import requests
-from logging import getLogger
-from utils.logging import setup_logger
+import asyncio
+import time
+
+import aiohttp
+
+from config.api import OPENFOODFACTS_API_URL, OPENFOODFACTS_MAX_CONNECTIONS, OPENFOODFACTS_TIMEOUT
+from config.db_settings import food_database, food_cache_ttl, food_negative_ttl
+from models.db_pool import DatabasePool
+from models.food_store import normalize_food_name, find_cached_food, save_food_lookup
+from utils.http_client import HttpClient
+from utils.logging import setup_logger, SAMPLED
 
 logger = setup_logger()
 
-def get_food_info(product_name):
+# Запрашиваем только используемые поля: калорийность берётся из nutriments.energy-kcal_100g
+PRODUCT_FIELDS = "product_name,nutriments,brands,categories"
+
+food_client = HttpClient(
+    "openfoodfacts",
+    max_connections=OPENFOODFACTS_MAX_CONNECTIONS,
+    timeout=OPENFOODFACTS_TIMEOUT,
+    headers={"User-Agent": "LifeStatsBot/1.0"}
+)
+
+# Локальный кэш продуктов лежит в отдельном файле рядом с основной БД
+food_store = DatabasePool(food_database, readers=2)
+
+# Фоновые обновления устаревших записей кэша: запрос -> задача
+_refreshing = {}
+
+
+async def search_food_api(product_name):
+    """
+    Поиск продукта в OpenFoodFacts API.
+
+    :param product_name: Название продукта для поиска.
+    :return: Словарь с информацией о продукте или None, если продукт не найден.
+    :raises aiohttp.ClientError: При сетевой ошибке
+    :raises asyncio.TimeoutError: Если API не ответил вовремя
+    """
+    params = {
+        "action": "process",
+        "search_terms": product_name,
+        "fields": PRODUCT_FIELDS,
+        "page_size": 1,
+        "json": 1
+    }
+    logger.info("Поиск информации для продукта в OpenFoodFacts: %s", product_name, extra=SAMPLED)
+
+    data = await food_client.get_json(OPENFOODFACTS_API_URL, params=params)
+    logger.debug("Запрос к OpenFoodFacts API выполнен успешно.")
+
+    products = data.get('products', [])
+
+    if products:  # Проверяем, есть ли найденные продукты
+        first_product = products[0]
+        product_info = {
+            'name': first_product.get('product_name', 'Неизвестно'),
+            'calories': first_product.get('nutriments', {}).get('energy-kcal_100g', 0),
+            'brand': first_product.get('brands', 'Неизвестно'),
+            'categories': first_product.get('categories', 'Неизвестно')
+        }
+        logger.debug("Информация о продукте: %s", product_info)
+        return product_info
+    else:
+        logger.warning("Продукт '%s' не найден.", product_name)
+        return None
+
+
+async def _fetch_and_store(product_name, term):
+    """
+    Запрашивает продукт в API и сохраняет ответ (в том числе «не найден») в локальный кэш.
+
+    :raises aiohttp.ClientError, asyncio.TimeoutError, ValueError: Если API недоступен
+    """
+    product_info = await search_food_api(product_name)
+    if term:
+        await food_store.write(save_food_lookup, term, product_info, time.time())
+    return product_info
+
+
+async def _refresh(product_name, term):
+    try:
+        await _fetch_and_store(product_name, term)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.warning("Не удалось обновить продукт '%s' в кэше: %s", term, e)
+    finally:
+        _refreshing.pop(term, None)
+
+
+def _schedule_refresh(product_name, term):
+    if term not in _refreshing:
+        _refreshing[term] = asyncio.create_task(_refresh(product_name, term))
+
+
+async def get_food_info(product_name):
     """
-    Поиск информации о продукте и его калорийности с использованием OpenFoodFacts API.
+    Поиск информации о продукте и его калорийности.
+
+    Сначала продукт ищется в локальном кэше (точный запрос, затем полнотекстовый индекс),
+    и только при промахе — в OpenFoodFacts API. Устаревшие записи отдаются сразу и обновляются
+    в фоне, отрицательные ответы запоминаются на food_negative_ttl секунд.
 
     :param product_name: Название продукта для поиска.
     :return: Словарь с информацией о продукте (название, калорийность на 100 г).
@@ -15,33 +108,28 @@ def get_food_info(product_name):
         logger.error("Название продукта должно быть непустой строкой.")
         return None
 
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?action=process&search_terms={product_name}&json=true"
-    logger.info(f"Поиск информации для продукта: {product_name}")
-    
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        logger.info("Запрос к OpenFoodFacts API выполнен успешно.")
-        
-        data = response.json()
-        products = data.get('products', [])
-        
-        if products:  # Проверяем, есть ли найденные продукты
-            first_product = products[0]
-            product_info = {
-                'name': first_product.get('product_name', 'Неизвестно'),
-                'calories': first_product.get('nutriments', {}).get('energy-kcal_100g', 0),
-                'brand': first_product.get('brands', 'Неизвестно'),
-                'categories': first_product.get('categories', 'Неизвестно')
-            }
-            logger.debug(f"Информация о продукте: {product_info}")
+    term = normalize_food_name(product_name)
+    cached = None
+    if term:
+        cached = await food_store.read(find_cached_food, term)
+
+    if cached is not None:
+        product_info, fetched_at = cached
+        age = time.time() - fetched_at
+        if product_info is not None:
+            if age >= food_cache_ttl:
+                _schedule_refresh(product_name, term)
+            logger.debug("Продукт '%s' найден в кэше.", term)
             return product_info
-        else:
-            logger.warning(f"Продукт '{product_name}' не найден.")
+        if age < food_negative_ttl:
+            logger.debug("Продукт '%s' не найден (по данным кэша).", term)
             return None
-    except requests.exceptions.Timeout:
-        logger.error(f"Превышено время ожидания запроса для продукта '{product_name}'.")
+
+    try:
+        return await _fetch_and_store(product_name, term)
+    except asyncio.TimeoutError:
+        logger.error("Превышено время ожидания запроса для продукта '%s'.", product_name)
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при выполнении запроса: {e}", exc_info=True)
+    except (aiohttp.ClientError, ValueError) as e:
+        logger.error("Ошибка при выполнении запроса: %s", e, exc_info=True)
         return None
@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Корзина токенов: ёмкость burst, пополняется на rate токенов в секунду.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated", "warned")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+        # Пользователю уже ответили, что он упёрся в лимит
+        self.warned = False
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now=None):
+        """
+        :return: True, если токен взят
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def retry_after(self):
+        """
+        :return: Через сколько секунд появится токен
+        """
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class KeyedRateLimiter:
+    """
+    Корзины одного класса команд по ключу (например, user_id) с общими rate и burst.
+
+    Корзины упорядочены по времени последнего обращения. Через burst / rate секунд без обращений
+    любая корзина класса полностью пополнена и ничем не отличается от новой, поэтому удаляется.
+    Срок одинаков для всех корзин, и просроченные всегда стоят в начале порядка: память занимают
+    только ключи, обращавшиеся за последние burst / rate секунд, очистка — O(1) в среднем на вызов.
+    Классы с разными лимитами держатся в отдельных экземплярах.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.idle_after = burst / rate if rate > 0 else float("inf")
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict_idle(self, now):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_after:
+                break
+            del self._buckets[key]
+
+    def try_acquire(self, key, now=None):
+        """
+        :return: Кортеж (разрешено ли, корзина ключа)
+        """
+        now = time.monotonic() if now is None else now
+        self._evict_idle(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.try_acquire(now), bucket
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config.render_settings import render_workers, render_queue_size, render_timeout
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+render_latency = metrics.histogram("bot_render_seconds", "Время отрисовки в пуле процессов, включая ожидание в очереди")
+render_rejected = metrics.counter("bot_render_rejected_total", "Задачи отрисовки, отклонённые из-за заполненной очереди")
+
+
+class RenderPoolBusy(Exception):
+    """
+    Очередь на отрисовку заполнена, запрос отклонён.
+    """
+
+
+class RenderPool:
+    """
+    Пул процессов для отрисовки графиков вне цикла событий.
+
+    Одновременно принимается не больше workers + queue_size задач, остальные сразу
+    отклоняются с RenderPoolBusy. Ожидание результата ограничено timeout секундами.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn вместо fork: в родительском процессе работают потоки пула БД
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info("Запущен пул отрисовки: %s процессов", self.workers)
+        return self._executor
+
+    async def submit(self, func, *args):
+        """
+        Выполняет func(*args) в отдельном процессе.
+
+        :return: Результат func
+        :raises RenderPoolBusy: Если очередь заполнена
+        :raises asyncio.TimeoutError: Если результат не готов за timeout секунд
+        """
+        if self._slots.locked():
+            render_rejected.inc()
+            raise RenderPoolBusy()
+        await self._slots.acquire()
+        started = time.perf_counter()
+
+        try:
+            future = asyncio.wrap_future(self._get_executor().submit(func, *args))
+        except Exception:
+            self._slots.release()
+            raise
+        # Слот освобождается, только когда процесс действительно закончил работу,
+        # даже если ожидающий уже ушёл по таймауту
+        future.add_done_callback(self._release)
+        future.add_done_callback(lambda done: render_latency.observe(time.perf_counter() - started))
+        return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+
+    async def warm_up(self, func):
+        """
+        Запускает все процессы пула и выполняет в каждом func, например для предзагрузки модулей.
+        Ошибки прогрева только логируются.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, func) for _ in range(self.workers)),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning("Прогрев пула отрисовки завершился с ошибками: %r", errors[0])
+        else:
+            logger.info("Пул отрисовки прогрет за %.2f с", time.perf_counter() - started)
+
+    def _release(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug("Задача отрисовки завершилась с ошибкой: %s", future.exception())
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool(render_workers, render_queue_size, render_timeout)
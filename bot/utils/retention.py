@@ -0,0 +1,138 @@
+import asyncio
+import csv
+import glob
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+
+from config.db_settings import retention_days, retention_chunk, archive_directory
+from models.db_pool import database
+from models.db_queries import RAW_INTAKE_TABLES, set_compacted_before, get_expired_rows, delete_expired_rows
+from utils.logging import setup_logger
+from utils.norms_batch import seconds_until_next_day
+
+logger = setup_logger()
+
+
+def _table_directory(db_name, table, directory):
+    return os.path.join(directory, os.path.splitext(os.path.basename(db_name))[0], table)
+
+
+def archive_path(db_name, table, first_id, directory=archive_directory):
+    """
+    :return: Путь к файлу архива пачки: <каталог>/<имя БД>/<таблица>/<первый id>.csv.gz
+    """
+    return os.path.join(_table_directory(db_name, table, directory), f"{first_id:012d}.csv.gz")
+
+
+def archive_files(db_name, table, directory=archive_directory):
+    """
+    :return: Файлы архива таблицы по возрастанию id записей
+    """
+    return sorted(glob.glob(os.path.join(_table_directory(db_name, table, directory), "*.csv.gz")))
+
+
+def write_archive(path, columns, rows):
+    """
+    Записывает пачку в gzip CSV с заголовком. Файл появляется под своим именем только целиком
+    и после fsync, поэтому удалять строки из БД можно сразу после возврата.
+    Если перенос прервался до удаления, следующий запуск начнёт с той же пачки и перезапишет файл.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temp_path, path)
+
+
+def read_archive(path):
+    """
+    Читает файл архива.
+
+    :return: Итератор словарей {столбец: значение}; значения — строки, NULL записан пустой строкой
+    """
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+        yield from csv.DictReader(file)
+
+
+def _set_compacted_before(conn, cursor, day):
+    set_compacted_before(day, cursor)
+
+
+def _get_expired_rows(conn, cursor, table, before, after_id, limit):
+    return get_expired_rows(table, before, after_id, limit, cursor)
+
+
+def _delete_expired_rows(conn, cursor, table, before, first_id, last_id):
+    return delete_expired_rows(table, before, first_id, last_id, cursor)
+
+
+async def compact_shard(shard, before, chunk_size=retention_chunk, directory=archive_directory):
+    """
+    Переносит сырые записи шарда старше даты before в архив и удаляет их из БД.
+
+    Дневные итоги за эти дни уже есть в daily_totals: они обновляются в той же транзакции,
+    что и запись сырых данных. Граница сжатия сдвигается до удаления, поэтому пересчёт
+    daily_totals (tools/daily_totals backfill) никогда не затронет частично сжатые дни.
+    Пачка читается через соединение на чтение и пишется в файл без блокировки записи;
+    в транзакции на запись выполняется только удаление пачки по диапазону id.
+
+    :return: Количество перенесённых записей
+    """
+    await shard.write(_set_compacted_before, before)
+    moved = 0
+    for table in RAW_INTAKE_TABLES:
+        after_id = 0
+        while True:
+            columns, rows = await shard.read(_get_expired_rows, table, before, after_id, chunk_size)
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            await asyncio.to_thread(write_archive, archive_path(shard.db_name, table, first_id, directory), columns, rows)
+            deleted = await shard.write(_delete_expired_rows, table, before, first_id, last_id)
+            if deleted != len(rows):
+                logger.warning(
+                    "%s: из %s удалено %s записей вместо %s (id %s-%s)",
+                    shard.db_name, table, deleted, len(rows), first_id, last_id
+                )
+            moved += deleted
+            after_id = last_id
+            if len(rows) < chunk_size:
+                break
+    return moved
+
+
+async def compact_all(day=None, keep_days=retention_days, chunk_size=retention_chunk, directory=archive_directory):
+    """
+    Сжимает историю всех шардов параллельно: записи старше keep_days дней от day переносятся в архив.
+
+    :return: Количество перенесённых записей
+    """
+    day = day or datetime.now().date()
+    before = day - timedelta(days=keep_days)
+    started = time.perf_counter()
+    moved = sum(await asyncio.gather(*(
+        compact_shard(shard, before, chunk_size, directory) for shard in database.shards
+    )))
+    logger.info("Записи до %s перенесены в архив: %s за %.2f с", before, moved, time.perf_counter() - started)
+    return moved
+
+
+async def retention_loop():
+    """
+    Фоновая задача: сжимает историю при запуске и после каждой смены дня.
+    """
+    while True:
+        try:
+            await compact_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Ошибка при переносе старых записей в архив: %s", e)
+        await asyncio.sleep(seconds_until_next_day() + 1)
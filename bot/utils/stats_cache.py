@@ -0,0 +1,147 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from config.render_settings import stats_cache_size
+from utils.logging import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger()
+
+
+@dataclass
+class StatsChart:
+    """
+    Готовый график /stats. После первой отправки хранится только file_id от Telegram.
+    """
+    key: str
+    caption: str
+    image: bytes | None = None
+    file_id: str | None = None
+
+
+def chart_key(*series) -> str:
+    """
+    Возвращает ключ графика: хэш подписей дней и агрегированных рядов.
+    """
+    payload = json.dumps(series, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StatsChartCache:
+    """
+    LRU-кэш графиков /stats с адресацией по содержимому.
+
+    Графики хранятся по хэшу данных, поэтому одинаковые ряды рисуются и загружаются один раз.
+    Для каждого пользователя запоминаются ключи его последних графиков за день по каждому периоду: пока пользователь
+    ничего не записал, повторный /stats не обращается ни к БД, ни к пулу отрисовки.
+    Все методы вызываются из цикла событий.
+
+    Счётчики двух уровней: user_hits/user_misses — поиск последнего графика пользователя
+    (get_for_user), hits/misses — поиск по содержимому (get) после чтения данных из БД.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+        self._charts = OrderedDict()
+        self._user_keys = OrderedDict()
+        self._pending = {}
+
+    def begin_read(self, user_id):
+        """
+        Отмечает начало чтения данных пользователя для графика.
+
+        :return: Метка чтения для bind_user
+        """
+        token = object()
+        self._pending[user_id] = token
+        return token
+
+    def get_for_user(self, user_id, day, period):
+        """
+        Возвращает последний график пользователя за день и период, если данные с тех пор не менялись.
+        """
+        user_entry = self._user_keys.get(user_id, {}).get(period)
+        chart = self._charts.get(user_entry[1]) if user_entry is not None and user_entry[0] == day else None
+        if chart is None:
+            self.user_misses += 1
+            return None
+        self._charts.move_to_end(chart.key)
+        self._user_keys.move_to_end(user_id)
+        self.user_hits += 1
+        return chart
+
+    def get(self, key):
+        chart = self._charts.get(key)
+        if chart is None:
+            self.misses += 1
+            return None
+        self._charts.move_to_end(key)
+        self.hits += 1
+        return chart
+
+    def put(self, chart):
+        self._charts[chart.key] = chart
+        self._charts.move_to_end(chart.key)
+        while len(self._charts) > self.max_entries:
+            evicted_key, _ = self._charts.popitem(last=False)
+            logger.debug("График %s вытеснен из кэша", evicted_key[:12])
+        return chart
+
+    def bind_user(self, user_id, day, period, key, token):
+        """
+        Запоминает график пользователя за день и период, если его данные не менялись
+        с момента begin_read.
+        """
+        if self._pending.get(user_id) is not token:
+            return
+        del self._pending[user_id]
+        self._user_keys.setdefault(user_id, {})[period] = (day, key)
+        self._user_keys.move_to_end(user_id)
+        while len(self._user_keys) > self.max_entries:
+            self._user_keys.popitem(last=False)
+
+    def set_file_id(self, key, file_id):
+        """
+        Сохраняет file_id загруженного в Telegram изображения; байты PNG больше не нужны.
+        """
+        chart = self._charts.get(key)
+        if chart is not None:
+            chart.file_id = file_id
+            chart.image = None
+
+    def discard(self, key):
+        self._charts.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """
+        Сбрасывает привязку графика пользователя после записи новых данных или изменения норм.
+        """
+        self._pending.pop(user_id, None)
+        self._user_keys.pop(user_id, None)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "user_hits": self.user_hits,
+            "user_misses": self.user_misses,
+            "size": len(self._charts),
+        }
+
+
+stats_cache = StatsChartCache(stats_cache_size)
+
+metrics.callback("bot_stats_cache_hits_total", "Попадания в кэш графиков /stats по содержимому",
+                 lambda: stats_cache.hits, kind="counter")
+metrics.callback("bot_stats_cache_misses_total", "Промахи кэша графиков /stats по содержимому (график рисуется)",
+                 lambda: stats_cache.misses, kind="counter")
+metrics.callback("bot_stats_cache_user_hits_total", "/stats без чтения БД: график пользователя не устарел",
+                 lambda: stats_cache.user_hits, kind="counter")
+metrics.callback("bot_stats_cache_user_misses_total", "/stats с чтением данных пользователя из БД",
+                 lambda: stats_cache.user_misses, kind="counter")
@@ -0,0 +1,178 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+# NumPy импортируется при первом расчёте /stats, а не при запуске бота
+if TYPE_CHECKING:
+    import numpy as np
+
+# Колонки матрицы рядов
+CALORIES, WATER, WORKOUT = 0, 1, 2
+SERIES_NAMES = ("calories", "water", "workout")
+
+# Окно скользящего среднего, дни
+ROLLING_WINDOW = 7
+
+
+def load_user_series(conn, cursor, user_id: int, start_date, days: int):
+    """
+    Загружает дневные итоги и историю норм пользователя за период.
+
+    Смещение дня от начала периода считается в SQLite, поэтому даты в Python не разбираются.
+
+    :param start_date: Первый день периода (datetime.date)
+    :param days: Длина периода в днях
+    :return: (values, goals) — матрицы float64 формы (days, 3): итоги и действовавшие в эти дни нормы
+             (NaN, пока норма не была рассчитана)
+    """
+    import numpy as np
+
+    end_date = start_date + timedelta(days=days - 1)
+    cursor.execute("""
+        SELECT CAST(julianday(day) - julianday(:start) AS INTEGER), calories, water, workout_minutes
+        FROM daily_totals
+        WHERE user_id = :user_id AND day BETWEEN :start AND :end
+    """, {"user_id": user_id, "start": str(start_date), "end": str(end_date)})
+    totals = cursor.fetchall()
+
+    # Нормы пересчитываются не каждый день: берём последнюю до начала периода и все изменения внутри него
+    cursor.execute("""
+        SELECT MAX(CAST(julianday(date(updated_at)) - julianday(:start) AS INTEGER), 0),
+               calories_goal, water_goal, workout_goal
+        FROM user_goals
+        WHERE user_id = :user_id AND updated_at < :next_day
+          AND updated_at >= COALESCE(
+              (SELECT MAX(updated_at) FROM user_goals WHERE user_id = :user_id AND updated_at < :start),
+              :start)
+        ORDER BY updated_at
+    """, {"user_id": user_id, "start": str(start_date), "next_day": str(end_date + timedelta(days=1))})
+    goal_changes = cursor.fetchall()
+
+    values = np.zeros((days, 3))
+    if totals:
+        rows = np.array(totals, dtype=np.float64)
+        values[rows[:, 0].astype(np.intp)] = rows[:, 1:]
+
+    goals = np.full((days, 3), np.nan)
+    if goal_changes:
+        rows = np.array(goal_changes, dtype=np.float64)
+        offsets = rows[:, 0].astype(np.intp)
+        # Строки упорядочены по времени: при нескольких пересчётах за день побеждает последний
+        goals[offsets] = rows[:, 1:]
+        # Протягиваем норму вперёд до следующего пересчёта
+        marks = np.zeros(days, dtype=np.intp)
+        marks[offsets] = offsets
+        np.maximum.accumulate(marks, out=marks)
+        goals = goals[marks]
+        goals[:offsets.min()] = np.nan
+
+    return values, goals
+
+
+def bucket_bounds(start_date, days: int, bucket: str):
+    """
+    Разбивает период на корзины.
+
+    :param bucket: "day", "week" или "month"
+    :return: (starts, labels) — индексы первых дней корзин и их подписи
+    """
+    import numpy as np
+
+    dates = np.datetime64(start_date, "D") + np.arange(days)
+    if bucket == "day":
+        starts = np.arange(days)
+    elif bucket == "week":
+        starts = np.arange(0, days, 7)
+    elif bucket == "month":
+        months = dates.astype("datetime64[M]")
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    else:
+        raise ValueError(f"Неизвестный размер корзины: {bucket}")
+
+    if bucket == "month":
+        labels = [str(month)[5:7] + "." + str(month)[2:4] for month in dates[starts].astype("datetime64[M]")]
+    else:
+        # 'YYYY-MM-DD' -> 'DD.MM'
+        labels = [f"{text[8:10]}.{text[5:7]}" for text in np.datetime_as_string(dates[starts])]
+    return starts, labels
+
+
+def rolling_mean(values, window: int = ROLLING_WINDOW):
+    """
+    Скользящее среднее по столбцам; в первые дни окно неполное и делится на фактическую длину.
+    """
+    import numpy as np
+
+    cumsum = np.cumsum(values, axis=0)
+    shifted = np.zeros_like(cumsum)
+    shifted[window:] = cumsum[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)[:, None]
+    return (cumsum - shifted) / counts
+
+
+def adherence(values, goals):
+    """
+    Доля дней с известной нормой, в которые она выполнена: по воде и тренировкам — достигнута,
+    по калориям — потребление было записано и не превысило норму.
+
+    :return: Массив из трёх долей (NaN, если нормы за период нет)
+    """
+    import numpy as np
+
+    known = ~np.isnan(goals)
+    met = values >= np.nan_to_num(goals, nan=np.inf)
+    met[:, CALORIES] = (values[:, CALORIES] > 0) & (values[:, CALORIES] <= np.nan_to_num(goals[:, CALORIES]))
+    known_days = known.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(known_days > 0, (met & known).sum(axis=0) / known_days, np.nan)
+
+
+@dataclass
+class StatsSummary:
+    """
+    Агрегаты /stats за период. Ряды корзин — матрицы формы (корзины, 3) в порядке SERIES_NAMES.
+    """
+    days: int
+    bucket: str
+    labels: list
+    buckets: "np.ndarray"
+    rolling: "np.ndarray | None"
+    totals: "np.ndarray"
+    means: "np.ndarray"
+    minimums: "np.ndarray"
+    maximums: "np.ndarray"
+    adherence: "np.ndarray"
+
+
+def bucket_for_period(days: int) -> str:
+    if days <= 31:
+        return "day"
+    if days <= 120:
+        return "week"
+    return "month"
+
+
+def summarize(values, goals, start_date) -> StatsSummary:
+    """
+    Считает агрегаты по матрицам из load_user_series.
+    """
+    import numpy as np
+
+    days = len(values)
+    bucket = bucket_for_period(days)
+    starts, labels = bucket_bounds(start_date, days, bucket)
+    buckets = values if bucket == "day" else np.add.reduceat(values, starts, axis=0)
+    # Скользящее среднее рисуется поверх дневных столбцов, когда дней больше окна
+    rolling = rolling_mean(values) if bucket == "day" and days > ROLLING_WINDOW else None
+    return StatsSummary(
+        days=days,
+        bucket=bucket,
+        labels=labels,
+        buckets=buckets,
+        rolling=rolling,
+        totals=values.sum(axis=0),
+        means=values.mean(axis=0),
+        minimums=values.min(axis=0),
+        maximums=values.max(axis=0),
+        adherence=adherence(values, goals),
+    )
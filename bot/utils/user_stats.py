@@ -1,115 +1,111 @@
 import io
-import sqlite3
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 
-from config.db_settings import main_database
-from models.db_utils import get_database_connection, close_database_connection
+from models.db_pool import database
+from utils.render_pool import render_pool
+from utils.stats_cache import stats_cache, chart_key, StatsChart
+from utils.stats_engine import load_user_series, summarize, CALORIES, WATER, WORKOUT
 
-def generate_user_stats(user_id: int):
-    conn, cursor = get_database_connection(main_database)
-    
-    # Определяем период последних 7 дней (сегодня + предыдущие 6)
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=6)
-    
-    # 1) Получаем суммарные калории за каждый день
-    cursor.execute("""
-        SELECT date, SUM(calories) as total_calories
-        FROM calorie_intake
-        WHERE user_id = ? AND date BETWEEN ? AND ?
-        GROUP BY date
-        ORDER BY date
-    """, (user_id, start_date, end_date))
-    calorie_data = cursor.fetchall()
-    
-    # 2) Суммарная вода
-    cursor.execute("""
-        SELECT date, SUM(water_consumed) as total_water
-        FROM water_intake
-        WHERE user_id = ? AND date BETWEEN ? AND ?
-        GROUP BY date
-        ORDER BY date
-    """, (user_id, start_date, end_date))
-    water_data = cursor.fetchall()
-    
-    # 3) Суммарная длительность тренировок
-    cursor.execute("""
-        SELECT date, SUM(duration) as total_workout
-        FROM workouts
-        WHERE user_id = ? AND date BETWEEN ? AND ?
-        GROUP BY date
-        ORDER BY date
-    """, (user_id, start_date, end_date))
-    workout_data = cursor.fetchall()
-
-    close_database_connection(conn)
-    
-    days = [start_date + timedelta(days=i) for i in range(7)]
-    
-    cal_dict = {}
-    for row in calorie_data:
-        # row[0] = 'YYYY-MM-DD', row[1] = total_calories
-        cal_date = datetime.strptime(row[0], '%Y-%m-%d').date()
-        cal_dict[cal_date] = row[1] if row[1] else 0
-    
-    water_dict = {}
-    for row in water_data:
-        water_date = datetime.strptime(row[0], '%Y-%m-%d').date()
-        water_dict[water_date] = row[1] if row[1] else 0
-    
-    workout_dict = {}
-    for row in workout_data:
-        workout_date = datetime.strptime(row[0], '%Y-%m-%d').date()
-        workout_dict[workout_date] = row[1] if row[1] else 0
-    
-    cals_list = []
-    water_list = []
-    workout_list = []
-    
-    for d in days:
-        cals_list.append(cal_dict.get(d, 0))
-        water_list.append(water_dict.get(d, 0))
-        workout_list.append(workout_dict.get(d, 0))
-    
-    fig, axes = plt.subplots(3, 1, figsize=(8, 10))
-    
-
-    day_labels = [d.strftime("%d.%m") for d in days]
-
-    # Калории
-    axes[0].bar(day_labels, cals_list, color='blue')
-    axes[0].set_title("Калории")
-    axes[0].set_ylabel("ккал")
-
-    # Вода
-    axes[1].bar(day_labels, water_list, color='cyan')
-    axes[1].set_title("Вода")
-    axes[1].set_ylabel("мл")
-
-    # Тренировки
-    axes[2].bar(day_labels, workout_list, color='green')
-    axes[2].set_title("Тренировки")
-    axes[2].set_ylabel("минуты")
-
-    plt.tight_layout()
-    
+BUCKET_TITLES = {"day": "по дням", "week": "по неделям", "month": "по месяцам"}
+
+
+def render_stats_chart(labels, cals_list, water_list, workout_list, rolling=None) -> bytes:
+    """
+    Рисует три графика (калории, вода, тренировки) и возвращает PNG.
+
+    Выполняется в процессе пула отрисовки, поэтому использует только объектный API
+    Figure без глобального состояния pyplot.
+
+    :param rolling: Скользящие средние трёх рядов той же длины, что и labels, или None
+    """
+    # matplotlib импортируется только в процессах отрисовки, основной процесс его не загружает
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 10))
+    axes = fig.subplots(3, 1)
+    series = (
+        (cals_list, "blue", "Калории", "ккал"),
+        (water_list, "cyan", "Вода", "мл"),
+        (workout_list, "green", "Тренировки", "минуты"),
+    )
+
+    for index, (ax, (values, color, title, unit)) in enumerate(zip(axes, series)):
+        ax.bar(labels, values, color=color)
+        if rolling is not None:
+            ax.plot(labels, rolling[index], color="black", linewidth=1)
+        ax.set_title(title)
+        ax.set_ylabel(unit)
+        # При длинных периодах подписываем не каждый столбец
+        step = max(1, len(labels) // 12)
+        ax.set_xticks(range(0, len(labels), step))
+        ax.set_xticklabels(labels[::step])
+
+    fig.tight_layout()
 
     buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=80)
-    plt.close(fig) 
-    buffer.seek(0)
-    
-
-    total_calories = sum(cals_list)
-    total_water = sum(water_list)
-    total_workout = sum(workout_list)
-    
-    caption = (
-        "Ваши результаты за последние 7 дней:\n\n"
-        f"• Суммарные калории: {total_calories} ккал\n"
-        f"• Суммарно выпито воды: {total_water:.2f} мл\n"
-        f"• Суммарная длительность тренировок: {total_workout} мин\n"
+    fig.savefig(buffer, format='png', dpi=80)
+    return buffer.getvalue()
+
+
+def warm_up_renderer():
+    """
+    Загружает matplotlib и строит пустой график, чтобы первый /stats не ждал импорта и кэша шрифтов.
+    """
+    render_stats_chart(["-"], [0], [0], [0])
+
+
+def _percent(value):
+    return "нет нормы" if value != value else f"{value * 100:.0f}%"
+
+
+def build_caption(summary) -> str:
+    totals, means = summary.totals, summary.means
+    minimums, maximums, adherence = summary.minimums, summary.maximums, summary.adherence
+    return (
+        f"Ваши результаты за последние {summary.days} дн.:\n\n"
+        f"• Калории: всего {totals[CALORIES]:.0f} ккал, в среднем {means[CALORIES]:.0f} ккал/день "
+        f"(от {minimums[CALORIES]:.0f} до {maximums[CALORIES]:.0f}), в пределах нормы: {_percent(adherence[CALORIES])}\n"
+        f"• Вода: всего {totals[WATER]:.2f} мл, в среднем {means[WATER]:.0f} мл/день "
+        f"(от {minimums[WATER]:.0f} до {maximums[WATER]:.0f}), норма выполнена: {_percent(adherence[WATER])}\n"
+        f"• Тренировки: всего {totals[WORKOUT]:.0f} мин, в среднем {means[WORKOUT]:.0f} мин/день "
+        f"(от {minimums[WORKOUT]:.0f} до {maximums[WORKOUT]:.0f}), норма выполнена: {_percent(adherence[WORKOUT])}\n"
+        f"\nГрафик {BUCKET_TITLES[summary.bucket]}."
     )
-    
-    return buffer, caption
+
+
+async def generate_user_stats(user_id: int, days: int = 7):
+    """
+    Собирает статистику пользователя за последние days дней и рисует её в пуле процессов.
+    Готовые графики берутся из stats_cache, пока данные пользователя не менялись.
+
+    :param days: Длина периода, включая сегодняшний день
+    :return: StatsChart с PNG или file_id уже загруженного изображения
+    :raises RenderPoolBusy: Если очередь на отрисовку заполнена
+    :raises asyncio.TimeoutError: Если отрисовка не уложилась в таймаут
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
+    chart = stats_cache.get_for_user(user_id, end_date, days)
+    if chart is not None:
+        return chart
+
+    token = stats_cache.begin_read(user_id)
+    values, goals = await database.for_user(user_id).read(load_user_series, user_id, start_date, days)
+    summary = summarize(values, goals, start_date)
+    caption = build_caption(summary)
+
+    buckets = summary.buckets.T.tolist()
+    rolling = summary.rolling.T.tolist() if summary.rolling is not None else None
+
+    key = chart_key(summary.labels, buckets, rolling, caption)
+    chart = stats_cache.get(key)
+    if chart is not None:
+        stats_cache.bind_user(user_id, end_date, days, key, token)
+        return chart
+
+    image = await render_pool.submit(render_stats_chart, summary.labels, *buckets, rolling)
+
+    chart = stats_cache.put(StatsChart(key=key, caption=caption, image=image))
+    stats_cache.bind_user(user_id, end_date, days, key, token)
+    return chart
@@ -1,22 +1,43 @@
-import requests
-from datetime import datetime
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import aiohttp
+
 from utils.logging import setup_logger
+from utils.http_client import HttpClient
 from models.db_queries import (
-    is_weather_logged_today,
     log_weather,
     get_weather_for_today,
-    get_user_city
+    get_user_city,
+    get_active_user_cities
+)
+from models.db_pool import database
+from config.api import (
+    WEATHER_API_URL,
+    WEATHER_API_KEY,
+    WEATHER_API_TIMEOUT,
+    WEATHER_CACHE_TTL,
+    WEATHER_REFRESH_INTERVAL,
+    WEATHER_ACTIVE_DAYS
 )
-from config.api import WEATHER_API_URL, WEATHER_API_KEY
 
 logger = setup_logger()
 
 API_URL = WEATHER_API_URL
 API_KEY = WEATHER_API_KEY
 
+weather_client = HttpClient("weatherstack", max_connections=4, timeout=WEATHER_API_TIMEOUT)
+
+
+def normalize_city(city):
+    """
+    Приводит название города к ключу кэша: без лишних пробелов и без учёта регистра.
+    """
+    return " ".join((city or "").split()).casefold()
 
 
-def fetch_weather_from_api(city):
+async def fetch_weather_from_api(city):
     """
     Получает текущую информацию о погоде из API weatherstack.
 
@@ -29,45 +50,179 @@ def fetch_weather_from_api(city):
     }
 
     try:
-        response = requests.get(API_URL, params=params)
-        response.raise_for_status()  # Проверка успешного запроса
-        data = response.json()
+        data = await weather_client.get_json(API_URL, params=params)
 
         if "current" in data:
             temperature = data["current"]["temperature"]
-            logger.debug(f"Получена температура {temperature}°C для города {city}.")
+            logger.debug("Получена температура %s°C для города %s.", temperature, city)
             return temperature
         else:
-            logger.error(f"Ошибка API: {data}")
+            logger.error("Ошибка API: %s", data)
             return None
-    except Exception as e:
-        logger.error(f"Ошибка при запросе погоды для города {city}: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.error("Ошибка при запросе погоды для города %s: %r", city, e)
         return None
 
 
-def get_or_fetch_weather(user_id, conn, cursor):
+def _log_weather(conn, cursor, city, temperature):
+    log_weather(city, temperature, conn, cursor)
+
+
+def _get_weather_for_today(conn, cursor, city):
+    return get_weather_for_today(city, cursor)
+
+
+class WeatherCache:
+    """
+    Кэш температуры по городам в памяти.
+
+    Запись свежая ttl секунд и только в пределах дня. Одновременные промахи по одному городу
+    объединяются в один запрос (single-flight). Устаревшее значение отдаётся сразу,
+    а обновление идёт в фоне.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._inflight = {}
+
+    def _fresh(self, entry):
+        temperature, day, fetched_at = entry
+        return day == datetime.now().date() and time.monotonic() - fetched_at < self.ttl
+
+    async def _load(self, city):
+        """
+        Загружает температуру из API и сохраняет в БД. Строка за сегодня из БД (её мог записать
+        другой процесс или бот до перезапуска) используется, только если города ещё нет в памяти:
+        устаревшая запись всегда обновляется из API, иначе ttl не действовал бы до конца дня.
+        """
+        temperature = None
+        if city not in self._entries:
+            temperature = await database.shared.read(_get_weather_for_today, city)
+        if temperature is None:
+            temperature = await fetch_weather_from_api(city)
+            if temperature is not None:
+                await database.shared.write(_log_weather, city, temperature)
+        if temperature is not None:
+            self._entries[city] = (temperature, datetime.now().date(), time.monotonic())
+        return temperature
+
+    def _refresh(self, city):
+        """
+        Запускает загрузку города, если она ещё не идёт.
+
+        :return: Задача загрузки
+        """
+        task = self._inflight.get(city)
+        if task is None:
+            task = asyncio.create_task(self._load(city))
+            self._inflight[city] = task
+            task.add_done_callback(lambda done: self._finish(city, done))
+        return task
+
+    def _finish(self, city, task):
+        self._inflight.pop(city, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Ошибка при загрузке погоды для города %s: %s", city, task.exception())
+
+    def peek_temperature(self, city):
+        """
+        Возвращает температуру из памяти, не дожидаясь сети. Если записи нет
+        или она устарела, загрузка запускается в фоне.
+
+        :param city: Название города в любом регистре
+        :return: (температура или None, если города ещё нет в кэше; свежая ли она)
+        """
+        key = normalize_city(city)
+        if not key:
+            return None, False
+        entry = self._entries.get(key)
+        if entry is None or not self._fresh(entry):
+            self._refresh(key)
+            return (entry[0] if entry is not None else None), False
+        return entry[0], True
+
+    async def get_temperature(self, city):
+        """
+        Возвращает температуру в городе.
+
+        :param city: Название города в любом регистре
+        :return: Температура (float) или None, если данные недоступны
+        """
+        key = normalize_city(city)
+        if not key:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not self._fresh(entry):
+                self._refresh(key)
+            return entry[0]
+
+        return await asyncio.shield(self._refresh(key))
+
+    async def prefetch(self, cities):
+        """
+        Обновляет устаревшие записи для переданных городов.
+        """
+        keys = {normalize_city(city) for city in cities} - {""}
+        stale = [key for key in keys if key not in self._entries or not self._fresh(self._entries[key])]
+        if stale:
+            await asyncio.gather(*(self._refresh(key) for key in stale), return_exceptions=True)
+        logger.info("Погода обновлена для %s из %s городов активных пользователей.", len(stale), len(keys))
+
+    def evict_expired(self):
+        today = datetime.now().date()
+        for key in [key for key, entry in self._entries.items() if entry[1] != today]:
+            del self._entries[key]
+
+
+weather_cache = WeatherCache(WEATHER_CACHE_TTL)
+
+
+def _get_active_user_cities(conn, cursor, since_date):
+    return get_active_user_cities(since_date, cursor)
+
+
+async def get_active_cities(since_date):
+    """
+    :return: Города активных пользователей со всех шардов
     """
-    Получает текущую температуру для пользователя: либо из базы, либо из API.
+    per_shard = await database.read_all(_get_active_user_cities, since_date)
+    return sorted({city for cities in per_shard for city in cities})
+
+
+async def prefetch_weather_loop(interval=WEATHER_REFRESH_INTERVAL):
+    """
+    Фоновая задача: раз в interval секунд обновляет погоду для городов активных пользователей,
+    чтобы /check_progress не ждал ответа API.
+    """
+    while True:
+        try:
+            weather_cache.evict_expired()
+            since_date = datetime.now().date() - timedelta(days=WEATHER_ACTIVE_DAYS)
+            cities = await get_active_cities(since_date)
+            await weather_cache.prefetch(cities)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Ошибка при фоновом обновлении погоды: %s", e)
+        await asyncio.sleep(interval)
+
+
+def _get_user_city(conn, cursor, user_id):
+    return get_user_city(user_id, cursor)
+
+
+async def get_or_fetch_weather(user_id):
+    """
+    Получает текущую температуру для пользователя из кэша по его городу.
 
     :param user_id: ID пользователя
-    :param conn: Подключение к базе данных
-    :param cursor: Курсор базы данных
     :return: Температура (float) или None, если данные недоступны
     """
-    # Получаем город пользователя
-    city = get_user_city(user_id, cursor)
+    city = await database.for_user(user_id).read(_get_user_city, user_id)
     if not city:
-        logger.error(f"Город для пользователя {user_id} не найден.")
+        logger.error("Город для пользователя %s не найден.", user_id)
         return None
-
-    # Проверяем, есть ли запись о погоде на сегодня
-    if is_weather_logged_today(city, cursor):
-        logger.debug(f"Информация о погоде для {city} уже записана.")
-        return get_weather_for_today(city, cursor)
-
-    # Если записи нет, запрашиваем погоду из API
-    temperature = fetch_weather_from_api(city)
-    if temperature is not None:
-        log_weather(city, temperature, conn, cursor)
-
-    return temperature
+    return await weather_cache.get_temperature(city)
@@ -0,0 +1,140 @@
+import asyncio
+import hmac
+from collections import OrderedDict
+
+from aiohttp import web
+
+from utils.logging import setup_logger
+
+logger = setup_logger()
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Приём обновлений Telegram через webhook на aiohttp.
+
+    Запрос проверяется по секретному токену, обновление кладётся в ограниченную очередь
+    и Telegram сразу получает 200. Очередь разбирают workers обработчиков.
+    Повторная доставка того же update_id отбрасывается, поэтому ретраи Telegram идемпотентны
+    (в пределах одного процесса: последние dedup_size обновлений хранятся в памяти).
+    Если очередь заполнена, отвечаем 503, и Telegram повторит доставку позже.
+
+    :raises ValueError: Если secret пустой
+    """
+
+    def __init__(self, dp, bot, path, secret, workers, queue_size, dedup_size):
+        if not secret:
+            raise ValueError("Webhook без секретного токена принимал бы обновления от кого угодно")
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self._secret_bytes = secret.encode("utf-8")
+        self.workers = workers
+        self.dedup_size = dedup_size
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._seen = OrderedDict()
+        self._tasks = []
+        self._runner = None
+        # Метрики
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _remember(self, update_id):
+        self._seen[update_id] = None
+        while len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+
+    async def handle(self, request):
+        # compare_digest принимает строки только из ASCII, поэтому сравниваем байты. aiohttp декодирует
+        # заголовки с surrogateescape: так же и кодируем, чтобы любой заголовок давал 401, а не 500
+        token = request.headers.get(SECRET_HEADER, "").encode("utf-8", "surrogateescape")
+        if not hmac.compare_digest(token, self._secret_bytes):
+            logger.warning("Webhook: запрос с неверным секретом от %s", request.remote)
+            return web.Response(status=401)
+
+        try:
+            update = await request.json()
+            update_id = update["update_id"]
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+
+        if update_id in self._seen:
+            self.duplicates += 1
+            logger.debug("Webhook: повтор обновления %s отброшен", update_id)
+            return web.Response()
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Webhook: очередь заполнена, обновление %s отклонено", update_id)
+            return web.Response(status=503)
+
+        self._remember(update_id)
+        self.received += 1
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_raw_update(self.bot, update)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Ошибка при обработке обновления %s: %s", update.get("update_id"), e)
+            finally:
+                self._queue.task_done()
+
+    async def start(self, host, port, url=None, reuse_port=False):
+        """
+        Запускает обработчики и HTTP-сервер; если передан url, регистрирует webhook в Telegram.
+
+        :param reuse_port: Разрешить другим процессам слушать тот же порт (SO_REUSEPORT)
+        """
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, reuse_port=reuse_port)
+        await site.start()
+        logger.info("Webhook-сервер слушает %s:%s%s, обработчиков: %s", host, port, self.path, self.workers)
+
+        if url:
+            await self.bot.set_webhook(
+                url + self.path,
+                secret_token=self.secret,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
+            logger.info("Webhook зарегистрирован: %s%s", url, self.path)
+
+    async def stop(self, drain_timeout=10):
+        """
+        Перестаёт принимать запросы, дожидается обработки очереди и останавливает обработчики.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook: не обработано обновлений при остановке: %s", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "queued": self._queue.qsize(),
+        }